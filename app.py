@@ -5,76 +5,87 @@ Flask сервер для Web App - Система мониторинга тор
 Standalone версия без зависимостей от Telegram бота
 """
 
-from flask import Flask, render_template_string, jsonify, request, send_from_directory
+from flask import Flask, render_template_string, jsonify, request, send_file
 import os
 import json
+import math
 from datetime import datetime, date
+import hashlib
+import hmac
 import logging
+import threading
 from dotenv import load_dotenv
+from compression import init_compression
+from static_assets import StaticAssets
+from backend import get_backend
+from jobs import RetryableJobError, enqueue as enqueue_job, get_job, job_queue, register as register_job, start as start_jobs
+from artifacts import artifact_registry, find_artifact, get_artifact, register_artifact
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Используем демо базу данных для Vercel
-try:
-    from database_demo import get_checked_stores_for_date, get_all_regions, get_networks_by_region, get_stores_by_network, get_last_price_in_network, save_price_check, get_price_check
-    logger.info("Используется демо база данных")
-except ImportError:
-    from database import get_checked_stores_for_date, get_all_regions, get_networks_by_region, get_stores_by_network, get_last_price_in_network, save_price_check, get_price_check
-    logger.info("Используется локальная база данных")
 
 # Загружаем переменные окружения
 load_dotenv()
 
+# Сколько раз пытаться доставить отчет в Telegram (с растущей задержкой)
+TELEGRAM_MAX_ATTEMPTS = int(os.getenv('JOB_TELEGRAM_MAX_ATTEMPTS', '5'))
+# Накопившиеся в очереди отчеты отправляются альбомом до 10 файлов
+TELEGRAM_BATCH_SIZE = int(os.getenv('JOB_TELEGRAM_BATCH_SIZE', '10'))
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+init_compression(app)
+static_assets = StaticAssets(os.path.dirname(os.path.abspath(__file__)))
 
 @app.route('/')
 def index():
     """Главная страница Web App"""
-    try:
-        with open('index.html', 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        return html_content
-    except FileNotFoundError:
+    response = static_assets.response('index.html')
+    if response is None:
         return "Web App файл не найден", 404
+    return response
 
 @app.route('/manifest.json')
 def manifest():
     """PWA Manifest файл"""
-    try:
-        with open('manifest.json', 'r', encoding='utf-8') as f:
-            manifest_content = f.read()
-        return manifest_content, 200, {'Content-Type': 'application/json'}
-    except FileNotFoundError:
+    response = static_assets.response('manifest.json')
+    if response is None:
         return "Manifest не найден", 404
+    return response
 
 @app.route('/sw.js')
 def service_worker():
     """Service Worker файл"""
-    try:
-        with open('sw.js', 'r', encoding='utf-8') as f:
-            sw_content = f.read()
-        return sw_content, 200, {'Content-Type': 'application/javascript'}
-    except FileNotFoundError:
+    response = static_assets.response('sw.js')
+    if response is None:
         return "Service Worker не найден", 404
+    return response
 
 @app.route('/icon-<int:size>.png')
 def pwa_icon(size):
     """PWA иконки"""
-    try:
-        return send_from_directory('.', f'icon-{size}.png')
-    except FileNotFoundError:
+    response = static_assets.response(f'icon-{size}.png')
+    if response is None:
         return "Иконка не найдена", 404
+    return response
 
 @app.route('/icon-<int:size>-maskable.png')
 def pwa_maskable_icon(size):
     """PWA maskable иконки"""
-    try:
-        return send_from_directory('.', f'icon-{size}-maskable.png')
-    except FileNotFoundError:
+    response = static_assets.response(f'icon-{size}-maskable.png')
+    if response is None:
         return "Maskable иконка не найдена", 404
+    return response
+
+@app.route('/icon-<name>.<fingerprint>.png')
+def pwa_fingerprinted_icon(name, fingerprint):
+    """PWA иконки по адресу с отпечатком содержимого (immutable кэш)"""
+    response = static_assets.icon_response(f'icon-{name}', fingerprint)
+    if response is None:
+        return "Иконка не найдена", 404
+    return response
 
 @app.route('/test')
 def test_page():
@@ -154,8 +165,19 @@ def test_page():
                 const data = await response.json();
                 log('📄 Данные: ' + JSON.stringify(data, null, 2));
                 
-                if (data.success && data.report_file) {
-                    log('✅ Excel отчет создан: ' + data.report_file);
+                if (data.success && data.job_id) {
+                    log('⏳ Задача поставлена в очередь: ' + data.status_url);
+                    let job = { status: 'queued' };
+                    while (job.status !== 'done' && job.status !== 'failed') {
+                        await new Promise(resolve => setTimeout(resolve, 1000));
+                        job = (await (await fetch(data.status_url)).json()).job || { status: 'failed' };
+                    }
+                    log('📄 Задача: ' + JSON.stringify(job, null, 2));
+                    if (job.status === 'done') {
+                        log('✅ Excel отчет создан: ' + job.result.report_file);
+                    } else {
+                        log('❌ Excel отчет НЕ создан: ' + job.error);
+                    }
                 } else {
                     log('❌ Excel отчет НЕ создан');
                 }
@@ -199,15 +221,11 @@ def save_and_send():
         logger.info(f"Сохранение и отправка для магазина {store_name} (ID: {store_id}): {len(checked_items)}/{total_items}")
         
         # Сохраняем данные в базу
-        try:
-            from database_demo import record_check_results, get_nomenclature_by_store_id
-        except ImportError:
-            from database import record_check_results, get_nomenclature_by_store_id
         from datetime import date
         
         try:
             # Получаем всю номенклатуру магазина
-            all_nomenclature = get_nomenclature_by_store_id(store_id)
+            all_nomenclature = get_backend().get_nomenclature_by_store_id(store_id)
             all_products = [item[0] for item in all_nomenclature]  # item[0] это product_name
             
             if not all_products:
@@ -218,13 +236,20 @@ def save_and_send():
             
             # Сохраняем результаты мониторинга
             today = date.today()
-            record_check_results(store_id, all_products, set(checked_items), today)
+            rows_changed = get_backend().record_check_results(store_id, all_products, set(checked_items), today)
             
-            logger.info(f"Данные успешно сохранены для магазина {store_id}")
+            if rows_changed is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Ошибка сохранения в базу данных'
+                }), 500
+            
+            logger.info(f"Данные успешно сохранены для магазина {store_id}, изменено строк: {rows_changed}")
             
             return jsonify({
                 'success': True,
-                'message': f'Данные сохранены для магазина {store_name}. Проверено: {len(checked_items)} из {len(all_products)} товаров'
+                'message': f'Данные сохранены для магазина {store_name}. Проверено: {len(checked_items)} из {len(all_products)} товаров',
+                'rows_changed': rows_changed
             })
             
         except Exception as db_error:
@@ -246,10 +271,6 @@ def send_to_telegram():
     """API для отправки сообщений и файлов в Telegram"""
     try:
         # Импорты в начале функции
-        try:
-            from database_demo import create_store_report
-        except ImportError:
-            from database import create_store_report
         from datetime import date
         import os
         
@@ -281,42 +302,23 @@ def send_to_telegram():
                 
             message = enhanced_message
         
-        # Создаем Excel отчет
+        # Отчет создается и отправляется в фоне, запрос не ждет Telegram
+        job_id = enqueue_job('telegram_report', {
+            'store_id': store_id,
+            'store_name': store_name,
+            'report_date': date.today().isoformat(),
+            'message': message,
+            'comment': comment
+        })
         
-        try:
-            today = date.today()
-            report_filename = create_store_report(store_id, today, store_name)
-            
-            if report_filename and os.path.exists(report_filename):
-                logger.info(f"Excel отчет создан: {report_filename}")
-                
-                # Отправляем в Telegram
-                telegram_success = send_report_to_telegram(report_filename, message, comment)
-                
-                if telegram_success:
-                    return jsonify({
-                        'success': True,
-                        'message': f'Отчет создан и отправлен в Telegram: {os.path.basename(report_filename)}',
-                        'report_file': report_filename
-                    })
-                else:
-                    return jsonify({
-                        'success': True,
-                        'message': f'Отчет создан, но не удалось отправить в Telegram: {os.path.basename(report_filename)}',
-                        'report_file': report_filename
-                    })
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': 'Не удалось создать отчет'
-                }), 500
-                
-        except Exception as report_error:
-            logger.error(f"Ошибка создания отчета: {report_error}")
-            return jsonify({
-                'success': False,
-                'error': f'Ошибка создания отчета: {str(report_error)}'
-            }), 500
+        return jsonify({
+            'success': True,
+            'message': 'Отчет поставлен в очередь на создание и отправку в Telegram',
+            'job_id': job_id,
+            # В режиме JOB_MODE=inline задача к этому моменту уже выполнена
+            'status': get_job(job_id)['status'],
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
         
     except Exception as e:
         logger.error(f"Ошибка в send_to_telegram: {e}")
@@ -325,50 +327,135 @@ def send_to_telegram():
             'error': str(e)
         }), 500
 
-def send_report_to_telegram(report_filename, message, comment):
-    """Отправляет отчет в Telegram группу"""
-    try:
-        import requests
-        import os
-        
-        # Настройки бота из .env файла
-        BOT_TOKEN = os.getenv('BOT_TOKEN')
-        CHAT_ID = os.getenv('MAIN_GROUP_ID')
-        
-        if not BOT_TOKEN or not CHAT_ID:
-            logger.warning("Не настроены BOT_TOKEN или MAIN_GROUP_ID в .env файле")
+def send_reports_to_telegram(documents):
+    """Отправляет отчеты в Telegram группу: documents - список (файл, подпись).
+    
+    Несколько отчетов уходят одним альбомом (sendMediaGroup). Временные ошибки
+    (сеть, 429, 5xx) поднимаются как RetryableJobError для повтора задачи.
+    """
+    from telegram_client import TelegramError, get_client
+    
+    # Настройки бота из .env файла
+    client = get_client()
+    CHAT_ID = os.getenv('MAIN_GROUP_ID')
+    
+    if client is None or not CHAT_ID:
+        logger.warning("Не настроены BOT_TOKEN или MAIN_GROUP_ID в .env файле")
+        for report_filename, message in documents:
             logger.info(f"Отчет создан локально: {report_filename}")
             logger.info(f"Сообщение: {message}")
-            if comment:
-                logger.info(f"Комментарий: {comment}")
-            return False
-        
-        # Отправляем файл
-        with open(report_filename, 'rb') as file:
-            files = {'document': file}
-            data = {
-                'chat_id': CHAT_ID,
-                'caption': message
-            }
-            
-            response = requests.post(
-                f'https://api.telegram.org/bot{BOT_TOKEN}/sendDocument',
-                files=files,
-                data=data,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                logger.info("Отчет успешно отправлен в Telegram")
-                return True
-            else:
-                logger.error(f"Ошибка отправки в Telegram: {response.status_code} - {response.text}")
-                return False
-                
+        return False
+    
+    try:
+        client.send_documents(CHAT_ID, documents)
+        logger.info(f"Отправлено отчетов в Telegram: {len(documents)}")
+        return True
+    except TelegramError as e:
+        if e.retryable:
+            raise RetryableJobError(str(e), e.retry_after)
+        logger.error(f"Ошибка отправки в Telegram: {e}")
+        return False
     except Exception as e:
         logger.error(f"Ошибка отправки в Telegram: {e}")
         return False
 
+def send_report_to_telegram(report_filename, message, comment):
+    """Отправляет отчет в Telegram группу"""
+    if comment:
+        logger.info(f"Комментарий: {comment}")
+    return send_reports_to_telegram([(report_filename, message)])
+
+def register_report(kind, params, report_path):
+    """Записывает файл отчета в реестр и возвращает поля ответа со ссылкой на скачивание.
+    
+    Файлы кэша отчетов удаляет сам кэш, реестр только забывает о них.
+    """
+    from report_cache import report_cache
+    
+    owned = os.path.dirname(os.path.abspath(report_path)) != report_cache.directory
+    artifact = register_artifact(kind, params, report_path, owned=owned)
+    return {
+        'artifact_id': artifact['id'],
+        'download_url': f"/api/download-file?id={artifact['id']}"
+    }
+
+def prepare_telegram_report(params):
+    """Создает отчет магазина для задачи отправки (один раз на задачу)"""
+    report_filename = params.get('report_file')
+    if not report_filename or not os.path.exists(report_filename):
+        report_date = datetime.strptime(params['report_date'], '%Y-%m-%d').date()
+        report_filename = get_backend().create_store_report(params['store_id'], report_date, params['store_name'])
+        if not report_filename or not os.path.exists(report_filename):
+            raise RuntimeError('Не удалось создать отчет')
+        logger.info(f"Excel отчет создан: {report_filename}")
+        # При повторе отправки отчет не создается заново
+        params['report_file'] = report_filename
+        params.update(register_report('store_report', {
+            'store_id': int(params['store_id']),
+            'date': report_date.isoformat()
+        }, report_filename))
+    return report_filename
+
+def run_telegram_report_jobs(batch):
+    """Фоновая задача: создает отчеты магазинов и отправляет их в Telegram одним альбомом"""
+    outcomes = [None] * len(batch)
+    ready = []
+    for index, params in enumerate(batch):
+        try:
+            prepare_telegram_report(params)
+            ready.append(index)
+        except Exception as e:
+            outcomes[index] = e
+    
+    if ready:
+        try:
+            telegram_sent = send_reports_to_telegram([(batch[i]['report_file'], batch[i]['message']) for i in ready])
+        except RetryableJobError as e:
+            telegram_sent = e
+        
+        for index in ready:
+            report_filename = batch[index]['report_file']
+            if isinstance(telegram_sent, Exception):
+                outcomes[index] = telegram_sent
+                continue
+            outcomes[index] = {
+                'report_file': report_filename,
+                'artifact_id': batch[index].get('artifact_id'),
+                'download_url': batch[index].get('download_url'),
+                'telegram_sent': telegram_sent,
+                'message': (f'Отчет создан и отправлен в Telegram: {os.path.basename(report_filename)}' if telegram_sent
+                            else f'Отчет создан, но не удалось отправить в Telegram: {os.path.basename(report_filename)}')
+            }
+    return outcomes
+
+def run_period_report_job(params):
+    """Фоновая задача: создает защищенный отчет за период"""
+    from report_protection import create_protected_report_for_period
+    
+    start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date()
+    end_date = datetime.strptime(params['end_date'], '%Y-%m-%d').date()
+    
+    report_path = create_protected_report_for_period(start_date, end_date)
+    if not report_path or not os.path.exists(report_path):
+        raise RuntimeError('Не удалось создать файл отчета')
+    if os.path.getsize(report_path) == 0:
+        raise RuntimeError('Создан пустой файл отчета')
+    
+    logger.info(f"✅ СТРОГО ЗАЩИЩЕННЫЙ отчет за период создан: {report_path}")
+    return {
+        'report_file': report_path,
+        **register_report('period_report', {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        }, report_path),
+        'message': f'Отчет за период с {start_date.strftime("%d.%m.%Y")} по {end_date.strftime("%d.%m.%Y")}',
+        'stores_count': params['stores_count']
+    }
+
+register_job('telegram_report', run_telegram_report_jobs, max_attempts=TELEGRAM_MAX_ATTEMPTS,
+             batch_size=TELEGRAM_BATCH_SIZE)
+register_job('period_report', run_period_report_job)
+
 def get_store_addresses_from_excel():
     """Получает словарь адресов магазинов из Excel файлов (демо версия)"""
     try:
@@ -382,53 +469,24 @@ def get_store_addresses_from_excel():
         return {}
 
 def get_store_details(store_id):
-    """Получает подробную информацию о магазине из базы данных и Excel файлов"""
+    """Получает подробную информацию о магазине из хранилища и Excel файлов"""
     try:
-        try:
-            from database_demo import DEMO_STORES, DEMO_NETWORKS
-            # В демо режиме используем статические данные
-            store_data = next((s for s in DEMO_STORES if s[0] == store_id), None)
-            if not store_data:
-                return None
-                
-            network_data = next((n for n in DEMO_NETWORKS if n[0] == store_data[3]), None)
-            network_name = network_data[1] if network_data else "Неизвестная сеть"
-            
-            store_info = {
-                'name': store_data[1],
-                'address': store_data[2] or 'Адрес не указан',
-                'network_name': network_name,
-                'region_name': 'СЗФО'
-            }
-            
-        except ImportError:
-            from database import cursor
-            
-            # Получаем базовую информацию из БД
-            cursor.execute("""
-                SELECT s.number as name, s.address, n.name as network_name
-                FROM stores s
-                LEFT JOIN networks n ON s.network_id = n.id  
-                WHERE s.id = ?
-            """, (store_id,))
-            
-            result = cursor.fetchone()
-            
-            if not result:
-                return None
-                
-            store_info = {
-                'name': result['name'],
-                'address': result['address'] or 'Адрес не указан',
-                'network_name': result['network_name'],
-                'region_name': 'СЗФО'  # Из названий файлов видно что это СЗФО
-            }
-            
-            # Получаем адрес из Excel файлов
-            store_addresses = get_store_addresses_from_excel()
-            if store_id in store_addresses:
-                store_info['address'] = store_addresses[store_id]
-                logger.info(f"Найден адрес для магазина {store_id}: {store_addresses[store_id]}")
+        result = get_backend().get_store_details(store_id)
+        if not result:
+            return None
+        
+        store_info = {
+            'name': result['name'],
+            'address': result['address'] or 'Адрес не указан',
+            'network_name': result['network_name'] or 'Неизвестная сеть',
+            'region_name': result['region_name'] or 'СЗФО'
+        }
+        
+        # Получаем адрес из Excel файлов
+        store_addresses = get_store_addresses_from_excel()
+        if store_id in store_addresses:
+            store_info['address'] = store_addresses[store_id]
+            logger.info(f"Найден адрес для магазина {store_id}: {store_addresses[store_id]}")
         
         return store_info
             
@@ -459,14 +517,9 @@ def create_professional_excel_report():
         logger.info(f"🛡️ СТРОГО ЗАЩИЩЕННОЕ создание Excel отчета для магазина {store_name} (ID: {store_id})")
         
         # Сначала сохраняем данные в базу
-        try:
-            from database_demo import record_check_results, get_nomenclature_by_store_id
-        except ImportError:
-            from database import record_check_results, get_nomenclature_by_store_id
-        
         try:
             # Получаем всю номенклатуру магазина
-            all_nomenclature = get_nomenclature_by_store_id(store_id)
+            all_nomenclature = get_backend().get_nomenclature_by_store_id(store_id)
             all_products = [item[0] for item in all_nomenclature]  # item[0] это product_name
             
             if not all_products:
@@ -477,7 +530,11 @@ def create_professional_excel_report():
             
             # Сохраняем результаты мониторинга
             today = date.today()
-            record_check_results(store_id, all_products, set(checked_items), today)
+            if get_backend().record_check_results(store_id, all_products, set(checked_items), today) is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Ошибка сохранения в базу данных'
+                }), 500
             
             # Создаем ТОЛЬКО СТРОГО ЗАЩИЩЕННЫЙ профессиональный отчет
             report_filename = create_protected_report_for_period(today, today)
@@ -488,7 +545,11 @@ def create_professional_excel_report():
                 return jsonify({
                     'success': True,
                     'message': f'Профессиональный отчет создан: {os.path.basename(report_filename)}',
-                    'report_file': report_filename
+                    'report_file': report_filename,
+                    **register_report('period_report', {
+                        'start_date': today.isoformat(),
+                        'end_date': today.isoformat()
+                    }, report_filename)
                 })
             else:
                 return jsonify({
@@ -512,22 +573,21 @@ def create_professional_excel_report():
 
 @app.route('/api/download-file')
 def download_file():
-    """API для скачивания файла по полному пути"""
+    """API для скачивания созданного отчета по ID из реестра (?id=)"""
     try:
-        file_path = request.args.get('file')
+        artifact_id = request.args.get('id')
         
-        if not file_path:
-            return jsonify({'error': 'Не указан путь к файлу'}), 400
+        if not artifact_id:
+            return jsonify({'error': 'Не указан ID отчета'}), 400
         
-        if not os.path.exists(file_path):
+        # Отдаются только зарегистрированные файлы, произвольные пути не принимаются
+        artifact = get_artifact(artifact_id)
+        if artifact is None:
             return jsonify({'error': 'Файл не найден'}), 404
         
-        # Разделяем путь на директорию и имя файла
-        directory = os.path.dirname(file_path)
-        filename = os.path.basename(file_path)
-        
-        logger.info(f"Скачивание файла: {filename} из {directory}")
-        return send_from_directory(directory, filename, as_attachment=True)
+        logger.info(f"Скачивание отчета {artifact_id}: {artifact['path']}")
+        return send_file(artifact['path'], as_attachment=True,
+                         download_name=os.path.basename(artifact['path']))
         
     except Exception as e:
         logger.error(f"Ошибка скачивания файла: {e}")
@@ -537,7 +597,7 @@ def download_file():
 def regions():
     """API для получения списка регионов"""
     try:
-        regions_data = get_all_regions()
+        regions_data = get_backend().get_regions_with_counts()
         
         return jsonify({
             'success': True,
@@ -545,9 +605,8 @@ def regions():
                 {
                     'id': region[0],
                     'name': region[1],
-                    'networks_count': len(get_networks_by_region(region[0])),
-                    'stores_count': sum(len(get_stores_by_network(net[0])) 
-                                      for net in get_networks_by_region(region[0]))
+                    'networks_count': region[2],
+                    'stores_count': region[3]
                 }
                 for region in regions_data
             ]
@@ -563,7 +622,7 @@ def regions():
 def networks(region_id):
     """API для получения сетей по региону"""
     try:
-        networks_data = get_networks_by_region(region_id)
+        networks_data = get_backend().get_networks_with_store_counts(region_id)
         
         return jsonify({
             'success': True,
@@ -571,7 +630,7 @@ def networks(region_id):
                 {
                     'id': network[0],
                     'name': network[1],
-                    'stores_count': len(get_stores_by_network(network[0]))
+                    'stores_count': network[2]
                 }
                 for network in networks_data
             ]
@@ -583,12 +642,57 @@ def networks(region_id):
             'error': str(e)
         }), 500
 
+# Кэш справочника: region_id (None - весь) -> (версия, тело ответа, ETag)
+_catalog_cache = {}
+_catalog_cache_lock = threading.Lock()
+
+def get_catalog_document(region_id=None):
+    """Возвращает (версия, JSON, ETag) справочника, пересобирая его только при смене версии."""
+    version = get_backend().get_catalog_version()
+    cached = _catalog_cache.get(region_id)
+    if cached and cached[0] == version:
+        return cached
+    
+    with _catalog_cache_lock:
+        cached = _catalog_cache.get(region_id)
+        if cached and cached[0] == version:
+            return cached
+        catalog = get_backend().get_catalog(region_id)
+        body = json.dumps({'success': True, **catalog}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        cached = (catalog['version'], body, etag)
+        _catalog_cache[region_id] = cached
+        return cached
+
+@app.route('/api/catalog')
+@app.route('/api/catalog/<int:region_id>')
+def catalog(region_id=None):
+    """API для получения справочника регион -> сеть -> магазин одним документом"""
+    try:
+        version, body, etag = get_catalog_document(region_id)
+        headers = {
+            'ETag': f'"{etag}"',
+            'X-Catalog-Version': str(version),
+            'Cache-Control': 'no-cache'
+        }
+        
+        if request.if_none_match.contains_weak(etag):
+            return app.response_class(status=304, headers=headers)
+        
+        return app.response_class(body, mimetype='application/json', headers=headers)
+    except Exception as e:
+        logger.error(f"Ошибка в catalog: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/stores/<int:network_id>')
 def stores(network_id):
     """API для получения магазинов по сети с адресами из Excel"""
     try:
-        stores_data = get_stores_by_network(network_id)
-        checked_stores = get_checked_stores_for_date(date.today())
+        stores_data = get_backend().get_stores_by_network(network_id)
+        checked_stores = get_backend().get_checked_stores_for_date(date.today())
         
         # Получаем адреса из Excel файлов
         store_addresses = get_store_addresses_from_excel()
@@ -632,13 +736,9 @@ def search_stores(network_id):
                 'stores': []
             })
         
-        # Используем функцию поиска из database.py
-        try:
-            from database_demo import find_stores_in_network
-        except ImportError:
-            from database import find_stores_in_network
-        stores_data = find_stores_in_network(network_id, query)
-        checked_stores = get_checked_stores_for_date(date.today())
+        # Используем функцию поиска из хранилища
+        stores_data = get_backend().find_stores_in_network(network_id, query)
+        checked_stores = get_backend().get_checked_stores_for_date(date.today())
         
         # Получаем адреса из Excel файлов
         store_addresses = get_store_addresses_from_excel()
@@ -674,20 +774,16 @@ def search_stores(network_id):
 def nomenclature(store_id):
     """API для получения номенклатуры магазина"""
     try:
-        try:
-            from database_demo import get_nomenclature_by_store_id, get_checked_items_for_store_date
-        except ImportError:
-            from database import get_nomenclature_by_store_id, get_checked_items_for_store_date
         from datetime import date
         
         # Получаем номенклатуру для магазина
-        nomenclature_data = get_nomenclature_by_store_id(store_id)
+        nomenclature_data = get_backend().get_nomenclature_by_store_id(store_id)
         # Исправляем: get_nomenclature_by_store_id возвращает sqlite3.Row объекты
         items = [item[0] for item in nomenclature_data]  # item[0] это product_name
         
         # Получаем уже отмеченные товары за сегодня
         today = date.today()
-        checked_items = get_checked_items_for_store_date(store_id, today)
+        checked_items = get_backend().get_checked_items_for_store_date(store_id, today)
         
         return jsonify({
             'success': True,
@@ -706,9 +802,9 @@ def today_report():
     """API для получения отчета за сегодня"""
     try:
         today = date.today()
-        checked_stores = get_checked_stores_for_date(today)
+        stores_data = get_backend().get_daily_store_summary(today)
         
-        if not checked_stores:
+        if not stores_data:
             return jsonify({
                 'success': True,
                 'date': today.strftime('%d.%m.%Y'),
@@ -716,74 +812,23 @@ def today_report():
                 'message': 'За сегодня еще не было проверок'
             })
         
-        # Получаем детальную информацию о проверенных магазинах
-        try:
-            from database_demo import cursor, monitoring_checks, DEMO_STORES, DEMO_NETWORKS
-            # В демо режиме создаем данные из памяти
-            stores_info = []
-            date_str = today.isoformat()
-            
-            for store_id in checked_stores:
-                # Находим информацию о магазине
-                store_data = next((s for s in DEMO_STORES if s[0] == store_id), None)
-                if not store_data:
-                    continue
-                    
-                # Находим сеть
-                network_data = next((n for n in DEMO_NETWORKS if n[0] == store_data[3]), None)
-                network_name = network_data[1] if network_data else "Неизвестная сеть"
-                
-                # Получаем данные проверки
-                store_checks = monitoring_checks.get(store_id, {})
-                date_checks = store_checks.get(date_str, {})
-                
-                total_checks = len(date_checks)
-                present_items = sum(1 for is_present in date_checks.values() if is_present)
-                
-                stores_info.append({
-                    'id': store_id,
-                    'number': store_data[1],
-                    'address': store_data[2],
-                    'network_name': network_name,
-                    'total_checks': total_checks,
-                    'present_items': present_items,
-                    'completion_rate': round((present_items / total_checks) * 100, 1) if total_checks > 0 else 0
-                })
-                
-        except ImportError:
-            from database import cursor
-            
-            cursor.execute("""
-                SELECT s.id, s.number, s.address, n.name as network_name,
-                       COUNT(mc.id) as total_checks,
-                       SUM(CASE WHEN mc.is_present = 1 THEN 1 ELSE 0 END) as present_items
-                FROM stores s
-                JOIN networks n ON s.network_id = n.id
-                JOIN monitoring_checks mc ON s.id = mc.store_id
-                WHERE mc.check_date = ? AND s.id IN ({})
-                GROUP BY s.id, s.number, s.address, n.name
-                ORDER BY s.number
-            """.format(','.join('?' * len(checked_stores))), 
-            [today] + list(checked_stores))
-            
-            stores_data = cursor.fetchall()
-            
-            stores_info = []
-            for store in stores_data:
-                stores_info.append({
-                    'id': store['id'],
-                    'number': store['number'],
-                    'address': store['address'],
-                    'network_name': store['network_name'],
-                    'total_checks': store['total_checks'],
-                    'present_items': store['present_items'],
-                    'completion_rate': round((store['present_items'] / store['total_checks']) * 100, 1) if store['total_checks'] > 0 else 0
-                })
+        # Дневная сводка уже содержит итоги по каждому магазину
+        stores_info = []
+        for store in stores_data:
+            stores_info.append({
+                'id': store['id'],
+                'number': store['number'],
+                'address': store['address'],
+                'network_name': store['network_name'],
+                'total_checks': store['total_checks'],
+                'present_items': store['present_items'],
+                'completion_rate': round((store['present_items'] / store['total_checks']) * 100, 1) if store['total_checks'] > 0 else 0
+            })
         
         return jsonify({
             'success': True,
             'date': today.strftime('%d.%m.%Y'),
-            'stores_count': len(checked_stores),
+            'stores_count': len(stores_info),
             'stores': stores_info,
             'total_checks': sum(store['total_checks'] for store in stores_info),
             'total_present': sum(store['present_items'] for store in stores_info)
@@ -798,7 +843,7 @@ def today_report():
 
 @app.route('/api/download-report')
 def download_report():
-    """API для скачивания Excel отчета"""
+    """API для скачивания Excel отчета магазина за дату (последний созданный)"""
     try:
         store_id = request.args.get('store_id')
         report_date = request.args.get('date')
@@ -806,54 +851,69 @@ def download_report():
         if not store_id or not report_date:
             return jsonify({'error': 'Не указаны store_id или date'}), 400
         
-        # Ищем последний созданный файл для этого магазина
-        import glob
-        import os
-        
-        logger.info(f"Ищем отчет для магазина {store_id} за дату {report_date}")
-        
-        # Ищем файлы отчетов по дате
-        pattern = f"reports/Отчет_*{report_date}*.xlsx"
-        files = glob.glob(pattern)
+        try:
+            params = {
+                'store_id': int(store_id),
+                'date': datetime.strptime(report_date, '%Y-%m-%d').date().isoformat()
+            }
+        except ValueError:
+            return jsonify({'error': 'Неверный store_id или формат даты (ожидается YYYY-MM-DD)'}), 400
         
-        logger.info(f"Найдено файлов по паттерну '{pattern}': {len(files)}")
-        for f in files:
-            logger.info(f"  - {f}")
+        artifact = find_artifact('store_report', params)
+        if artifact is None:
+            logger.info(f"Отчет для магазина {store_id} за дату {report_date} не найден")
+            return jsonify({'error': 'Отчет не найден'}), 404
         
-        if files:
-            # Берем самый новый файл
-            latest_file = max(files, key=os.path.getctime)
-            logger.info(f"Выбран файл: {latest_file}")
-            
-            if os.path.exists(latest_file):
-                # Разделяем путь на директорию и имя файла
-                directory = os.path.dirname(latest_file)
-                filename = os.path.basename(latest_file)
-                
-                logger.info(f"Отправляем файл: {filename} из директории: {directory}")
-                return send_from_directory(directory, filename, as_attachment=True)
-            else:
-                logger.error(f"Файл не существует: {latest_file}")
-                return jsonify({'error': 'Файл отчета не найден'}), 404
-        else:
-            # Показываем все файлы в папке reports для отладки
-            all_files = glob.glob("reports/*.xlsx")
-            logger.info(f"Все файлы в reports/: {all_files}")
-            return jsonify({'error': f'Отчет не найден. Паттерн: {pattern}'}), 404
+        logger.info(f"Отправляем отчет {artifact['id']}: {artifact['path']}")
+        return send_file(artifact['path'], as_attachment=True,
+                         download_name=os.path.basename(artifact['path']))
             
     except Exception as e:
         logger.error(f"Ошибка скачивания отчета: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/coverage')
+def coverage():
+    """API покрытия периода: за какие дни и по каким магазинам есть проверки (?start=&end=)"""
+    try:
+        start_date_str = request.args.get('start') or request.args.get('start_date')
+        end_date_str = request.args.get('end') or request.args.get('end_date')
+        
+        if not start_date_str or not end_date_str:
+            return jsonify({'success': False, 'error': 'Не указаны даты периода'}), 400
+        
+        try:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Неверный формат даты: {str(e)}'}), 400
+        
+        if end_date < start_date:
+            return jsonify({'success': False, 'error': 'Дата окончания раньше даты начала'}), 400
+        
+        days = get_backend().get_checked_stores_for_range(start_date, end_date)
+        all_stores = set().union(*days.values())
+        
+        return jsonify({
+            'success': True,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'days_total': (end_date - start_date).days + 1,
+            'days_with_data': len(days),
+            'stores_count': len(all_stores),
+            'days': [
+                {'date': day.isoformat(), 'stores_count': len(stores), 'store_ids': sorted(stores)}
+                for day, stores in days.items()
+            ]
+        })
+    except Exception as e:
+        logger.error(f"Ошибка получения покрытия периода: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/generate-period-report', methods=['POST'])
 def generate_period_report():
     """API для создания СТРОГО ЗАЩИЩЕННОГО отчета за период"""
     try:
-        from report_protection import create_protected_report_for_period
-        from database import get_checked_stores_for_date
-        from datetime import datetime
-        import os
-        
         data = request.get_json()
         start_date_str = data.get('start_date')
         end_date_str = data.get('end_date')
@@ -876,14 +936,8 @@ def generate_period_report():
         
         logger.info(f"🛡️ СТРОГО ЗАЩИЩЕННОЕ создание отчета за период с {start_date} по {end_date}")
         
-        # Проверяем наличие данных за период
-        from datetime import timedelta
-        all_checked_stores = set()
-        current_date = start_date
-        while current_date <= end_date:
-            checked_stores = get_checked_stores_for_date(current_date)
-            all_checked_stores.update(checked_stores)
-            current_date += timedelta(days=1)
+        # Проверяем наличие данных за период одним запросом
+        all_checked_stores = set().union(*get_backend().get_checked_stores_for_range(start_date, end_date).values())
         
         if not all_checked_stores:
             return jsonify({
@@ -893,32 +947,22 @@ def generate_period_report():
         
         logger.info(f"Найдено {len(all_checked_stores)} проверенных магазинов за период")
         
-        # Создаем ТОЛЬКО СТРОГО ЗАЩИЩЕННЫЙ профессиональный отчет
-        report_path = create_protected_report_for_period(start_date, end_date)
-        logger.info(f"✅ СТРОГО ЗАЩИЩЕННЫЙ отчет за период создан: {report_path}")
+        # Многодневный отчет строится в фоне; клиент следит за задачей по job_id
+        job_id = enqueue_job('period_report', {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'stores_count': len(all_checked_stores)
+        })
         
-        if os.path.exists(report_path):
-            file_size = os.path.getsize(report_path)
-            logger.info(f"Размер файла: {file_size} байт")
-            
-            if file_size == 0:
-                logger.error("Создан пустой файл отчета")
-                return jsonify({
-                    'success': False,
-                    'error': 'Создан пустой файл отчета'
-                }), 500
-            
-            return jsonify({
-                'success': True,
-                'message': f'Отчет за период с {start_date.strftime("%d.%m.%Y")} по {end_date.strftime("%d.%m.%Y")}',
-                'report_file': report_path,
-                'stores_count': len(all_checked_stores)
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Не удалось создать файл отчета'
-            }), 500
+        return jsonify({
+            'success': True,
+            'message': f'Отчет за период с {start_date.strftime("%d.%m.%Y")} по {end_date.strftime("%d.%m.%Y")} создается',
+            'job_id': job_id,
+            # В режиме JOB_MODE=inline задача к этому моменту уже выполнена
+            'status': get_job(job_id)['status'],
+            'status_url': f'/api/jobs/{job_id}',
+            'stores_count': len(all_checked_stores)
+        }), 202
             
     except Exception as e:
         logger.error(f"Ошибка в generate_period_report: {e}")
@@ -927,14 +971,54 @@ def generate_period_report():
             'error': f'Внутренняя ошибка сервера: {str(e)}'
         }), 500
 
+def stream_period_report(start_date, end_date, download_name):
+    """Потоковый ответ с отчетом за период (chunked, без временного файла) или None, если данных нет.
+    
+    Формат выбирается параметром ?format=xlsx (по умолчанию) или csv.
+    Готовый отчет кэшируется: пока за даты периода ничего не записано,
+    повторный запрос отдается файлом из кэша.
+    """
+    from flask import Response, stream_with_context
+    from exports import period_chunks, CSV_MIMETYPE, XLSX_MIMETYPE
+    from report_cache import period_version, report_cache
+    
+    export_format = request.args.get('format', 'xlsx').lower()
+    if export_format not in ('xlsx', 'csv'):
+        raise ValueError(f"Неизвестный формат отчета: {export_format}")
+    
+    headers = {
+        'Content-Disposition': f'attachment; filename="{download_name}.{export_format}"',
+        'Cache-Control': 'no-cache',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET',
+        'Access-Control-Allow-Headers': 'Content-Type'
+    }
+    
+    # Пустой период - 404, а не пустой файл (один запрос по дневной сводке)
+    backend = get_backend()
+    if not backend.get_checked_stores_for_range(start_date, end_date):
+        return None
+    
+    # Версия читается до строк: запись во время выгрузки даст новую версию, а не устаревший кэш
+    cache_kind = f"period_{export_format}"
+    cache_params = {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}
+    version = period_version(backend, start_date, end_date)
+    cached_path = report_cache.lookup(report_cache.make_key(cache_kind, cache_params, version))
+    if cached_path is not None:
+        logger.info(f"Отчет из кэша: {download_name}.{export_format}")
+        response = send_file(cached_path, mimetype=CSV_MIMETYPE if export_format == 'csv' else XLSX_MIMETYPE)
+        response.headers.update(headers)
+        return response
+    
+    chunks, mimetype, extension = period_chunks(export_format, backend, start_date, end_date)
+    chunks = report_cache.tee(cache_kind, cache_params, version, chunks, extension, name=download_name)
+    logger.info(f"Потоковая выгрузка отчета: {download_name}.{extension}")
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
 @app.route('/api/download-period-report')
 def download_period_report():
     """API для скачивания Excel отчета за период"""
     try:
-        from database import create_report_for_period
-        from datetime import datetime
-        import os
-        
         start_date_str = request.args.get('start_date')
         end_date_str = request.args.get('end_date')
         
@@ -950,28 +1034,13 @@ def download_period_report():
         
         logger.info(f"Скачивание отчета за период с {start_date} по {end_date}")
         
-        # Создаем отчет
-        report_path = create_report_for_period(start_date, end_date)
-        logger.info(f"Отчет создан: {report_path}")
-        
-        if os.path.exists(report_path):
-            file_size = os.path.getsize(report_path)
-            logger.info(f"Размер файла: {file_size} байт")
-            
-            if file_size == 0:
-                logger.error("Создан пустой файл отчета")
-                return jsonify({'error': 'Создан пустой файл отчета'}), 500
-            
-            # Разделяем путь на директорию и имя файла
-            directory = os.path.dirname(report_path)
-            filename = os.path.basename(report_path)
-            
-            logger.info(f"Отправляем файл: {filename} из директории: {directory}")
-            return send_from_directory(directory, filename, as_attachment=True)
-        else:
-            logger.error(f"Файл не существует: {report_path}")
-            return jsonify({'error': 'Файл отчета не найден'}), 404
+        response = stream_period_report(start_date, end_date, f"Report_{start_date.isoformat()}_{end_date.isoformat()}")
+        if response is None:
+            return jsonify({'error': 'Нет данных за выбранный период'}), 404
+        return response
             
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Ошибка скачивания отчета за период: {e}")
         return jsonify({'error': str(e)}), 500
@@ -980,62 +1049,25 @@ def download_period_report():
 def download_today_report():
     """API для скачивания Excel отчета за сегодня"""
     try:
-        from database import create_report_for_period
-        from flask import Response
-        import glob
-        import os
-        
         today = date.today()
         logger.info(f"Создание отчета за сегодня: {today}")
         
         # Проверяем наличие данных
-        checked_stores = get_checked_stores_for_date(today)
+        checked_stores = get_backend().get_checked_stores_for_date(today)
         if not checked_stores:
             logger.warning("Нет данных за сегодня для создания отчета")
             return jsonify({'error': 'Нет данных за сегодня для создания отчета'}), 404
         
         logger.info(f"Найдено {len(checked_stores)} проверенных магазинов")
         
-        # Создаем отчет
-        report_path = create_report_for_period(today, today)
-        logger.info(f"Отчет создан: {report_path}")
-        
-        if os.path.exists(report_path):
-            file_size = os.path.getsize(report_path)
-            logger.info(f"Размер файла: {file_size} байт")
-            
-            if file_size == 0:
-                logger.error("Создан пустой файл отчета")
-                return jsonify({'error': 'Создан пустой файл отчета'}), 500
-            
-            # Читаем файл в память
-            with open(report_path, 'rb') as f:
-                file_data = f.read()
-            
-            # Создаем имя файла для скачивания (только латинские символы)
-            download_filename = f"Report_today_{today.strftime('%Y-%m-%d')}.xlsx"
-            
-            logger.info(f"Отправляем файл: {download_filename}, размер: {len(file_data)} байт")
-            
-            # Создаем ответ с правильными заголовками
-            response = Response(
-                file_data,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                headers={
-                    'Content-Disposition': f'attachment; filename="{download_filename}"',
-                    'Content-Length': str(len(file_data)),
-                    'Cache-Control': 'no-cache',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET',
-                    'Access-Control-Allow-Headers': 'Content-Type'
-                }
-            )
-            
-            return response
-        else:
-            logger.error(f"Файл отчета не создан: {report_path}")
-            return jsonify({'error': 'Не удалось создать файл отчета'}), 500
+        # Отчет кодируется и отправляется по мере чтения строк, без файла на диске
+        response = stream_period_report(today, today, f"Report_today_{today.strftime('%Y-%m-%d')}")
+        if response is None:
+            return jsonify({'error': 'Нет данных за сегодня для создания отчета'}), 404
+        return response
             
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Ошибка создания/скачивания отчета за сегодня: {e}")
         return jsonify({'error': f'Ошибка создания отчета: {str(e)}'}), 500
@@ -1044,14 +1076,13 @@ def download_today_report():
 def send_today_report():
     """API для отправки отчета за сегодня в Telegram"""
     try:
-        from database import create_report_for_period
         import os
         
         today = date.today()
         logger.info(f"Отправка отчета за сегодня: {today}")
         
         # Проверяем наличие данных
-        checked_stores = get_checked_stores_for_date(today)
+        checked_stores = get_backend().get_checked_stores_for_date(today)
         if not checked_stores:
             return jsonify({
                 'success': False,
@@ -1059,16 +1090,17 @@ def send_today_report():
             })
         
         # Создаем отчет
-        report_path = create_report_for_period(today, today)
+        report_path = get_backend().create_report_for_period(today, today)
         logger.info(f"Отчет для отправки создан: {report_path}")
         
-        if os.path.exists(report_path):
+        if report_path and os.path.exists(report_path):
             # Здесь можно добавить логику отправки в Telegram
             # Пока просто возвращаем успех
             return jsonify({
                 'success': True,
                 'message': f'Отчет за {today.strftime("%d.%m.%Y")} готов к отправке',
                 'file_path': report_path,
+                **register_report('today_report', {'date': today.isoformat()}, report_path),
                 'stores_count': len(checked_stores)
             })
         else:
@@ -1084,21 +1116,49 @@ def send_today_report():
             'error': f'Ошибка отправки отчета: {str(e)}'
         })
 
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """API для получения состояния фоновой задачи"""
+    try:
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': 'Задача не найдена'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'job': job
+        })
+    except Exception as e:
+        logger.error(f"Ошибка получения задачи {job_id}: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/health')
 def health_check():
     """API для проверки состояния сервера"""
     try:
-        from database import cursor
+        from backend import get_backend_name
+        from report_cache import get_report_cache_stats
         
-        # Проверяем подключение к БД
-        cursor.execute("SELECT COUNT(*) as count FROM stores")
-        stores_count = cursor.fetchone()['count']
+        # Проверяем подключение к хранилищу
+        backend = get_backend()
+        stores_count = backend.get_stores_count()
         
         return jsonify({
             'status': 'healthy',
             'message': 'Сервер работает нормально',
             'database': 'connected',
+            'backend': get_backend_name(),
             'stores_count': stores_count,
+            **backend.get_storage_stats(),
+            'background_jobs': job_queue.stats(),
+            'report_cache': get_report_cache_stats(),
+            'report_artifacts': artifact_registry.stats(),
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -1109,6 +1169,36 @@ def health_check():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+@app.route('/api/admin/query-stats')
+def admin_query_stats():
+    """API администратора: статистика SQL запросов (гистограммы, медленные запросы)"""
+    try:
+        # Без настроенного токена статистика закрыта
+        admin_token = os.getenv('ADMIN_TOKEN')
+        if not admin_token or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+            return jsonify({'success': False, 'error': 'Доступ запрещен'}), 403
+        
+        # Статистику SQL ведет только SQLite хранилище
+        backend = get_backend()
+        get_query_stats = getattr(backend, 'get_query_stats', None)
+        if get_query_stats is None:
+            return jsonify({'success': False, 'error': 'Статистика SQL запросов недоступна для этого хранилища'}), 404
+        
+        query_stats = get_query_stats()
+        if request.args.get('reset') == '1':
+            backend.reset_query_stats()
+        
+        return jsonify({
+            'success': True,
+            **query_stats
+        })
+    except Exception as e:
+        logger.error(f"Ошибка получения статистики запросов: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/get-last-price', methods=['POST'])
 def get_last_price_api():
     """API для получения последней цены товара в сети"""
@@ -1124,7 +1214,7 @@ def get_last_price_api():
             }), 400
         
         logger.info(f"Поиск последней цены для товара '{product_name}' в сети {network_id}")
-        last_price = get_last_price_in_network(network_id, product_name)
+        last_price = get_backend().get_last_price_in_network(network_id, product_name)
         
         if last_price:
             logger.info(f"Найдена цена: {last_price['regular_price']} руб.")
@@ -1166,7 +1256,7 @@ def save_price_api():
                 }), 400
         
         # Сохраняем цену и остатки
-        result = save_price_check(
+        result = get_backend().save_price_check(
             store_id=data['store_id'],
             product_name=data['product_name'],
             check_date=date.today(),
@@ -1195,6 +1285,147 @@ def save_price_api():
             'error': str(e)
         }), 500
 
+def parse_bool(value):
+    """Флаг из JSON: true/false, 1/0 или их строки. Возвращает None для прочих значений."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false', '1', '0'):
+        return value.strip().lower() in ('true', '1')
+    return None
+
+def parse_store_id(value):
+    """ID магазина из JSON: положительное целое (или его строка). Возвращает None для прочих значений."""
+    if isinstance(value, (bool, float)):
+        return None
+    try:
+        store_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return store_id if store_id > 0 else None
+
+def validate_price_record(item):
+    """Проверяет одну запись цены/остатка. Возвращает (запись, ошибка)."""
+    if not isinstance(item, dict):
+        return None, 'Запись должна быть объектом'
+    
+    product_name = item.get('product_name')
+    if not isinstance(product_name, str) or not product_name.strip():
+        return None, 'Не указано название товара'
+    
+    has_promo = parse_bool(item.get('has_promo', False))
+    if has_promo is None:
+        return None, f"Неверное значение has_promo: {item.get('has_promo')}"
+    
+    record = {
+        'product_name': product_name,
+        'has_promo': has_promo,
+        'price_notes': item.get('price_notes') or ''
+    }
+    
+    for field in ('regular_price', 'promo_price'):
+        value = item.get(field)
+        if value is None or value == '':
+            record[field] = None
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None, f'Неверное значение {field}: {value}'
+        # NaN и бесконечность не сохраняются: из них не получится корректный JSON
+        if not math.isfinite(value):
+            return None, f'Неверное значение {field}: {value}'
+        if value < 0:
+            return None, f'Отрицательное значение {field}: {value}'
+        record[field] = value
+    
+    stock = item.get('stock_quantity')
+    if stock is None or stock == '':
+        record['stock_quantity'] = None
+    else:
+        try:
+            stock = int(stock)
+        except (TypeError, ValueError, OverflowError):
+            return None, f'Неверное значение stock_quantity: {stock}'
+        if stock < 0:
+            return None, f'Отрицательное значение stock_quantity: {stock}'
+        record['stock_quantity'] = stock
+    
+    return record, None
+
+@app.route('/api/save-prices', methods=['POST'])
+def save_prices_api():
+    """API для пакетного сохранения цен и остатков одного магазина за дату"""
+    try:
+        data = request.get_json()
+        if not data or not data.get('store_id'):
+            return jsonify({
+                'success': False,
+                'error': 'Отсутствует обязательное поле: store_id'
+            }), 400
+        
+        store_id = parse_store_id(data['store_id'])
+        if store_id is None:
+            return jsonify({
+                'success': False,
+                'error': f"Неверное значение store_id: {data['store_id']}"
+            }), 400
+        
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'success': False,
+                'error': 'Не передан список items'
+            }), 400
+        
+        check_date = date.today()
+        if data.get('check_date'):
+            try:
+                check_date = datetime.strptime(data['check_date'], '%Y-%m-%d').date()
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'Неверный формат даты: {str(e)}'
+                }), 400
+        
+        # Проверяем все записи, сохраняем только корректные
+        results = []
+        records = []
+        for index, item in enumerate(items):
+            record, error = validate_price_record(item)
+            if error:
+                results.append({'index': index, 'status': 'invalid', 'error': error})
+            else:
+                results.append({'index': index, 'product_name': record['product_name'], 'status': 'saved'})
+                records.append(record)
+        
+        status_code = 200 if records else 400
+        saved = get_backend().save_price_checks(store_id, check_date, records)
+        if saved is None:
+            for result in results:
+                if result['status'] == 'saved':
+                    result['status'] = 'error'
+                    result['error'] = 'Ошибка сохранения цены'
+            saved = 0
+            status_code = 500
+        
+        logger.info(f"Пакетное сохранение цен для магазина {store_id}: {saved}/{len(items)}")
+        
+        return jsonify({
+            'success': saved == len(items),
+            'saved': saved,
+            'failed': len(items) - saved,
+            'results': results
+        }), status_code
+            
+    except Exception as e:
+        logger.error(f"Ошибка пакетного сохранения цен: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/get-price', methods=['POST'])
 def get_price_api():
     """API для получения цены товара за сегодня"""
@@ -1209,7 +1440,7 @@ def get_price_api():
                 'error': 'Не указаны store_id или product_name'
             }), 400
         
-        price_data = get_price_check(store_id, product_name, date.today())
+        price_data = get_backend().get_price_check(store_id, product_name, date.today())
         if price_data:
             return jsonify({
                 'success': True,
@@ -1233,11 +1464,19 @@ def get_price_api():
         }), 500
 
 if __name__ == '__main__':
-    # Проверяем наличие базы данных
-    if not os.path.exists('bot_database.db'):
+    from backend import get_backend_name
+    
+    # Проверяем наличие базы данных (нужна только локальному хранилищу)
+    if get_backend_name() == 'sqlite' and not os.path.exists(os.getenv('DB_PATH', 'bot_database.db')):
         logger.error("База данных не найдена!")
         exit(1)
     
+    # Применяем недостающие миграции схемы
+    get_backend().create_tables_if_not_exist()
+    
+    # Задачи, не завершенные до перезапуска, берутся в работу сразу, без новой постановки
+    start_jobs()
+    
     logger.info("Запуск Web App сервера...")
     logger.info("Web App будет доступен по адресу: http://localhost:5000")
     
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+# artifacts.py - Registry of generated report files with keyed lookup and TTL/quota sweeping
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+from jobs import STATE_DB_PATH
+
+ARTIFACT_TTL_HOURS = float(os.getenv('ARTIFACT_TTL_HOURS', '72'))
+ARTIFACT_MAX_MB = float(os.getenv('ARTIFACT_MAX_MB', '500'))
+ARTIFACT_SWEEP_INTERVAL_S = float(os.getenv('ARTIFACT_SWEEP_INTERVAL_S', '600'))
+
+
+def params_key(params: dict) -> str:
+    """Канонический ключ параметров отчета (одинаковые параметры - один ключ)."""
+    return json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ArtifactRegistry:
+    """Реестр созданных файлов отчетов в SQLite (та же база состояния, что и у очереди задач).
+
+    Каждый файл записывается с типом, параметрами (магазин, дата, период),
+    путем, размером, временем создания и контрольной суммой. Скачивание -
+    поиск по ID или по (тип, параметры), а не по маске имени файла.
+    Фоновый поток удаляет файлы старше ``ttl_hours`` и самые старые сверх
+    ``max_bytes``. Файлы с ``owned=False`` принадлежат другому хранилищу
+    (например, кэшу отчетов): их строки удаляются, а сами файлы - нет.
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH, ttl_hours: float = ARTIFACT_TTL_HOURS,
+                 max_bytes: int = int(ARTIFACT_MAX_MB * 2 ** 20), sweep_interval: float = ARTIFACT_SWEEP_INTERVAL_S):
+        self.path = path
+        self.ttl_hours = ttl_hours
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._sweeper = None
+        self._stopping = threading.Event()
+        self.swept = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def _init_db(self):
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            with closing(self._connect()) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS artifacts (
+                        id TEXT PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        params_key TEXT NOT NULL,
+                        path TEXT NOT NULL UNIQUE,
+                        size INTEGER NOT NULL,
+                        checksum TEXT NOT NULL,
+                        owned INTEGER NOT NULL DEFAULT 1,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_artifacts_lookup
+                    ON artifacts (kind, params_key, created_at)
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_created ON artifacts (created_at)")
+            self._initialized = True
+        self._ensure_sweeper()
+
+    def _ensure_sweeper(self):
+        if self.sweep_interval <= 0:
+            return
+        with self._lock:
+            if self._sweeper is None or not self._sweeper.is_alive():
+                self._sweeper = threading.Thread(target=self._sweep_loop, name='artifact-sweeper', daemon=True)
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while not self._stopping.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"Ошибка очистки файлов отчетов: {e}")
+
+    @staticmethod
+    def _to_dict(row):
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'params': json.loads(row['params_key']),
+            'path': row['path'],
+            'size': row['size'],
+            'checksum': row['checksum'],
+            'created_at': row['created_at'],
+        }
+
+    def register(self, kind: str, params: dict, path: str, owned: bool = True) -> dict:
+        """Записывает созданный файл в реестр и возвращает его запись (с ID).
+
+        Повторная регистрация того же пути обновляет запись, ID сохраняется.
+        """
+        self._init_db()
+        path = os.path.abspath(path)
+        size = os.path.getsize(path)
+        checksum = file_checksum(path)
+        with closing(self._connect()) as conn:
+            # Без RETURNING: он появился только в SQLite 3.35
+            conn.execute("""
+                INSERT INTO artifacts (id, kind, params_key, path, size, checksum, owned, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET
+                    kind = excluded.kind,
+                    params_key = excluded.params_key,
+                    size = excluded.size,
+                    checksum = excluded.checksum,
+                    owned = excluded.owned,
+                    created_at = excluded.created_at
+            """, (uuid.uuid4().hex, kind, params_key(params), path, size, checksum, int(owned), time.time()))
+            row = conn.execute("SELECT * FROM artifacts WHERE path = ?", (path,)).fetchone()
+        logging.info(f"Отчет {kind} зарегистрирован: {row['id']} ({path})")
+        return self._to_dict(row)
+
+    def _existing(self, conn, row):
+        """Запись, если файл на месте; запись об удаленном файле убирается."""
+        if row is None:
+            return None
+        if not os.path.exists(row['path']):
+            conn.execute("DELETE FROM artifacts WHERE id = ?", (row['id'],))
+            return None
+        return self._to_dict(row)
+
+    def get(self, artifact_id: str):
+        """Запись по ID или None (неизвестный ID или файл уже удален)."""
+        self._init_db()
+        with closing(self._connect()) as conn:
+            return self._existing(conn, conn.execute("SELECT * FROM artifacts WHERE id = ?", (artifact_id,)).fetchone())
+
+    def find_latest(self, kind: str, params: dict):
+        """Самый свежий файл данного типа с данными параметрами или None."""
+        self._init_db()
+        with closing(self._connect()) as conn:
+            row = conn.execute("""
+                SELECT * FROM artifacts
+                WHERE kind = ? AND params_key = ?
+                ORDER BY created_at DESC
+                LIMIT 1
+            """, (kind, params_key(params))).fetchone()
+            return self._existing(conn, row)
+
+    def _remove(self, conn, row):
+        if row['owned']:
+            try:
+                os.remove(row['path'])
+            except FileNotFoundError:
+                pass
+        conn.execute("DELETE FROM artifacts WHERE id = ?", (row['id'],))
+        self.swept += 1
+
+    def sweep(self, now: float = None) -> dict:
+        """Удаляет просроченные файлы и самые старые сверх квоты. Возвращает счетчики."""
+        self._init_db()
+        now = time.time() if now is None else now
+        expired = over_quota = missing = 0
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM artifacts ORDER BY created_at").fetchall()
+            live = []
+            for row in rows:
+                if row['created_at'] < now - self.ttl_hours * 3600:
+                    self._remove(conn, row)
+                    expired += 1
+                elif not os.path.exists(row['path']):
+                    conn.execute("DELETE FROM artifacts WHERE id = ?", (row['id'],))
+                    missing += 1
+                elif row['owned']:
+                    live.append(row)
+
+            # Квота считается по своим файлам, от самых старых
+            total = sum(row['size'] for row in live)
+            for row in live:
+                if total <= self.max_bytes:
+                    break
+                self._remove(conn, row)
+                total -= row['size']
+                over_quota += 1
+
+        if expired or over_quota or missing:
+            logging.info(f"Очистка отчетов: просрочено {expired}, сверх квоты {over_quota}, "
+                         f"пропало файлов {missing}")
+        return {'expired': expired, 'over_quota': over_quota, 'missing': missing}
+
+    def stats(self):
+        self._init_db()
+        with closing(self._connect()) as conn:
+            count, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(CASE WHEN owned THEN size END), 0) FROM artifacts"
+            ).fetchone()
+        return {'artifacts': count, 'bytes': size, 'max_bytes': self.max_bytes, 'swept': self.swept}
+
+    def close(self, timeout: float = 5):
+        """Останавливает поток очистки."""
+        self._stopping.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout)
+        self._sweeper = None
+        self._stopping.clear()
+
+
+artifact_registry = ArtifactRegistry()
+
+
+def register_artifact(kind: str, params: dict, path: str, owned: bool = True) -> dict:
+    """Записывает файл отчета в общий реестр и возвращает запись с ID."""
+    return artifact_registry.register(kind, params, path, owned)
+
+
+def get_artifact(artifact_id: str):
+    """Запись реестра по ID или None."""
+    return artifact_registry.get(artifact_id)
+
+
+def find_artifact(kind: str, params: dict):
+    """Самый свежий файл отчета с данными типом и параметрами или None."""
+    return artifact_registry.find_latest(kind, params)
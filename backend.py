@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# backend.py - Storage backend interface and lazy selection from configuration
+import importlib
+import logging
+import os
+import threading
+from datetime import date
+from typing import Protocol
+
+# Имя хранилища из STORAGE_BACKEND -> модуль; можно указать и имя своего модуля
+BACKENDS = {
+    'demo': 'database_demo',
+    'sqlite': 'database',
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class StorageBackend(Protocol):
+    """Интерфейс хранилища данных мониторинга.
+
+    Реализуется модулем (database_demo, database): все функции модульные.
+    Соответствие контракту проверяет benchmarks/backend_contract.py.
+    """
+
+    def init_backend(self) -> None:
+        """Ленивая инициализация при первом обращении."""
+
+    def create_tables_if_not_exist(self) -> None:
+        """Подготовка схемы хранилища."""
+
+    # Справочник регион -> сеть -> магазин
+    def get_all_regions(self): ...
+    def get_networks_by_region(self, region_id: int): ...
+    def get_stores_by_network(self, network_id: int): ...
+    def get_regions_with_counts(self): ...
+    def get_networks_with_store_counts(self, region_id: int): ...
+    def get_catalog_version(self) -> int: ...
+    def get_catalog(self, region_id: int = None) -> dict: ...
+    def find_stores_in_network(self, network_id: int, query: str): ...
+    def get_store_details(self, store_id: int) -> dict: ...
+    def get_stores_count(self) -> int: ...
+
+    # Проверки наличия товаров
+    def get_nomenclature_by_store_id(self, store_id: int): ...
+    def get_checked_stores_for_date(self, check_date: date) -> set: ...
+    def get_checked_stores_for_range(self, start_date: date, end_date: date) -> dict: ...
+    def get_checked_items_for_store_date(self, store_id: int, check_date: date) -> set: ...
+    def record_check_results(self, store_id: int, all_products: list, checked_products: set,
+                             check_date: date): ...
+    def get_daily_store_summary(self, check_date: date) -> list: ...
+
+    # Цены и остатки
+    def save_price_check(self, store_id: int, product_name: str, check_date: date,
+                         regular_price: float = None, promo_price: float = None,
+                         has_promo: bool = False, stock_quantity: int = None,
+                         price_notes: str = None) -> bool: ...
+    def save_price_checks(self, store_id: int, check_date: date, records: list): ...
+    def get_price_check(self, store_id: int, product_name: str, check_date: date): ...
+    def get_last_price_in_network(self, network_id: int, product_name: str): ...
+
+    # Отчеты
+    def get_store_epoch(self) -> str: ...
+    def get_data_version(self, start_date: date, end_date: date) -> int: ...
+    def iter_period_rows(self, start_date: date, end_date: date, network_id: int = None): ...
+    def create_store_report(self, store_id: int, report_date: date, store_name: str = None): ...
+    def create_report_for_period(self, start_date: date, end_date: date): ...
+
+    def get_storage_stats(self) -> dict: ...
+
+
+BACKEND_FUNCTIONS = tuple(name for name in vars(StorageBackend)
+                          if not name.startswith('_') and callable(vars(StorageBackend)[name]))
+
+
+def get_backend_name() -> str:
+    """Имя хранилища из переменной окружения STORAGE_BACKEND (по умолчанию demo)."""
+    return os.getenv('STORAGE_BACKEND', 'demo').strip().lower()
+
+
+def load_backend(name: str) -> StorageBackend:
+    """Импортирует модуль хранилища и проверяет, что он реализует весь интерфейс."""
+    module = importlib.import_module(BACKENDS.get(name, name))
+    missing = [function for function in BACKEND_FUNCTIONS if not callable(getattr(module, function, None))]
+    if missing:
+        raise TypeError(f"Хранилище '{name}' не реализует: {', '.join(missing)}")
+    return module
+
+
+def get_backend() -> StorageBackend:
+    """Возвращает хранилище, выбранное один раз из конфигурации и инициализированное при первом обращении."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = get_backend_name()
+                module = load_backend(name)
+                module.init_backend()
+                logging.info(f"Используется хранилище: {name} ({module.__name__})")
+                _backend = module
+    return _backend
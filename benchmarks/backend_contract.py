@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Контрактные проверки хранилищ (backend.StorageBackend) и их бенчмарк.
+
+Каждое хранилище получает одинаковые демо данные (регионы, сети, магазины,
+номенклатура) и проходит один и тот же набор проверок; для каждой
+проверки печатается медианное время. Код выхода 1, если хоть одна
+проверка не прошла.
+
+    python benchmarks/backend_contract.py --backend demo --backend sqlite --iterations 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import BACKEND_FUNCTIONS, load_backend  # noqa: E402
+
+# Дни для проверок записи - далеко от образцов данных демо режима
+BASE_DAY = date(2001, 1, 1)
+
+
+def seed_sqlite(backend):
+    """Заполняет пустую SQLite БД тем же справочником, что у демо хранилища."""
+    import database_demo as demo
+
+    backend.create_tables_if_not_exist()
+    with backend.get_connection() as conn:
+        conn.executemany("INSERT INTO regions (id, name) VALUES (?, ?)", demo.DEMO_REGIONS)
+        conn.executemany("INSERT INTO networks (id, name, region_id) VALUES (?, ?, ?)", demo.DEMO_NETWORKS)
+        conn.executemany("INSERT INTO stores (id, number, address, network_id) VALUES (?, ?, ?, ?)", demo.DEMO_STORES)
+        names = sorted({name for products in demo.DEMO_NOMENCLATURE.values() for name in products})
+        conn.executemany("INSERT OR IGNORE INTO products (name) VALUES (?)", [(name,) for name in names])
+        product_ids = dict(conn.execute("SELECT name, id FROM products").fetchall())
+        conn.executemany(
+            "INSERT INTO nomenclature (store_id, product_id) VALUES (?, ?)",
+            [(store_id, product_ids[name])
+             for store_id, products in demo.DEMO_NOMENCLATURE.items() for name in products]
+        )
+        conn.commit()
+
+
+def open_backend(name, tmp):
+    if name == 'sqlite':
+        os.environ['DB_PATH'] = os.path.join(tmp, 'contract.db')
+        os.environ['DB_WRITER_MODE'] = 'sync'
+    backend = load_backend(name)
+    backend.init_backend()
+    if name == 'sqlite':
+        seed_sqlite(backend)
+    return backend
+
+
+# --- Проверки контракта: fn(backend, iteration), исключение = провал ---
+
+def check_interface(backend, iteration):
+    missing = [name for name in BACKEND_FUNCTIONS if not callable(getattr(backend, name, None))]
+    assert not missing, f"нет функций: {missing}"
+
+
+def check_hierarchy_counts(backend, iteration):
+    regions = backend.get_regions_with_counts()
+    assert [r[0] for r in regions] == [r[0] for r in backend.get_all_regions()]
+    for region in regions:
+        networks = backend.get_networks_by_region(region[0])
+        with_counts = backend.get_networks_with_store_counts(region[0])
+        assert region[2] == len(networks), f"регион {region[0]}: число сетей"
+        assert [n[0] for n in with_counts] == [n[0] for n in networks]
+        for network in with_counts:
+            assert network[2] == len(backend.get_stores_by_network(network[0])), f"сеть {network[0]}: число магазинов"
+        assert region[3] == sum(n[2] for n in with_counts), f"регион {region[0]}: число магазинов"
+
+
+def check_catalog(backend, iteration):
+    catalog = backend.get_catalog()
+    assert catalog['version'] == backend.get_catalog_version()
+    assert catalog['store_fields'] == ['id', 'number', 'address']
+    stores = sum(len(network['stores']) for region in catalog['regions'] for network in region['networks'])
+    assert stores == backend.get_stores_count()
+    region_id = catalog['regions'][0]['id']
+    assert backend.get_catalog(region_id)['regions'] == catalog['regions'][:1]
+
+
+def check_store_details(backend, iteration):
+    details = backend.get_store_details(1)
+    assert details['name'] == '001' and details['network_name'] == 'Розница' and details['region_name'] == 'СЗФО'
+    assert backend.get_store_details(999999) is None
+
+
+def check_search(backend, iteration):
+    numbers = [store['number'] for store in backend.find_stores_in_network(2, '10')]
+    assert numbers and numbers == sorted(numbers) and all('10' in number for number in numbers), numbers
+    assert backend.find_stores_in_network(2, 'пушкина')[0]['number'] == '101'
+
+
+def check_record_results(backend, iteration):
+    day = BASE_DAY + timedelta(days=iteration)
+    products = [item[0] for item in backend.get_nomenclature_by_store_id(1)]
+    checked = set(products[:3])
+    assert backend.record_check_results(1, products, checked, day) == len(products)
+    assert backend.record_check_results(1, products, checked, day) == 0, "повторная запись должна быть пустой"
+    assert backend.get_checked_items_for_store_date(1, day) == checked
+    assert 1 in backend.get_checked_stores_for_date(day)
+    coverage = backend.get_checked_stores_for_range(day - timedelta(days=1), day + timedelta(days=1))
+    assert 1 in coverage[day] and all(stores for stores in coverage.values()), coverage
+    assert list(coverage) == sorted(coverage)
+    summary = {store['id']: store for store in backend.get_daily_store_summary(day)}
+    assert summary[1]['total_checks'] == len(products) and summary[1]['present_items'] == 3
+
+
+def check_prices(backend, iteration):
+    day = BASE_DAY + timedelta(days=iteration)
+    product = f"Контрактный товар {iteration}"
+    assert backend.save_price_check(2, product, day - timedelta(days=1), regular_price=100, stock_quantity=5)
+    assert backend.save_price_check(1, product, day, regular_price=120, promo_price=99, has_promo=True,
+                                    stock_quantity=7, price_notes='проверка')
+    price = backend.get_price_check(1, product, day)
+    assert price['regular_price'] == 120 and price['promo_price'] == 99 and price['price_notes'] == 'проверка'
+    last = backend.get_last_price_in_network(1, product)
+    assert last['regular_price'] == 120 and last['store_number'] == '001', last
+    saved = backend.save_price_checks(3, day, [
+        {'product_name': product, 'regular_price': 130, 'stock_quantity': 1},
+        {'product_name': f"{product} (2)", 'regular_price': 10},
+    ])
+    assert saved == 2 and backend.get_price_check(3, product, day)['regular_price'] == 130
+
+
+def check_reports(backend, iteration):
+    day = BASE_DAY + timedelta(days=iteration)
+    product = backend.get_nomenclature_by_store_id(1)[0][0]
+    backend.record_check_results(1, [product], {product}, day)
+    rows = [row for row in backend.iter_period_rows(day, day) if row[5] == product]
+    assert len(rows) == 1 and rows[0][0] == day and rows[0][3] == '001' and rows[0][6] is True, rows
+    network_id = next(network['id'] for region in backend.get_catalog()['regions']
+                      for network in region['networks'] if any(store[0] == 1 for store in network['stores']))
+    assert rows == [row for row in backend.iter_period_rows(day, day, network_id) if row[5] == product]
+    assert not [row for row in backend.iter_period_rows(day, day, network_id + 1000)]
+    store_report = backend.create_store_report(1, day)
+    with open(store_report, 'rb') as f:
+        assert f.read(2) == b'PK', "отчет магазина должен быть XLSX"
+    os.remove(store_report)
+    path = backend.create_report_for_period(day, day)
+    assert path and os.path.getsize(path) > 0
+    with open(path, encoding='utf-8') as f:
+        assert product in f.read()
+    os.remove(path)
+
+
+def check_data_version(backend, iteration):
+    day = BASE_DAY + timedelta(days=100 + iteration)
+    other = day + timedelta(days=1)
+    before, untouched = backend.get_data_version(day, day), backend.get_data_version(other, other)
+    product = backend.get_nomenclature_by_store_id(1)[0][0]
+    backend.record_check_results(1, [product], {product}, day)
+    after = backend.get_data_version(day, day)
+    assert after != before, (before, after)
+    assert backend.get_data_version(other, other) == untouched
+    backend.save_price_check(1, product, day, regular_price=99.9, stock_quantity=5)
+    assert backend.get_data_version(day, other) != after + untouched
+
+
+
+def check_store_epoch(backend, iteration):
+    epoch = backend.get_store_epoch()
+    assert isinstance(epoch, str) and epoch, epoch
+    assert backend.get_store_epoch() == epoch
+
+CHECKS = [
+    ('interface', check_interface),
+    ('hierarchy_counts', check_hierarchy_counts),
+    ('catalog', check_catalog),
+    ('store_details', check_store_details),
+    ('search', check_search),
+    ('record_results', check_record_results),
+    ('prices', check_prices),
+    ('reports', check_reports),
+    ('data_version', check_data_version),
+    ('store_epoch', check_store_epoch),
+]
+
+
+def run_backend(name, iterations, tmp):
+    backend = open_backend(name, tmp)
+    results = {}
+    for check_name, check in CHECKS:
+        timings = []
+        try:
+            for iteration in range(iterations):
+                started = time.perf_counter()
+                check(backend, iteration)
+                timings.append((time.perf_counter() - started) * 1000)
+            results[check_name] = (True, statistics.median(timings))
+        except Exception:
+            results[check_name] = (False, traceback.format_exc(limit=3))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', action='append', help='demo, sqlite или имя модуля (можно несколько раз)')
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+    backends = args.backend or ['demo', 'sqlite']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # отчеты пишутся в reports/ текущей папки
+        results = {name: run_backend(name, args.iterations, tmp) for name in backends}
+
+    print(f"{'проверка, мс (медиана)':28}" + ''.join(f"{name:>12}" for name in backends))
+    failures = []
+    for check_name, _ in CHECKS:
+        cells = []
+        for name in backends:
+            ok, value = results[name][check_name]
+            cells.append(f"{value:12.3f}" if ok else f"{'FAIL':>12}")
+            if not ok:
+                failures.append((name, check_name, value))
+        print(f"{check_name:28}" + ''.join(cells))
+
+    for name, check_name, error in failures:
+        print(f"\n❌ {name}.{check_name}:\n{error}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
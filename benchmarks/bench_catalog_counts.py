@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк списков регионов и сетей: число SQL запросов и задержка старой
+схемы N+1 (счетчики через len() по спискам) и агрегатных функций
+get_regions_with_counts / get_networks_with_store_counts.
+
+    python benchmarks/bench_catalog_counts.py --regions 50 --networks 500 --stores 20000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def populate(conn, regions, networks, stores):
+    conn.executemany("INSERT INTO regions (id, name) VALUES (?, ?)",
+                     [(i, f"Регион {i:03d}") for i in range(1, regions + 1)])
+    conn.executemany("INSERT INTO networks (id, name, region_id) VALUES (?, ?, ?)",
+                     [(i, f"Сеть {i:04d}", i % regions + 1) for i in range(1, networks + 1)])
+    conn.executemany("INSERT INTO stores (number, address, network_id) VALUES (?, ?, ?)",
+                     [(f"{i:05d}", f"ул. Тестовая, {i}", i % networks + 1) for i in range(stores)])
+    conn.commit()
+
+
+def regions_n_plus_one(database):
+    return [
+        {
+            'id': region[0],
+            'name': region[1],
+            'networks_count': len(database.get_networks_by_region(region[0])),
+            'stores_count': sum(len(database.get_stores_by_network(net[0]))
+                                for net in database.get_networks_by_region(region[0]))
+        }
+        for region in database.get_all_regions()
+    ]
+
+
+def networks_n_plus_one(database, region_id):
+    return [
+        {'id': net[0], 'name': net[1], 'stores_count': len(database.get_stores_by_network(net[0]))}
+        for net in database.get_networks_by_region(region_id)
+    ]
+
+
+def regions_aggregate(database):
+    return [
+        {'id': row[0], 'name': row[1], 'networks_count': row[2], 'stores_count': row[3]}
+        for row in database.get_regions_with_counts()
+    ]
+
+
+def networks_aggregate(database, region_id):
+    return [
+        {'id': row[0], 'name': row[1], 'stores_count': row[2]}
+        for row in database.get_networks_with_store_counts(region_id)
+    ]
+
+
+def measure(database, fn, iterations):
+    database.reset_query_stats()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+    elapsed_ms = (time.perf_counter() - started) * 1000 / iterations
+    queries = sum(q['calls'] for q in database.get_query_stats()['queries']) // iterations
+    return result, queries, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--regions', type=int, default=50)
+    parser.add_argument('--networks', type=int, default=500)
+    parser.add_argument('--stores', type=int, default=20000)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_PATH'] = os.path.join(tmp, 'bench.db')
+        os.environ['DB_SLOW_QUERY_MS'] = '1e9'
+        import database
+
+        database.create_tables_if_not_exist()
+        with database.get_connection() as conn:
+            populate(conn, args.regions, args.networks, args.stores)
+
+        cases = {
+            '/api/regions': (lambda: regions_n_plus_one(database), lambda: regions_aggregate(database)),
+            '/api/networks/1': (lambda: networks_n_plus_one(database, 1), lambda: networks_aggregate(database, 1)),
+        }
+
+        print(f"{args.regions} регионов, {args.networks} сетей, {args.stores} магазинов")
+        print(f"{'':18}{'запросов N+1':>14}{'мс N+1':>10}{'запросов':>10}{'мс':>10}")
+        for name, (old, new) in cases.items():
+            old_result, old_queries, old_ms = measure(database, old, args.iterations)
+            new_result, new_queries, new_ms = measure(database, new, args.iterations)
+            assert old_result == new_result, f"{name}: результаты различаются"
+            print(f"{name:18}{old_queries:>14}{old_ms:>10.2f}{new_queries:>10}{new_ms:>10.2f}")
+
+        database.writer.close()
+        database.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк компактной схемы (миграция 5): размер файла БД и задержка
+горячих запросов до и после перехода на справочник товаров и номера дней.
+
+    python benchmarks/bench_compact_schema.py --stores 200 --products 150 --days 30
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import MIGRATIONS, run_migrations  # noqa: E402
+
+PRODUCT_WORDS = ["Молоко", "Кефир", "Сметана", "Творог", "Йогурт", "Ряженка", "Сыр", "Масло", "Хлеб", "Колбаса"]
+
+OLD_QUERIES = {
+    'checked_stores_for_date': ("SELECT DISTINCT store_id FROM monitoring_checks WHERE check_date = ?",
+                                lambda store, day: (day.isoformat(),)),
+    'checked_items_for_store_date': ("""
+        SELECT product_name FROM monitoring_checks
+        WHERE store_id = ? AND check_date = ? AND is_present = 1
+    """, lambda store, day: (store, day.isoformat())),
+    'nomenclature_by_store': ("SELECT product_name FROM nomenclature WHERE store_id = ? ORDER BY product_name",
+                              lambda store, day: (store,)),
+}
+
+
+def new_queries():
+    import database
+    epoch = date(1970, 1, 1).toordinal()
+    return {
+        'checked_stores_for_date': (database.SQL_CHECKED_STORES_FOR_DATE,
+                                    lambda store, day: (day.toordinal() - epoch,)),
+        'checked_items_for_store_date': (database.SQL_CHECKED_ITEMS_FOR_STORE_DATE,
+                                         lambda store, day: (store, day.toordinal() - epoch)),
+        'nomenclature_by_store': (database.SQL_NOMENCLATURE_BY_STORE, lambda store, day: (store,)),
+    }
+
+
+def populate(conn, stores, products, days):
+    rng = random.Random(42)
+    names = [f"{rng.choice(PRODUCT_WORDS)} фермерский продукт №{i} в упаковке 900 г" for i in range(products)]
+    conn.execute("INSERT INTO regions (name) VALUES ('СЗФО')")
+    conn.execute("INSERT INTO networks (name, region_id) VALUES ('Сеть', 1)")
+    conn.executemany("INSERT INTO stores (number, address, network_id) VALUES (?, ?, 1)",
+                     [(str(100 + i), f"ул. Тестовая, {i}") for i in range(stores)])
+    conn.executemany("INSERT INTO nomenclature (store_id, product_name) VALUES (?, ?)",
+                     [(store, name) for store in range(1, stores + 1) for name in names])
+    start = date.today() - timedelta(days=days)
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        conn.executemany(
+            "INSERT INTO monitoring_checks (store_id, product_name, check_date, is_present) VALUES (?, ?, ?, ?)",
+            [(store, name, day, rng.random() < 0.8) for store in range(1, stores + 1) for name in names]
+        )
+        conn.executemany(
+            """INSERT INTO price_checks (store_id, product_name, check_date, regular_price, stock_quantity)
+               VALUES (?, ?, ?, ?, ?)""",
+            [(store, name, day, rng.randint(50, 500), rng.randint(0, 100))
+             for store in range(1, stores + 1) for name in names[::5]]
+        )
+    conn.commit()
+    return start
+
+
+def measure(conn, path, queries, stores, start, days, iterations):
+    conn.execute("VACUUM")
+    size = os.path.getsize(path)
+    rng = random.Random(7)
+    latencies = {}
+    for name, (sql, params) in queries.items():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            store = rng.randint(1, stores)
+            day = start + timedelta(days=rng.randrange(days))
+            conn.execute(sql, params(store, day)).fetchall()
+        latencies[name] = (time.perf_counter() - started) * 1000 / iterations
+    return size, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stores', type=int, default=200)
+    parser.add_argument('--products', type=int, default=150)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = sqlite3.connect(path)
+        run_migrations(conn, [m for m in MIGRATIONS if m[0] < 5])
+        start = populate(conn, args.stores, args.products, args.days)
+        rows = conn.execute("SELECT COUNT(*) FROM monitoring_checks").fetchone()[0]
+
+        before_size, before = measure(conn, path, OLD_QUERIES, args.stores, start, args.days, args.iterations)
+
+        started = time.perf_counter()
+        run_migrations(conn, [m for m in MIGRATIONS if m[0] == 5])
+        migrate_s = time.perf_counter() - started
+
+        after_size, after = measure(conn, path, new_queries(), args.stores, start, args.days, args.iterations)
+        conn.close()
+
+    print(f"Строк monitoring_checks: {rows:,}; миграция заняла {migrate_s:.1f} с")
+    print(f"{'':32}{'до':>12}{'после':>12}")
+    print(f"{'размер БД, МБ':32}{before_size / 2**20:12.1f}{after_size / 2**20:12.1f}")
+    for name in before:
+        print(f"{name + ', мс':32}{before[name]:12.3f}{after[name]:12.3f}")
+
+
+if __name__ == '__main__':
+    main()
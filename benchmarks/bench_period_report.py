@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк построения отчета за период на 1, 30 и 365 дней.
+
+Сравнивает прежний обход демо данных (цикл по каждому дню периода, по всем
+магазинам и линейные поиски магазина, сети и региона) с индексированным
+iter_period_rows демо версии и с одним запросом по диапазону в SQLite.
+Данные лежат за год, но проверки есть только в доле дней ``--fill``:
+прежний обход платит за каждый день периода, новый - только за строки.
+
+    python benchmarks/bench_period_report.py --fill 0.3
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+PERIODS = (1, 30, 365)
+HISTORY_DAYS = 365
+
+
+def legacy_period_rows(demo, start_date, end_date):
+    """Прежний алгоритм create_protected_report_for_period (до индексов), для сравнения."""
+    current_date = start_date
+    while current_date <= end_date:
+        date_str = current_date.isoformat()
+        for store_id, store_checks in demo.monitoring_checks.items():
+            if date_str not in store_checks:
+                continue
+            store_info = next((s for s in demo.DEMO_STORES if s[0] == store_id), None)
+            if not store_info:
+                continue
+            network_info = next((n for n in demo.DEMO_NETWORKS if n[0] == store_info[3]), None)
+            network_name = network_info[1] if network_info else "Неизвестная сеть"
+            region_info = next((r for r in demo.DEMO_REGIONS if r[0] == (network_info[2] if network_info else 1)), None)
+            region_name = region_info[1] if region_info else "Неизвестный регион"
+            for product, is_present in store_checks[date_str].items():
+                from database_demo import price_checks
+                price_data = price_checks.get(f"{store_id}_{product}_{date_str}", {})
+                yield (current_date, region_name, network_name, store_info[1], store_info[2], product,
+                       bool(is_present), price_data.get('regular_price'), price_data.get('promo_price'),
+                       bool(price_data.get('has_promo')), price_data.get('stock_quantity'))
+        from datetime import timedelta as _timedelta
+        current_date += _timedelta(days=1)
+
+
+def seed_demo(demo, days, end_date, fill):
+    rng = random.Random(42)
+    rows = 0
+    for offset in range(days):
+        if rng.random() >= fill:
+            continue
+        check_date = end_date - timedelta(days=offset)
+        for store_id, number, address, net_id in demo.DEMO_STORES:
+            products = demo.DEMO_NOMENCLATURE[store_id]
+            demo.record_check_results(store_id, products, {p for p in products if rng.random() < 0.8}, check_date)
+            demo.save_price_checks(store_id, check_date, [
+                {'product_name': p, 'regular_price': rng.randint(50, 500) + 0.9, 'stock_quantity': rng.randint(0, 100)}
+                for p in products[::3]
+            ])
+            rows += len(products)
+    return rows
+
+
+def seed_sqlite(database, demo, days, end_date, fill):
+    """Те же магазины и товары, что в демо, но сразу пакетами в SQLite."""
+    rng = random.Random(42)
+    database.create_tables_if_not_exist()
+    products = sorted({p for items in demo.DEMO_NOMENCLATURE.values() for p in items})
+    product_ids = {name: index for index, name in enumerate(products, 1)}
+    end_day = database.to_day(end_date)
+    with database.get_connection() as conn:
+        conn.executemany("INSERT INTO regions (id, name) VALUES (?, ?)", demo.DEMO_REGIONS)
+        conn.executemany("INSERT INTO networks (id, name, region_id) VALUES (?, ?, ?)", demo.DEMO_NETWORKS)
+        conn.executemany("INSERT INTO stores (id, number, address, network_id) VALUES (?, ?, ?, ?)", demo.DEMO_STORES)
+        conn.executemany("INSERT INTO products (id, name) VALUES (?, ?)", [(i, n) for n, i in product_ids.items()])
+        for offset in range(days):
+            if rng.random() >= fill:
+                continue
+            day = end_day - offset
+            for store_id, number, address, net_id in demo.DEMO_STORES:
+                items = demo.DEMO_NOMENCLATURE[store_id]
+                conn.executemany(
+                    "INSERT INTO monitoring_checks (store_id, check_day, product_id, is_present) VALUES (?, ?, ?, ?)",
+                    [(store_id, day, product_ids[p], rng.random() < 0.8) for p in items])
+                conn.executemany(
+                    """INSERT INTO price_checks (store_id, check_day, product_id, regular_price, stock_quantity)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    [(store_id, day, product_ids[p], rng.randint(50, 500) + 0.9, rng.randint(0, 100))
+                     for p in items[::3]])
+        conn.commit()
+    # Дневную сводку при обычной записи ведет record_check_results
+    database.rebuild_daily_store_summary()
+
+
+def measure(make_rows, repeat):
+    best, count = None, 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = sum(1 for _ in make_rows())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fill', type=float, default=0.3, help='доля дней с проверками')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(DB_PATH=os.path.join(tmp, 'bench.db'), DB_WRITER_MODE='sync',
+                          DB_SLOW_QUERY_MS='600000')
+        import database
+        import database_demo as demo
+
+        end_date = date.today() - timedelta(days=1)
+        total = seed_demo(demo, HISTORY_DAYS, end_date, args.fill)
+        seed_sqlite(database, demo, HISTORY_DAYS, end_date, args.fill)
+        print(f"История {HISTORY_DAYS} дн., проверки в {args.fill:.0%} дней, {len(demo.DEMO_STORES)} магазинов, "
+              f"{total} строк")
+
+        engines = [
+            ('демо, по дням (было)', lambda s, e: legacy_period_rows(demo, s, e)),
+            ('демо, индексы', demo.iter_period_rows),
+            ('SQLite, один запрос', database.iter_period_rows),
+        ]
+        print(f"{'движок':24}" + ''.join(f"{f'{days} дн., мс':>14}" for days in PERIODS) + f"{'строк за год':>14}")
+        for name, engine in engines:
+            cells, count = [], 0
+            for days in PERIODS:
+                start_date = end_date - timedelta(days=days - 1)
+                elapsed, count = measure(lambda: engine(start_date, end_date), args.repeat)
+                cells.append(f"{elapsed * 1000:14.2f}")
+            print(f"{name:24}" + ''.join(cells) + f"{count:14}")
+
+
+if __name__ == '__main__':
+    main()
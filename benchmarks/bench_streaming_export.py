@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк потоковой выгрузки отчета за период (по умолчанию 90 дней).
+
+Сравнивает прежний путь (отчет пишется в файл, файл читается в память и
+отдается целиком) с потоковой выгрузкой /api/download-period-report в CSV
+и XLSX: время до первого байта, полное время и пик памяти Python
+(tracemalloc). Память и время меряются в разных проходах, чтобы
+трассировка не искажала время.
+
+    python benchmarks/bench_streaming_export.py --days 90 --stores 60 --products 40
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(database, stores, products, days, end_day):
+    rng = random.Random(42)
+    database.create_tables_if_not_exist()
+    start_day = database.to_day(end_day) - days + 1
+    with database.get_connection() as conn:
+        conn.execute("INSERT INTO regions (id, name) VALUES (1, 'СЗФО')")
+        conn.execute("INSERT INTO networks (id, name, region_id) VALUES (1, 'Розница', 1)")
+        conn.executemany("INSERT INTO stores (id, number, address, network_id) VALUES (?, ?, ?, 1)",
+                         [(i, f"{i:03}", f"ул. Тестовая, {i}") for i in range(1, stores + 1)])
+        conn.executemany("INSERT INTO products (id, name) VALUES (?, ?)",
+                         [(i, f"Товар фермерский №{i} в упаковке 900 г") for i in range(1, products + 1)])
+        for day in range(start_day, start_day + days):
+            conn.executemany(
+                "INSERT INTO monitoring_checks (store_id, check_day, product_id, is_present) VALUES (?, ?, ?, ?)",
+                [(store, day, product, rng.random() < 0.8)
+                 for store in range(1, stores + 1) for product in range(1, products + 1)]
+            )
+            conn.executemany(
+                """INSERT INTO price_checks (store_id, check_day, product_id, regular_price, stock_quantity)
+                   VALUES (?, ?, ?, ?, ?)""",
+                [(store, day, product, rng.randint(50, 500) + 0.9, rng.randint(0, 100))
+                 for store in range(1, stores + 1) for product in range(1, products + 1, 3)]
+            )
+        conn.commit()
+    # Дневную сводку при обычной записи ведет record_check_results
+    database.rebuild_daily_store_summary()
+    return database.from_day(start_day)
+
+
+def file_download(app_module, start_date, end_date):
+    """Прежний путь: файл на диске, затем весь файл в память одним ответом."""
+    path = app_module.get_backend().create_report_for_period(start_date, end_date)
+    with open(path, 'rb') as f:
+        data = f.read()
+    os.remove(path)
+    yield data
+
+
+def streamed_download(client, start_date, end_date, export_format):
+    response = client.get(f"/api/download-period-report?start_date={start_date}&end_date={end_date}"
+                          f"&format={export_format}", buffered=False)
+    assert response.status_code == 200, response.status_code
+    try:
+        yield from response.response
+    finally:
+        response.close()
+
+
+def consume(chunks):
+    """Читает поток: (время до первого куска, полное время, байт)."""
+    started = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    return first, time.perf_counter() - started, size
+
+
+def peak_memory(chunks):
+    tracemalloc.start()
+    try:
+        for _ in chunks:
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--stores', type=int, default=60)
+    parser.add_argument('--products', type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.environ.update(STORAGE_BACKEND='sqlite', DB_PATH=os.path.join(tmp, 'bench.db'),
+                          DB_WRITER_MODE='sync', STATE_DB_PATH=os.path.join(tmp, 'state.db'),
+                          DB_SLOW_QUERY_MS='600000')
+        import database
+        import app as app_module
+
+        end_date = date.today() - timedelta(days=1)
+        start_date = seed(database, args.stores, args.products, args.days, end_date)
+        client = app_module.app.test_client()
+        rows = args.days * args.stores * args.products
+        print(f"Период {args.days} дн., {args.stores} магазинов x {args.products} товаров = {rows} строк")
+
+        scenarios = [
+            ('файл + read() (было)', lambda: file_download(app_module, start_date, end_date)),
+            ('поток CSV', lambda: streamed_download(client, start_date, end_date, 'csv')),
+            ('поток XLSX', lambda: streamed_download(client, start_date, end_date, 'xlsx')),
+        ]
+        print(f"{'способ':24}{'TTFB, мс':>10}{'всего, мс':>11}{'размер, КБ':>12}{'пик памяти, МБ':>16}")
+        for name, make in scenarios:
+            first, total, size = consume(make())
+            peak = peak_memory(make())
+            print(f"{name:24}{first * 1000:10.1f}{total * 1000:11.1f}{size / 1024:12.0f}{peak / 2 ** 20:16.2f}")
+
+
+if __name__ == '__main__':
+    main()
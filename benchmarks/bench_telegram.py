@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк доставки отчетов в Telegram на локальной заглушке Bot API.
+
+Сравнивает три способа отправить N отчетов в один чат:
+  naive  - requests.post на каждый файл (новое соединение, без лимита и повторов)
+  client - TelegramClient.send_document по одному (пул соединений, лимит на чат, 429)
+  album  - TelegramClient.send_documents (альбомы sendMediaGroup по 10 файлов)
+
+Клиент настроен на 90% лимита заглушки. Для каждого способа печатает
+время, число соединений и запросов, ответы 429/5xx и сколько файлов дошло.
+``--error-rate`` добавляет случайные 502 для проверки повторов.
+
+    python benchmarks/bench_telegram.py --reports 40 --rate-per-min 300 --connect-ms 30
+    python benchmarks/bench_telegram.py --reports 40 --error-rate 0.1
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from telegram_client import MEDIA_GROUP_MAX, TelegramClient, TelegramError  # noqa: E402
+from telegram_stub import TelegramStub  # noqa: E402
+
+CHAT_ID = '-100123'
+
+
+def make_reports(folder, count, size_kb):
+    paths = []
+    row = 'Регион;Сеть;Магазин;Товар;Наличие\n'
+    for index in range(count):
+        path = os.path.join(folder, f"Отчет_магазин_{index}.csv")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(row * max(1, size_kb * 1024 // len(row.encode('utf-8'))))
+        paths.append((path, f"Отчет по магазину {index}"))
+    return paths
+
+
+def run_naive(stub, documents, token):
+    import requests
+
+    failed = 0
+    for path, caption in documents:
+        with open(path, 'rb') as f:
+            try:
+                response = requests.post(f"{stub.url}/bot{token}/sendDocument",
+                                         data={'chat_id': CHAT_ID, 'caption': caption},
+                                         files={'document': f}, timeout=30)
+                failed += response.status_code != 200
+            except requests.RequestException:
+                failed += 1
+    return failed
+
+
+def run_client(stub, documents, token, args, album):
+    # Клиент держит темп с запасом от лимита заглушки, как и в рабочей настройке (18 из 20 в минуту)
+    client = TelegramClient(token, base_url=stub.url, rate_per_min=args.rate_per_min * 0.9, burst=args.burst,
+                            max_retries=5, retry_backoff=0.05)
+    failed = 0
+    try:
+        if album:
+            for start in range(0, len(documents), MEDIA_GROUP_MAX):
+                chunk = documents[start:start + MEDIA_GROUP_MAX]
+                try:
+                    client.send_documents(CHAT_ID, chunk)
+                except TelegramError:
+                    failed += len(chunk)
+        else:
+            for path, caption in documents:
+                try:
+                    client.send_document(CHAT_ID, path, caption)
+                except TelegramError:
+                    failed += 1
+    finally:
+        client.close()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=40)
+    parser.add_argument('--size-kb', type=int, default=20)
+    parser.add_argument('--rate-per-min', type=float, default=300, help='лимит заглушки на чат')
+    parser.add_argument('--burst', type=int, default=3)
+    parser.add_argument('--connect-ms', type=float, default=30, help='цена нового соединения (TCP+TLS)')
+    parser.add_argument('--latency-ms', type=float, default=5, help='время обработки запроса')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 502')
+    args = parser.parse_args()
+
+    token = 'stub-token'
+    stub = TelegramStub(rate_per_min=args.rate_per_min, burst=args.burst, error_rate=args.error_rate,
+                        connect_ms=args.connect_ms, latency_ms=args.latency_ms).start()
+    scenarios = [
+        ('naive', lambda docs: run_naive(stub, docs, token)),
+        ('client', lambda docs: run_client(stub, docs, token, args, album=False)),
+        ('album', lambda docs: run_client(stub, docs, token, args, album=True)),
+    ]
+
+    print(f"{args.reports} отчетов по {args.size_kb} КБ, лимит {args.rate_per_min:.0f}/мин, burst {args.burst}, "
+          f"соединение {args.connect_ms:.0f} мс")
+    print(f"{'способ':10}{'время, с':>10}{'соедин.':>9}{'запросов':>10}{'429':>6}{'5xx':>6}{'дошло':>7}{'ошибок':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        documents = make_reports(tmp, args.reports, args.size_kb)
+        for name, run in scenarios:
+            stub.reset()
+            started = time.perf_counter()
+            failed = run(documents)
+            elapsed = time.perf_counter() - started
+            stats = stub.stats
+            print(f"{name:10}{elapsed:10.2f}{stats['connections']:9}{stats['requests']:10}"
+                  f"{stats['rate_limited']:6}{stats['errors']:6}{stats['messages']:7}{failed:8}")
+            # Отдаем заглушке время восстановить лимит перед следующим способом
+            time.sleep(args.burst * 60 / args.rate_per_min)
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк записи XLSX отчета: прежний путь через pandas против потоковой записи.
+
+  pandas - список словарей -> DataFrame -> pd.ExcelWriter(engine='openpyxl'),
+           как делал create_store_report
+  stream - xlsx_stream.stream_xlsx (как листы сетей отчета за период):
+           строки сразу кодируются в zip кусками
+
+Каждый замер идет в отдельном процессе, поэтому пик RSS (ru_maxrss) относится
+только к нему. Строки синтетические, в формате iter_period_rows.
+
+    python benchmarks/bench_xlsx_export.py --rows 10000 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CASES = ('pandas', 'stream')
+
+
+def make_rows(count):
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+    for index in range(count):
+        regular = rng.randint(50, 500) + 0.9 if index % 3 == 0 else None
+        promo = regular - 10 if regular and index % 7 == 0 else None
+        yield (start + timedelta(days=index // 5000), 'СЗФО', f"Сеть {index % 4}", f"{index % 200:03}",
+               f"ул. Тестовая, {index % 200}", f"Товар фермерский №{index % 50} в упаковке 900 г",
+               rng.random() < 0.8, regular, promo, promo is not None, rng.randint(0, 100) if regular else None)
+
+
+def write_pandas(path, rows):
+    import pandas as pd
+    from exports import PERIOD_COLUMNS, _xlsx_row
+
+    df_data = [dict(zip(PERIOD_COLUMNS, _xlsx_row(row))) for row in rows]
+    df = pd.DataFrame(df_data)
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Отчет', index=False)
+
+
+def write_stream(path, rows):
+    from exports import PERIOD_COLUMNS, PERIOD_FORMATS, _xlsx_row, write_chunks
+    from xlsx_stream import stream_xlsx
+
+    write_chunks(path, stream_xlsx([('Отчет', PERIOD_COLUMNS, (_xlsx_row(row) for row in rows), PERIOD_FORMATS)]))
+
+
+def run_case(case, count):
+    """Один замер в текущем процессе: печатает JSON с временем и пиком RSS."""
+    writer = write_pandas if case == 'pandas' else write_stream
+    if case == 'pandas':
+        import pandas  # noqa: F401 - импорт не входит во время записи
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'report.xlsx')
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        writer(path, make_rows(count))
+        elapsed = time.perf_counter() - started
+        print(json.dumps({
+            'seconds': elapsed,
+            'rss_before_mb': rss_before / 1024,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'size_mb': os.path.getsize(path) / 2 ** 20,
+        }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000])
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--case', choices=CASES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(args.case, args.rows[0])
+        return
+
+    print(f"{'строк':>9} {'способ':8}{'время, с':>10}{'RSS до, МБ':>12}{'пик RSS, МБ':>13}{'файл, МБ':>10}")
+    for count in args.rows:
+        for case in args.cases:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', case, '--rows', str(count)],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{count:9} {case:8}{result['seconds']:10.2f}{result['rss_before_mb']:12.1f}"
+                  f"{result['peak_rss_mb']:13.1f}{result['size_mb']:10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка параллельной сборки отчета за период (parallel_reports) против
+последовательной на синтетической SQLite базе.
+
+CSV должен совпасть байт в байт (время создания в шапке фиксируется), у
+XLSX - содержимое каждого файла внутри архива. Печатает время обеих
+сборок; при расхождении завершается с кодом 1.
+
+    python benchmarks/check_parallel_report.py --days 365 --workers 2 4
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_period_report import seed_sqlite  # noqa: E402
+
+
+def collect(chunks):
+    started = time.perf_counter()
+    data = b''.join(chunks)
+    return data, time.perf_counter() - started
+
+
+def zip_members(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--fill', type=float, default=1.0, help='доля дней с проверками')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Процессы пула читают ту же базу: настройки передаются через окружение
+        os.environ.update(STORAGE_BACKEND='sqlite', DB_PATH=os.path.join(tmp, 'bench.db'),
+                          DB_WRITER_MODE='sync', DB_SLOW_QUERY_MS='600000')
+        import database
+        import database_demo as demo
+        from exports import period_csv_chunks, period_network_xlsx_chunks
+        from parallel_reports import parallel_period_chunks
+
+        end_date = date.today() - timedelta(days=1)
+        start_date = end_date - timedelta(days=args.days - 1)
+        seed_sqlite(database, demo, args.days, end_date, args.fill)
+        created = datetime(2024, 1, 1, 12, 0, 0)
+
+        serial_csv, csv_time = collect(period_csv_chunks(database.iter_period_rows(start_date, end_date),
+                                                         start_date, end_date, created=created))
+        serial_xlsx, xlsx_time = collect(period_network_xlsx_chunks(database, start_date, end_date))
+        serial_members = zip_members(serial_xlsx)
+        rows = serial_csv.count(b'\n"')
+        print(f"{args.days} дн., {rows} строк, CSV sha256 {hashlib.sha256(serial_csv).hexdigest()[:16]}")
+        print(f"{'сборка':18}{'CSV, с':>9}{'XLSX, с':>10}  совпадение")
+        print(f"{'последовательно':18}{csv_time:9.2f}{xlsx_time:10.2f}")
+
+        failed = False
+        for workers in args.workers:
+            csv_data, csv_time = collect(parallel_period_chunks('csv', database, start_date, end_date,
+                                                                workers=workers, created=created))
+            xlsx_data, xlsx_time = collect(parallel_period_chunks('xlsx', database, start_date, end_date,
+                                                                  workers=workers))
+            same_csv = csv_data == serial_csv
+            same_xlsx = zip_members(xlsx_data) == serial_members
+            failed |= not (same_csv and same_xlsx)
+            print(f"{f'{workers} процесса':18}{csv_time:9.2f}{xlsx_time:10.2f}  "
+                  f"CSV {'да' if same_csv else 'НЕТ'}, XLSX {'да' if same_xlsx else 'НЕТ'}")
+
+    if failed:
+        print("❌ Параллельная сборка отличается от последовательной")
+        sys.exit(1)
+    print("✅ Параллельная сборка совпадает с последовательной")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Время импорта (холодный старт) по данным ``python -X importtime``.
+
+Импортирует модуль в чистом процессе несколько раз, берет медиану
+накопленного времени и падает с кодом 1, если превышен порог или если
+при импорте подтянулись тяжелые зависимости, которые должны загружаться
+лениво (pandas, openpyxl, requests).
+
+    python benchmarks/import_time.py --module app --max-ms 150
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFERRED_MODULES = ('pandas', 'openpyxl', 'requests')
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def profile_import(module):
+    """Один импорт в новом процессе: {модуль: (self мкс, cumulative мкс, глубина)}."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Импорт {module} завершился с ошибкой:\n{result.stderr[-2000:]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app', help='импортируемый модуль (по умолчанию app)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=150, help='порог медианного времени импорта, мс')
+    parser.add_argument('--top', type=int, default=10, help='сколько самых дорогих модулей показать')
+    args = parser.parse_args()
+
+    runs = [profile_import(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(run[args.module][1] for run in runs) / 1000
+    last = runs[-1]
+
+    print(f"import {args.module}: медиана {total_ms:.1f} мс ({args.runs} запусков), порог {args.max_ms:.0f} мс")
+    print(f"{'модуль':40}{'self, мс':>10}{'всего, мс':>11}")
+    heaviest = sorted(last.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us, depth) in heaviest:
+        print(f"{name:40}{self_us / 1000:10.1f}{cumulative_us / 1000:11.1f}")
+
+    failures = []
+    if total_ms > args.max_ms:
+        failures.append(f"время импорта {total_ms:.1f} мс больше порога {args.max_ms:.0f} мс")
+    for name in DEFERRED_MODULES:
+        if name in last:
+            failures.append(f"{name} импортируется при старте, а должен загружаться лениво")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Холодный старт в пределах бюджета")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
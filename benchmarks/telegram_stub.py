@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальная заглушка Telegram Bot API для офлайн проверок доставки отчетов.
+
+Понимает sendDocument, sendMediaGroup и getMe, ограничивает частоту
+запросов на чат как Telegram (429 с ``parameters.retry_after``), может
+возвращать случайные 5xx и имитировать стоимость установки соединения
+(TCP+TLS). Считает соединения, запросы и доставленные файлы.
+
+    python benchmarks/telegram_stub.py --port 8081 --rate-per-min 20
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=test MAIN_GROUP_ID=-1 python app.py
+"""
+
+import argparse
+import email.parser
+import email.policy
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN_TOLERANCE = 0.05
+
+
+class _Bucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Забирает токен или возвращает, через сколько секунд он появится."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Небольшой допуск на дрожание времени доставки запроса, как у настоящего API
+        if self.tokens >= 1 - TOKEN_TOLERANCE:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def _parse_form(content_type, body):
+    """Разбирает multipart/form-data: ({поле: значение}, {поле: (имя файла, размер)})."""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body
+    )
+    fields, files = {}, {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        payload = part.get_payload(decode=True) or b''
+        filename = part.get_filename()
+        if filename is not None:
+            files[name] = (filename, len(payload))
+        else:
+            fields[name] = payload.decode('utf-8')
+    return fields, files
+
+
+class TelegramStub:
+    """HTTP сервер, имитирующий Bot API, в фоновом потоке."""
+
+    def __init__(self, host='127.0.0.1', port=0, rate_per_min=20, burst=3, error_rate=0.0,
+                 connect_ms=0.0, latency_ms=0.0, seed=1):
+        self.rate = rate_per_min / 60
+        self.burst = burst
+        self.error_rate = error_rate
+        self.connect_ms = connect_ms
+        self.latency_ms = latency_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.reset()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self):
+        with self._lock:
+            self.stats = {'connections': 0, 'requests': 0, 'rate_limited': 0, 'errors': 0, 'messages': 0}
+            self.documents = []
+            self._buckets = {}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.stats['connections'] += 1
+                # Цена нового соединения (рукопожатие TCP+TLS у настоящего API)
+                if stub.connect_ms:
+                    time.sleep(stub.connect_ms / 1000)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                method = self.path.rsplit('/', 1)[-1]
+                status, reply = stub.handle(method, self.headers.get('Content-Type', ''), body)
+                self._reply(status, reply)
+
+            do_GET = do_POST
+
+        return Handler
+
+    def handle(self, method, content_type, body):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            self.stats['requests'] += 1
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': {'id': 1, 'is_bot': True, 'username': 'stub_bot'}}
+        if method not in ('sendDocument', 'sendMediaGroup'):
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found: method not found'}
+
+        if content_type.startswith('multipart/form-data'):
+            fields, files = _parse_form(content_type, body)
+        else:
+            from urllib.parse import parse_qsl
+            fields, files = dict(parse_qsl(body.decode('utf-8'))), {}
+        chat_id = fields.get('chat_id')
+        if not chat_id:
+            return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat_id is empty'}
+
+        with self._lock:
+            bucket = self._buckets.setdefault(chat_id, _Bucket(self.rate, self.burst))
+            wait = bucket.take()
+            if wait:
+                self.stats['rate_limited'] += 1
+            elif self._random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                wait = None
+        if wait:
+            return 429, {'ok': False, 'error_code': 429,
+                         'description': f'Too Many Requests: retry after {math.ceil(wait)}',
+                         'parameters': {'retry_after': math.ceil(wait)}}
+        if wait is None:
+            return 502, {'ok': False, 'error_code': 502, 'description': 'Bad Gateway'}
+
+        if method == 'sendDocument':
+            if 'document' not in files:
+                return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: there is no document'}
+            delivered = [(chat_id, files['document'][0], fields.get('caption', ''))]
+        else:
+            media = json.loads(fields.get('media', '[]'))
+            if not 2 <= len(media) <= 10:
+                return 400, {'ok': False, 'error_code': 400,
+                             'description': 'Bad Request: media group must include 2-10 items'}
+            delivered = []
+            for item in media:
+                attach = item['media'].replace('attach://', '')
+                if attach not in files:
+                    return 400, {'ok': False, 'error_code': 400, 'description': f'Bad Request: no file {attach}'}
+                delivered.append((chat_id, files[attach][0], item.get('caption', '')))
+
+        with self._lock:
+            first_id = self.stats['messages'] + 1
+            self.stats['messages'] += len(delivered)
+            self.documents.extend(delivered)
+        result = [{'message_id': first_id + i, 'document': {'file_name': d[1]}} for i, d in enumerate(delivered)]
+        return 200, {'ok': True, 'result': result if method == 'sendMediaGroup' else result[0]}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--rate-per-min', type=float, default=20)
+    parser.add_argument('--burst', type=int, default=3)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 502')
+    parser.add_argument('--connect-ms', type=float, default=0.0, help='задержка на новое соединение')
+    args = parser.parse_args()
+
+    stub = TelegramStub(args.host, args.port, args.rate_per_min, args.burst, args.error_rate, args.connect_ms)
+    print(f"Заглушка Bot API: {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(stub.stats, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# compression.py - Response compression and conditional GET for Flask
+import gzip
+import logging
+import os
+import threading
+import time
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+# Сколько CPU (мс) можно потратить на сжатие одного ответа; дороже - быстрый gzip level 1
+COMPRESS_CPU_BUDGET_MS = float(os.getenv('COMPRESS_CPU_BUDGET_MS', '20'))
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'application/manifest+json',
+    'text/html',
+    'text/css',
+    'text/csv',
+    'text/plain',
+    'text/javascript',
+}
+
+
+class _Throughput:
+    """Скользящая оценка скорости сжатия (байт/мс) для прогноза затрат CPU."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rates = {}
+
+    def estimate_ms(self, key, size):
+        rate = self._rates.get(key)
+        return size / rate if rate else 0.0
+
+    def update(self, key, size, elapsed_ms):
+        if elapsed_ms <= 0:
+            return
+        rate = size / elapsed_ms
+        with self._lock:
+            previous = self._rates.get(key)
+            self._rates[key] = rate if previous is None else previous * 0.8 + rate * 0.2
+
+
+_throughput = _Throughput()
+
+
+def _choose_encoding():
+    """Выбирает кодировку по Accept-Encoding: br (если модуль установлен), затем gzip."""
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data: bytes, encoding: str):
+    """Сжимает тело ответа, укладываясь в бюджет CPU. Возвращает (кодировка, данные)."""
+    key = (encoding, COMPRESS_BROTLI_QUALITY if encoding == 'br' else COMPRESS_LEVEL)
+    if _throughput.estimate_ms(key, len(data)) > COMPRESS_CPU_BUDGET_MS:
+        encoding, key = 'gzip', ('gzip', 1)
+
+    started = time.perf_counter()
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=key[1])
+    else:
+        compressed = gzip.compress(data, compresslevel=key[1], mtime=0)
+    _throughput.update(key, len(data), (time.perf_counter() - started) * 1000)
+    return encoding, compressed
+
+
+def _stream_gzip(chunks):
+    """Сжимает поток кусками, не загружая файл в память целиком."""
+    compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _weaken_etag(response):
+    """Сжатое тело отличается побайтно - строгий ETag становится слабым."""
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def _is_compressible(response):
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    return 'no-transform' not in response.headers.get('Cache-Control', '')
+
+
+def process_response(response):
+    """after_request: слабый ETag и 304 для GET JSON, затем сжатие тела."""
+    try:
+        streamed = response.direct_passthrough or response.is_streamed
+
+        # Слабый ETag считаем по несжатому телу; маршруты со своим ETag не трогаем
+        if (request.method == 'GET' and response.status_code == 200 and not streamed
+                and response.mimetype == 'application/json' and 'ETag' not in response.headers):
+            response.add_etag(weak=True)
+            response.make_conditional(request)
+
+        if not _is_compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = _choose_encoding()
+        if encoding is None:
+            return response
+
+        if streamed:
+            # Большие файлы сжимаем на лету быстрым gzip
+            if response.content_length is not None and response.content_length < COMPRESS_MIN_SIZE:
+                return response
+            if not request.accept_encodings['gzip']:
+                return response
+            chunks = response.response
+            response.direct_passthrough = False
+            response.response = _stream_gzip(chunks)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers.pop('Content-Length', None)
+            _weaken_etag(response)
+            return response
+
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+
+        encoding, compressed = _compress(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        _weaken_etag(response)
+        return response
+    except Exception as e:
+        logging.error(f"Ошибка сжатия ответа: {e}")
+        return response
+
+
+def init_compression(app):
+    """Подключает сжатие ответов и условные GET к приложению Flask."""
+    app.after_request(process_response)
@@ -2,99 +2,600 @@
 # database.py - Web App Database Module
 import sqlite3
 import logging
+import threading
+import time
+import queue
+from contextlib import contextmanager
 from datetime import date, datetime
-import pandas as pd
 import os
 
-# --- Инициализация соединения с БД ---
-conn = sqlite3.connect("bot_database.db", check_same_thread=False)
-conn.row_factory = sqlite3.Row
-cursor = conn.cursor()
+from db_writer import GroupCommitWriter
+from migrations import run_migrations, check_query_plans, SQL_REBUILD_DAILY_STORE_SUMMARY
+from query_stats import InstrumentedConnection, get_query_stats, reset_query_stats
+
+# --- Настройки подключения к БД ---
+DB_PATH = os.getenv('DB_PATH', 'bot_database.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+# thread - отдельный поток-писатель с групповой фиксацией, sync - запись в потоке запроса
+DB_WRITER_MODE = os.getenv('DB_WRITER_MODE', 'thread')
+DB_WRITER_BATCH_WINDOW_MS = float(os.getenv('DB_WRITER_BATCH_WINDOW_MS', '5'))
+DB_WRITER_MAX_BATCH = int(os.getenv('DB_WRITER_MAX_BATCH', '200'))
+DB_WRITE_TIMEOUT = float(os.getenv('DB_WRITE_TIMEOUT', '30'))
+# Сколько строк выбирать за раз при потоковой выгрузке отчетов
+EXPORT_FETCH_SIZE = int(os.getenv('EXPORT_FETCH_SIZE', '1000'))
+
+
+class PoolTimeoutError(Exception):
+    """Не удалось получить соединение из пула за отведенное время."""
+
+
+class ConnectionPool:
+    """Пул соединений SQLite с выдачей соединения на время запроса.
+
+    Соединения создаются лениво, но не больше ``size`` штук. Поток, который
+    берет соединение, владеет им до возврата в пул, поэтому курсоры разных
+    запросов больше не пересекаются.
+    """
+
+    def __init__(self, path: str, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def open_connection(self):
+        """Открывает новое соединение с настройками пула (вне учета пула)."""
+        # Все запросы идут через InstrumentedConnection (статистика и лог медленных запросов)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=DB_BUSY_TIMEOUT_MS / 1000,
+                               factory=InstrumentedConnection)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        # WAL позволяет читателям не ждать писателя
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def _acquire(self):
+        started = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self.open_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Нет свободных соединений с БД ({self.size}) за {self.timeout} с"
+                    )
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def _release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            # Сломанное соединение в пул не возвращаем
+            logging.warning(f"Соединение с БД закрыто из-за ошибки: {e}")
+            conn.close()
+            conn = None
+        with self._lock:
+            self._in_use -= 1
+            if conn is None:
+                self._created -= 1
+        if conn is not None:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Выдает соединение из пула и возвращает его по выходу из блока."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def stats(self):
+        """Возвращает метрики пула для подбора его размера."""
+        with self._lock:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'idle': self._created - self._in_use,
+                'peak_in_use': self._peak_in_use,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'wait_total_ms': round(self._wait_total * 1000, 3),
+                'wait_avg_ms': round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0,
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+    def close_all(self):
+        """Закрывает все свободные соединения пула."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+# --- Инициализация пула соединений с БД ---
+pool = ConnectionPool(DB_PATH)
+
+
+def _open_writer_connection():
+    conn = pool.open_connection()
+    # Транзакциями писателя управляем явно (BEGIN/SAVEPOINT/COMMIT)
+    conn.isolation_level = None
+    return conn
+
+
+writer = GroupCommitWriter(
+    _open_writer_connection,
+    batch_window_ms=DB_WRITER_BATCH_WINDOW_MS,
+    max_batch=DB_WRITER_MAX_BATCH,
+    synchronous=DB_WRITER_MODE == 'sync'
+)
+
+
+def init_backend():
+    """Инициализация хранилища при первом обращении.
+    
+    Соединения пула и поток писателя создаются лениво, поэтому файл БД
+    открывается только первым запросом; миграции применяет manage.py migrate.
+    """
+    logging.info(f"Локальная база данных: {DB_PATH}")
+
+
+def get_connection():
+    """Контекстный менеджер: соединение из пула на время запроса."""
+    return pool.connection()
+
+
+def get_pool_stats():
+    """Возвращает метрики пула соединений."""
+    return pool.stats()
+
+
+def get_writer_stats():
+    """Возвращает глубину очереди записи и статистику групповых коммитов."""
+    return writer.stats()
+
+
+# --- Горячие запросы (проверяются через EXPLAIN QUERY PLAN) ---
+SQL_NETWORKS_BY_REGION = "SELECT id, name FROM networks WHERE region_id = ? ORDER BY name"
+
+SQL_STORES_BY_NETWORK = "SELECT id, number, address FROM stores WHERE network_id = ? ORDER BY number"
+
+SQL_CATALOG_VERSION = "SELECT version FROM catalog_version WHERE id = 1"
+
+SQL_DATA_VERSION = "SELECT COALESCE(SUM(version), 0) FROM date_versions WHERE check_day BETWEEN ? AND ?"
+
+SQL_STORE_EPOCH = "SELECT value FROM store_meta WHERE key = 'epoch'"
+
+SQL_CATALOG_STORES = """
+    SELECT s.network_id, s.id, s.number, s.address
+    FROM networks n
+    JOIN stores s ON s.network_id = n.id
+    WHERE n.region_id = ?
+    ORDER BY s.network_id, s.number
+"""
+
+# Счетчики считаются коррелированными подзапросами по покрывающим индексам
+# idx_networks_region_name и idx_stores_network_number - один запрос на список
+SQL_REGIONS_WITH_COUNTS = """
+    SELECT r.id, r.name,
+           (SELECT COUNT(*) FROM networks n WHERE n.region_id = r.id) AS networks_count,
+           (SELECT COUNT(*) FROM networks n JOIN stores s ON s.network_id = n.id
+            WHERE n.region_id = r.id) AS stores_count
+    FROM regions r
+    ORDER BY r.name
+"""
+
+SQL_NETWORKS_WITH_STORE_COUNTS = """
+    SELECT n.id, n.name,
+           (SELECT COUNT(*) FROM stores s WHERE s.network_id = n.id) AS stores_count
+    FROM networks n
+    WHERE n.region_id = ?
+    ORDER BY n.name
+"""
+
+SQL_CHECKED_STORES_FOR_DATE = """
+    SELECT DISTINCT store_id 
+    FROM monitoring_checks 
+    WHERE check_day = ?
+"""
+
+# Покрытие периода одним запросом по первичному ключу дневной сводки (check_day, store_id)
+SQL_CHECKED_STORES_FOR_RANGE = """
+    SELECT check_day, store_id
+    FROM daily_store_summary
+    WHERE check_day BETWEEN ? AND ? AND total > 0
+    ORDER BY check_day
+"""
+
+SQL_NOMENCLATURE_BY_STORE = """
+    SELECT p.name AS product_name 
+    FROM nomenclature n
+    JOIN products p ON p.id = n.product_id
+    WHERE n.store_id = ? 
+    ORDER BY p.name
+"""
+
+SQL_CHECKED_ITEMS_FOR_STORE_DATE = """
+    SELECT p.name AS product_name 
+    FROM monitoring_checks mc
+    JOIN products p ON p.id = mc.product_id
+    WHERE mc.store_id = ? AND mc.check_day = ? AND mc.is_present = 1
+"""
+
+SQL_CHECK_RESULTS_FOR_STORE_DATE = """
+    SELECT product_id, is_present
+    FROM monitoring_checks
+    WHERE store_id = ? AND check_day = ?
+"""
+
+SQL_PRICE_CHECK = """
+    SELECT pc.regular_price, pc.promo_price, pc.has_promo, pc.stock_quantity, pc.price_notes
+    FROM price_checks pc
+    JOIN products p ON p.id = pc.product_id
+    WHERE pc.store_id = ? AND pc.check_day = ? AND p.name = ?
+"""
+
+SQL_DAILY_STORE_SUMMARY = """
+    SELECT s.id, s.number, s.address, n.name as network_name,
+           ds.total as total_checks, ds.present as present_items
+    FROM daily_store_summary ds
+    JOIN stores s ON s.id = ds.store_id
+    JOIN networks n ON s.network_id = n.id
+    WHERE ds.check_day = ?
+    ORDER BY s.number
+"""
+
+SQL_STORE_REPORT_ROWS = """
+    SELECT p.name AS product_name, mc.is_present,
+           pc.regular_price, pc.promo_price, pc.has_promo, pc.stock_quantity
+    FROM monitoring_checks mc
+    JOIN products p ON p.id = mc.product_id
+    LEFT JOIN price_checks pc ON pc.store_id = mc.store_id 
+        AND pc.check_day = mc.check_day 
+        AND pc.product_id = mc.product_id
+    WHERE mc.store_id = ? AND mc.check_day = ?
+    ORDER BY p.name
+"""
+
+SQL_PERIOD_REPORT_ROWS = """
+    SELECT mc.check_day, r.name AS region_name, n.name AS network_name,
+           s.number, s.address, p.name AS product_name, mc.is_present,
+           pc.regular_price, pc.promo_price, pc.has_promo, pc.stock_quantity
+    FROM monitoring_checks mc
+    JOIN stores s ON s.id = mc.store_id
+    JOIN networks n ON n.id = s.network_id
+    JOIN regions r ON r.id = n.region_id
+    JOIN products p ON p.id = mc.product_id
+    LEFT JOIN price_checks pc ON pc.store_id = mc.store_id
+        AND pc.check_day = mc.check_day
+        AND pc.product_id = mc.product_id
+    WHERE mc.check_day BETWEEN ? AND ?
+    ORDER BY mc.check_day, s.number, p.name
+"""
+
+# То же для одной сети (лист сети в XLSX отчете)
+SQL_PERIOD_REPORT_ROWS_BY_NETWORK = SQL_PERIOD_REPORT_ROWS.replace(
+    "WHERE mc.check_day BETWEEN ? AND ?", "WHERE mc.check_day BETWEEN ? AND ? AND s.network_id = ?")
+
+SQL_LAST_PRICE_IN_NETWORK = """
+    SELECT lp.regular_price, lp.promo_price, lp.has_promo, lp.check_day, s.number AS store_number
+    FROM latest_network_price lp
+    JOIN products p ON p.id = lp.product_id
+    LEFT JOIN stores s ON s.id = lp.store_id
+    WHERE lp.network_id = ? AND p.name = ?
+"""
+
+SQL_SEARCH_STORES = """
+    SELECT s.id, s.number, s.address
+    FROM stores_fts
+    JOIN stores s ON s.id = stores_fts.rowid
+    WHERE stores_fts MATCH ? AND s.network_id = ?
+    ORDER BY s.number = ? DESC, (s.number >= ? AND s.number < ?) DESC, bm25(stores_fts), s.number
+    LIMIT 20
+"""
+
+HOT_QUERIES = {
+    'networks_by_region': (SQL_NETWORKS_BY_REGION, (1,)),
+    'stores_by_network': (SQL_STORES_BY_NETWORK, (1,)),
+    'networks_with_store_counts': (SQL_NETWORKS_WITH_STORE_COUNTS, (1,)),
+    'catalog_stores': (SQL_CATALOG_STORES, (1,)),
+    'checked_stores_for_date': (SQL_CHECKED_STORES_FOR_DATE, (19723,)),
+    'checked_stores_for_range': (SQL_CHECKED_STORES_FOR_RANGE, (19723, 19903)),
+    'nomenclature_by_store': (SQL_NOMENCLATURE_BY_STORE, (1,)),
+    'checked_items_for_store_date': (SQL_CHECKED_ITEMS_FOR_STORE_DATE, (1, 19723)),
+    'check_results_for_store_date': (SQL_CHECK_RESULTS_FOR_STORE_DATE, (1, 19723)),
+    'period_report_rows': (SQL_PERIOD_REPORT_ROWS, (19723, 19753)),
+    'period_report_rows_by_network': (SQL_PERIOD_REPORT_ROWS_BY_NETWORK, (19723, 19753, 1)),
+    'data_version': (SQL_DATA_VERSION, (19723, 19753)),
+    'price_check': (SQL_PRICE_CHECK, (1, 19723, 'Хлеб')),
+    'daily_store_summary': (SQL_DAILY_STORE_SUMMARY, (19723,)),
+    'store_report_rows': (SQL_STORE_REPORT_ROWS, (1, 19723)),
+    'last_price_in_network': (SQL_LAST_PRICE_IN_NETWORK, (1, 'Хлеб')),
+    'search_stores': (SQL_SEARCH_STORES, ('"Пуш"', 1, 'Пуш', 'Пуш', 'Пуш\U0010ffff')),
+}
+
+# --- Компактное хранение: даты как номера дней, товары как ID ---
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_day(value) -> int:
+    """Переводит дату (date или 'YYYY-MM-DD') в номер дня от 1970-01-01."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal() - _EPOCH_ORDINAL
+
+
+def from_day(day: int) -> date:
+    """Переводит номер дня от 1970-01-01 обратно в дату."""
+    return date.fromordinal(day + _EPOCH_ORDINAL)
+
+
+def _product_ids(conn, names) -> dict:
+    """Возвращает ID товаров по названиям, добавляя новые в справочник."""
+    names = list(dict.fromkeys(names))
+    ids = {}
+    for i in range(0, len(names), 500):
+        chunk = names[i:i + 500]
+        placeholders = ','.join('?' * len(chunk))
+        ids.update(conn.execute(f"SELECT name, id FROM products WHERE name IN ({placeholders})", chunk).fetchall())
+
+    missing = [name for name in names if name not in ids]
+    if missing:
+        for name in missing:
+            ids[name] = conn.execute("INSERT INTO products (name) VALUES (?)", (name,)).lastrowid
+    return ids
+
 
 def get_all_regions():
     """Получает все регионы из базы данных."""
-    cursor.execute("SELECT id, name FROM regions ORDER BY name")
-    return cursor.fetchall()
+    with get_connection() as conn:
+        return conn.execute("SELECT id, name FROM regions ORDER BY name").fetchall()
 
 def get_networks_by_region(region_id: int):
     """Получает все сети для указанного региона."""
-    cursor.execute("SELECT id, name FROM networks WHERE region_id = ? ORDER BY name", (region_id,))
-    return cursor.fetchall()
+    with get_connection() as conn:
+        return conn.execute(SQL_NETWORKS_BY_REGION, (region_id,)).fetchall()
+
+def get_regions_with_counts():
+    """Получает регионы с количеством сетей и магазинов одним запросом."""
+    with get_connection() as conn:
+        return conn.execute(SQL_REGIONS_WITH_COUNTS).fetchall()
+
+def get_networks_with_store_counts(region_id: int):
+    """Получает сети региона с количеством магазинов одним запросом."""
+    with get_connection() as conn:
+        return conn.execute(SQL_NETWORKS_WITH_STORE_COUNTS, (region_id,)).fetchall()
+
+def get_catalog_version():
+    """Возвращает версию справочника регионов, сетей и магазинов."""
+    with get_connection() as conn:
+        row = conn.execute(SQL_CATALOG_VERSION).fetchone()
+    return row[0] if row else 0
+
+def get_store_epoch():
+    """Эпоха хранилища: случайный ID этой базы, создается миграцией один раз."""
+    with get_connection() as conn:
+        row = conn.execute(SQL_STORE_EPOCH).fetchone()
+    return row[0] if row else ''
+
+def get_data_version(start_date: date, end_date: date):
+    """Версия данных периода: сумма версий его дней (таблица date_versions, ведется триггерами).
+    
+    Любая запись проверок или цен за дату периода увеличивает сумму.
+    """
+    with get_connection() as conn:
+        return conn.execute(SQL_DATA_VERSION, (to_day(start_date), to_day(end_date))).fetchone()[0]
+
+def get_catalog(region_id: int = None):
+    """Возвращает справочник регион -> сеть -> магазин (весь или одного региона) с его версией.
+    
+    Магазины отдаются компактно: списками полей из ``store_fields``.
+    """
+    with get_connection() as conn:
+        # Одна транзакция чтения: версия и данные из одного снимка БД
+        conn.execute("BEGIN")
+        try:
+            version = conn.execute(SQL_CATALOG_VERSION).fetchone()[0]
+            if region_id is None:
+                regions = conn.execute("SELECT id, name FROM regions ORDER BY name").fetchall()
+            else:
+                regions = conn.execute("SELECT id, name FROM regions WHERE id = ?", (region_id,)).fetchall()
+            catalog_regions = []
+            for region in regions:
+                stores = {}
+                for network_id, store_id, number, address in conn.execute(SQL_CATALOG_STORES, (region['id'],)):
+                    stores.setdefault(network_id, []).append([store_id, number, address])
+                catalog_regions.append({
+                    'id': region['id'],
+                    'name': region['name'],
+                    'networks': [
+                        {'id': network['id'], 'name': network['name'], 'stores': stores.get(network['id'], [])}
+                        for network in conn.execute(SQL_NETWORKS_BY_REGION, (region['id'],))
+                    ]
+                })
+        finally:
+            conn.rollback()
+    return {
+        'version': version,
+        'store_fields': ['id', 'number', 'address'],
+        'regions': catalog_regions
+    }
 
 def get_stores_by_network(network_id: int):
     """Получает все магазины для указанной сети."""
-    cursor.execute("SELECT id, number, address FROM stores WHERE network_id = ? ORDER BY number", (network_id,))
-    return cursor.fetchall()
+    with get_connection() as conn:
+        return conn.execute(SQL_STORES_BY_NETWORK, (network_id,)).fetchall()
 
 def get_checked_stores_for_date(check_date: date):
     """Получает список ID магазинов, которые были проверены в указанную дату."""
-    cursor.execute("""
-        SELECT DISTINCT store_id 
-        FROM monitoring_checks 
-        WHERE check_date = ?
-    """, (check_date,))
-    return {row[0] for row in cursor.fetchall()}
+    with get_connection() as conn:
+        rows = conn.execute(SQL_CHECKED_STORES_FOR_DATE, (to_day(check_date),)).fetchall()
+    return {row[0] for row in rows}
+
+def get_checked_stores_for_range(start_date: date, end_date: date):
+    """Проверенные магазины по дням периода одним запросом: {дата: множество ID магазинов}.
+    
+    В словаре только дни, за которые есть проверки, по возрастанию даты.
+    """
+    coverage = {}
+    with get_connection() as conn:
+        for check_day, store_id in conn.execute(SQL_CHECKED_STORES_FOR_RANGE, (to_day(start_date), to_day(end_date))):
+            coverage.setdefault(from_day(check_day), set()).add(store_id)
+    return coverage
 
 def get_nomenclature_by_store_id(store_id: int):
     """Получает номенклатуру для указанного магазина."""
-    cursor.execute("""
-        SELECT product_name 
-        FROM nomenclature 
-        WHERE store_id = ? 
-        ORDER BY product_name
-    """, (store_id,))
-    return cursor.fetchall()
+    with get_connection() as conn:
+        return conn.execute(SQL_NOMENCLATURE_BY_STORE, (store_id,)).fetchall()
 
 def get_checked_items_for_store_date(store_id: int, check_date: date):
     """Получает отмеченные товары для магазина на указанную дату."""
-    cursor.execute("""
-        SELECT product_name 
-        FROM monitoring_checks 
-        WHERE store_id = ? AND check_date = ? AND is_present = 1
-    """, (store_id, check_date))
-    return {row[0] for row in cursor.fetchall()}
+    with get_connection() as conn:
+        rows = conn.execute(SQL_CHECKED_ITEMS_FOR_STORE_DATE, (store_id, to_day(check_date))).fetchall()
+    return {row[0] for row in rows}
+
+def _write_check_results(conn, store_id: int, all_products: list, checked_products: set, check_date: date):
+    check_day = to_day(check_date)
+    product_ids = _product_ids(conn, all_products)
+    
+    # Сравниваем с тем, что уже сохранено за эту дату
+    stored = {row[0]: row[1] for row in conn.execute(SQL_CHECK_RESULTS_FOR_STORE_DATE, (store_id, check_day))}
+    desired = {product_ids[product]: 1 if product in checked_products else 0 for product in all_products}
+    
+    changed = [(store_id, check_day, product_id, is_present)
+               for product_id, is_present in desired.items() if stored.get(product_id) != is_present]
+    removed = [(store_id, check_day, product_id) for product_id in stored if product_id not in desired]
+    
+    # Записываем только изменившиеся товары
+    if changed:
+        conn.executemany("""
+            INSERT INTO monitoring_checks (store_id, check_day, product_id, is_present)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (store_id, check_day, product_id)
+            DO UPDATE SET is_present = excluded.is_present
+        """, changed)
+    
+    # Товары, которых больше нет в номенклатуре
+    if removed:
+        conn.executemany("""
+            DELETE FROM monitoring_checks 
+            WHERE store_id = ? AND check_day = ? AND product_id = ?
+        """, removed)
+    
+    # Дневная сводка магазина в той же транзакции
+    conn.execute("""
+        INSERT INTO daily_store_summary (check_day, store_id, total, present, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (check_day, store_id) DO UPDATE SET
+            total = excluded.total,
+            present = excluded.present,
+            updated_at = excluded.updated_at
+        WHERE total != excluded.total OR present != excluded.present
+    """, (check_day, store_id, len(desired), sum(desired.values())))
+    
+    return len(changed) + len(removed)
 
 def record_check_results(store_id: int, all_products: list, checked_products: set, check_date: date):
-    """Записывает результаты проверки в базу данных."""
+    """Записывает результаты проверки в базу данных (через очередь писателя).
+    
+    Пишутся только отличающиеся от сохраненных строки. Возвращает число
+    затронутых строк или None при ошибке.
+    """
     try:
-        # Удаляем старые записи за эту дату для этого магазина
-        cursor.execute("""
-            DELETE FROM monitoring_checks 
-            WHERE store_id = ? AND check_date = ?
-        """, (store_id, check_date))
-        
-        # Записываем новые результаты
-        for product in all_products:
-            is_present = 1 if product in checked_products else 0
-            cursor.execute("""
-                INSERT INTO monitoring_checks (store_id, product_name, check_date, is_present)
-                VALUES (?, ?, ?, ?)
-            """, (store_id, product, check_date, is_present))
-        
-        conn.commit()
-        logging.info(f"Записаны результаты проверки для магазина {store_id}: {len(checked_products)}/{len(all_products)}")
-        return True
+        touched = writer.execute(_write_check_results, store_id, all_products, checked_products, check_date,
+                                 timeout=DB_WRITE_TIMEOUT)
+        logging.info(f"Записаны результаты проверки для магазина {store_id}: {len(checked_products)}/{len(all_products)}, изменено строк: {touched}")
+        return touched
     except Exception as e:
         logging.error(f"Ошибка записи результатов проверки: {e}")
-        conn.rollback()
-        return False
+        return None
+
+def _store_search_terms(query: str):
+    # trigram ищет подстроки от 3 символов; каждую часть запроса берем фразой
+    terms = [term for term in query.split() if len(term) >= 3]
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+# Есть ли индекс stores_fts, по версии схемы файла БД (PRAGMA schema_version): миграция,
+# примененная другим процессом (manage.py migrate), меняет версию, и наличие проверяется заново
+_store_search_index_available = (None, False)
+
+def _has_store_search_index(conn):
+    global _store_search_index_available
+    schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    cached_version, available = _store_search_index_available
+    if cached_version != schema_version:
+        available = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stores_fts'"
+        ).fetchone() is not None
+        _store_search_index_available = (schema_version, available)
+    return available
 
 def find_stores_in_network(network_id: int, query: str):
-    """Ищет магазины по номеру или части адреса в указанной сети."""
+    """Ищет магазины по номеру или части адреса в указанной сети.
+    
+    Использует FTS5-индекс (trigram) по номеру и адресу: совпадения по началу
+    номера идут первыми, остальные - по релевантности. Короткие запросы
+    (меньше 3 символов) проверяются по магазинам сети без индекса.
+    """
     try:
-        cursor.execute("""
-            SELECT id, number, address 
-            FROM stores 
-            WHERE network_id = ? AND (
-                LOWER(CAST(number AS TEXT)) LIKE LOWER(?) OR 
-                LOWER(address) LIKE LOWER(?)
-            )
-            ORDER BY number
-            LIMIT 20
-        """, (network_id, f"%{query}%", f"%{query}%"))
+        query = query.strip()
+        number_from, number_to = query, query + '\U0010ffff'
+        terms = _store_search_terms(query)
+        
+        with get_connection() as conn:
+            if terms and _has_store_search_index(conn):
+                rows = conn.execute(SQL_SEARCH_STORES, (terms, network_id, query, number_from, number_to)).fetchall()
+            else:
+                folded = query.casefold()
+                rows = [store for store in conn.execute(SQL_STORES_BY_NETWORK, (network_id,))
+                        if folded in str(store[1]).casefold() or folded in (store[2] or '').casefold()]
+                rows.sort(key=lambda store: (str(store[1]) != query,
+                                             not number_from <= str(store[1]) < number_to, store[1]))
+                rows = rows[:20]
         
         results = []
-        for store in cursor.fetchall():
+        for store in rows:
             results.append({
                 'id': store[0],
                 'number': store[1],
@@ -106,90 +607,190 @@ def find_stores_in_network(network_id: int, query: str):
         logging.error(f"Ошибка поиска магазинов: {e}")
         return []
 
+def _update_latest_network_prices(conn, rows: list):
+    # rows: (store_id, product_id, check_day, regular_price, promo_price, has_promo, ...)
+    store_ids = list({row[0] for row in rows})
+    networks = dict(conn.execute(
+        f"SELECT id, network_id FROM stores WHERE id IN ({','.join('?' * len(store_ids))})", store_ids
+    ).fetchall())
+    
+    priced = []
+    unpriced = []
+    for store_id, product_id, check_day, regular_price, promo_price, has_promo, *_ in rows:
+        network_id = networks.get(store_id)
+        if network_id is None:
+            continue
+        if regular_price is not None or promo_price is not None:
+            priced.append((network_id, product_id, store_id, check_day, regular_price, promo_price, has_promo))
+        else:
+            unpriced.append((network_id, product_id, store_id, check_day))
+    
+    # Более старая проверка не вытесняет более новую цену; за один день побеждает
+    # магазин с меньшим ID - тот же порядок (check_day DESC, store_id), что при пересчете
+    if priced:
+        conn.executemany("""
+            INSERT INTO latest_network_price
+                (network_id, product_id, store_id, check_day, regular_price, promo_price, has_promo)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (network_id, product_id) DO UPDATE SET
+                store_id = excluded.store_id,
+                check_day = excluded.check_day,
+                regular_price = excluded.regular_price,
+                promo_price = excluded.promo_price,
+                has_promo = excluded.has_promo
+            WHERE excluded.check_day > latest_network_price.check_day
+               OR (excluded.check_day = latest_network_price.check_day
+                   AND excluded.store_id <= latest_network_price.store_id)
+        """, priced)
+    
+    # Если цену, которая была последней, перезаписали пустой - берем предыдущую
+    for network_id, product_id, store_id, check_day in unpriced:
+        deleted = conn.execute("""
+            DELETE FROM latest_network_price
+            WHERE network_id = ? AND product_id = ? AND store_id = ? AND check_day = ?
+        """, (network_id, product_id, store_id, check_day)).rowcount
+        if deleted:
+            conn.execute("""
+                INSERT INTO latest_network_price
+                    (network_id, product_id, store_id, check_day, regular_price, promo_price, has_promo)
+                SELECT s.network_id, pc.product_id, pc.store_id, pc.check_day,
+                       pc.regular_price, pc.promo_price, pc.has_promo
+                FROM price_checks pc
+                JOIN stores s ON s.id = pc.store_id
+                WHERE pc.product_id = ? AND s.network_id = ?
+                  AND (pc.regular_price IS NOT NULL OR pc.promo_price IS NOT NULL)
+                ORDER BY pc.check_day DESC, pc.store_id
+                LIMIT 1
+            """, (product_id, network_id))
+
+def _write_price_checks(conn, rows: list):
+    product_ids = _product_ids(conn, [row[1] for row in rows])
+    rows = [(row[0], product_ids[row[1]], to_day(row[2])) + tuple(row[3:]) for row in rows]
+    conn.executemany("""
+        INSERT OR REPLACE INTO price_checks 
+        (store_id, product_id, check_day, regular_price, promo_price, has_promo, stock_quantity, price_notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    _update_latest_network_prices(conn, rows)
+    return len(rows)
+
 def save_price_check(store_id: int, product_name: str, check_date: date, 
                     regular_price: float = None, promo_price: float = None, 
-                    has_promo: bool = False, stock_quantity: int = None):
-    """Сохраняет данные о проверке цены товара."""
+                    has_promo: bool = False, stock_quantity: int = None,
+                    price_notes: str = None):
+    """Сохраняет данные о проверке цены товара (через очередь писателя)."""
     try:
-        cursor.execute("""
-            INSERT OR REPLACE INTO price_checks 
-            (store_id, product_name, check_date, regular_price, promo_price, has_promo, stock_quantity)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (store_id, product_name, check_date, regular_price, promo_price, has_promo, stock_quantity))
-        
-        conn.commit()
+        writer.execute(_write_price_checks, [(store_id, product_name, check_date, regular_price,
+                                              promo_price, has_promo, stock_quantity, price_notes or '')],
+                       timeout=DB_WRITE_TIMEOUT)
         return True
     except Exception as e:
         logging.error(f"Ошибка сохранения проверки цены: {e}")
         return False
 
+def save_price_checks(store_id: int, check_date: date, records: list):
+    """Сохраняет пачку проверок цен одного магазина за дату одной транзакцией.
+    
+    ``records`` - уже проверенные словари с ключами product_name, regular_price,
+    promo_price, has_promo, stock_quantity и price_notes. Возвращает число
+    сохраненных записей или None при ошибке.
+    """
+    rows = [(store_id, record['product_name'], check_date, record.get('regular_price'),
+             record.get('promo_price'), record.get('has_promo', False),
+             record.get('stock_quantity'), record.get('price_notes') or '')
+            for record in records]
+    if not rows:
+        return 0
+    try:
+        return writer.execute(_write_price_checks, rows, timeout=DB_WRITE_TIMEOUT)
+    except Exception as e:
+        logging.error(f"Ошибка пакетного сохранения цен для магазина {store_id}: {e}")
+        return None
+
 def get_price_check(store_id: int, product_name: str, check_date: date):
     """Получает данные о проверке цены товара."""
-    cursor.execute("""
-        SELECT regular_price, promo_price, has_promo, stock_quantity
-        FROM price_checks 
-        WHERE store_id = ? AND product_name = ? AND check_date = ?
-    """, (store_id, product_name, check_date))
+    with get_connection() as conn:
+        result = conn.execute(SQL_PRICE_CHECK, (store_id, to_day(check_date), product_name)).fetchone()
     
-    result = cursor.fetchone()
     if result:
         return {
             'regular_price': result[0],
             'promo_price': result[1],
             'has_promo': result[2],
-            'stock_quantity': result[3]
+            'stock_quantity': result[3],
+            'price_notes': result[4] or ''
         }
     return None
 
+def get_last_price_in_network(network_id: int, product_name: str):
+    """Получает последнюю известную цену товара в сети за все даты."""
+    with get_connection() as conn:
+        result = conn.execute(SQL_LAST_PRICE_IN_NETWORK, (network_id, product_name)).fetchone()
+    
+    if result:
+        return {
+            'regular_price': result['regular_price'],
+            'promo_price': result['promo_price'],
+            'has_promo': bool(result['has_promo']),
+            'check_date': from_day(result['check_day']).isoformat(),
+            'store_number': result['store_number'] or 'Неизвестно'
+        }
+    return None
+
+def get_store_details(store_id: int):
+    """Получает номер, адрес, сеть и регион магазина (None, если магазина нет)."""
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT s.number as name, s.address, n.name as network_name, r.name as region_name
+            FROM stores s
+            LEFT JOIN networks n ON s.network_id = n.id  
+            LEFT JOIN regions r ON n.region_id = r.id
+            WHERE s.id = ?
+        """, (store_id,)).fetchone()
+    return dict(row) if row else None
+
+def get_stores_count():
+    """Возвращает количество магазинов (используется для проверки здоровья)."""
+    with get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) as count FROM stores").fetchone()['count']
+
+def get_daily_store_summary(check_date: date):
+    """Возвращает итоги проверок по магазинам за дату из дневной сводки."""
+    with get_connection() as conn:
+        rows = conn.execute(SQL_DAILY_STORE_SUMMARY, (to_day(check_date),)).fetchall()
+    return [dict(row) for row in rows]
+
+def _rebuild_daily_store_summary(conn, start_day: int, end_day: int):
+    conn.execute("DELETE FROM daily_store_summary WHERE check_day BETWEEN ? AND ?", (start_day, end_day))
+    return conn.execute(SQL_REBUILD_DAILY_STORE_SUMMARY, (start_day, end_day)).rowcount
+
+def rebuild_daily_store_summary(start_date: date = None, end_date: date = None):
+    """Пересчитывает дневную сводку из monitoring_checks (по умолчанию за все дни).
+    
+    Возвращает число записанных строк сводки.
+    """
+    start_day = to_day(start_date) if start_date else -(2 ** 31)
+    end_day = to_day(end_date) if end_date else 2 ** 31
+    return writer.execute(_rebuild_daily_store_summary, start_day, end_day, timeout=None)
+
 def create_store_report(store_id: int, report_date: date, store_name: str = None):
-    """Создает Excel отчет для магазина."""
+    """Создает Excel отчет для магазина (потоковая запись XLSX, без pandas)."""
     try:
-        import pandas as pd
-        from datetime import datetime
+        from exports import store_xlsx_chunks, write_chunks
         
         # Получаем данные проверки
-        cursor.execute("""
-            SELECT mc.product_name, mc.is_present,
-                   pc.regular_price, pc.promo_price, pc.has_promo, pc.stock_quantity
-            FROM monitoring_checks mc
-            LEFT JOIN price_checks pc ON mc.store_id = pc.store_id 
-                AND mc.product_name = pc.product_name 
-                AND mc.check_date = pc.check_date
-            WHERE mc.store_id = ? AND mc.check_date = ?
-            ORDER BY mc.product_name
-        """, (store_id, report_date))
-        
-        data = cursor.fetchall()
+        with get_connection() as conn:
+            data = conn.execute(SQL_STORE_REPORT_ROWS, (store_id, to_day(report_date))).fetchall()
         
         if not data:
             logging.warning(f"Нет данных для отчета магазина {store_id} за {report_date}")
             return None
         
-        # Создаем DataFrame
-        df_data = []
-        for row in data:
-            df_data.append({
-                'Товар': row[0],
-                'Наличие': 'Да' if row[1] else 'Нет',
-                'Обычная цена': row[2] if row[2] else '',
-                'Акционная цена': row[3] if row[3] else '',
-                'Есть акция': 'Да' if row[4] else 'Нет',
-                'Остаток': row[5] if row[5] else ''
-            })
-        
-        df = pd.DataFrame(df_data)
-        
         # Создаем имя файла
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"reports/Отчет_магазин_{store_id}_{report_date.strftime('%Y-%m-%d')}_{timestamp}.xlsx"
         
-        # Создаем папку reports если её нет
-        os.makedirs('reports', exist_ok=True)
-        
-        # Сохраняем в Excel
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Отчет', index=False)
-        
+        write_chunks(filename, store_xlsx_chunks(data))
         logging.info(f"Создан отчет: {filename}")
         return filename
         
@@ -197,78 +798,62 @@ def create_store_report(store_id: int, report_date: date, store_name: str = None
         logging.error(f"Ошибка создания отчета: {e}")
         return None
 
-def create_tables_if_not_exist():
-    """Создает таблицы в базе данных, если они не существуют."""
+def iter_period_rows(start_date: date, end_date: date, network_id: int = None):
+    """Строки проверок за период по порядку дат, порциями по EXPORT_FETCH_SIZE (fetchmany).
+    
+    Каждая строка: (дата, регион, сеть, номер магазина, адрес, товар, наличие,
+    обычная цена, акционная цена, есть акция, остаток). С ``network_id`` -
+    только магазины этой сети. Соединение из пула занято, пока генератор не
+    дочитан или не закрыт.
+    """
+    params = (to_day(start_date), to_day(end_date))
+    with get_connection() as conn:
+        if network_id is None:
+            cursor = conn.execute(SQL_PERIOD_REPORT_ROWS, params)
+        else:
+            cursor = conn.execute(SQL_PERIOD_REPORT_ROWS_BY_NETWORK, params + (network_id,))
+        while True:
+            chunk = cursor.fetchmany(EXPORT_FETCH_SIZE)
+            if not chunk:
+                break
+            for (check_day, region_name, network_name, number, address, product,
+                 is_present, regular_price, promo_price, has_promo, stock) in chunk:
+                yield (from_day(check_day), region_name, network_name, number, address, product,
+                       bool(is_present), regular_price, promo_price, bool(has_promo), stock)
+
+def create_report_for_period(start_date: date, end_date: date):
+    """Создает CSV отчет по проверкам за период (формат как у демо версии)."""
     try:
-        # Таблица регионов
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS regions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE
-            )
-        """)
-        
-        # Таблица сетей
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS networks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                region_id INTEGER,
-                FOREIGN KEY (region_id) REFERENCES regions (id)
-            )
-        """)
-        
-        # Таблица магазинов
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stores (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                number TEXT NOT NULL,
-                address TEXT,
-                network_id INTEGER,
-                FOREIGN KEY (network_id) REFERENCES networks (id)
-            )
-        """)
-        
-        # Таблица номенклатуры
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS nomenclature (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                store_id INTEGER,
-                product_name TEXT NOT NULL,
-                FOREIGN KEY (store_id) REFERENCES stores (id)
-            )
-        """)
+        from exports import period_csv_chunks, write_chunks
         
-        # Таблица результатов мониторинга
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS monitoring_checks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                store_id INTEGER,
-                product_name TEXT NOT NULL,
-                check_date DATE NOT NULL,
-                is_present INTEGER DEFAULT 0,
-                FOREIGN KEY (store_id) REFERENCES stores (id)
-            )
-        """)
-        
-        # Таблица проверок цен
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS price_checks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                store_id INTEGER,
-                product_name TEXT NOT NULL,
-                check_date DATE NOT NULL,
-                regular_price REAL,
-                promo_price REAL,
-                has_promo INTEGER DEFAULT 0,
-                stock_quantity INTEGER,
-                FOREIGN KEY (store_id) REFERENCES stores (id),
-                UNIQUE(store_id, product_name, check_date)
-            )
-        """)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"reports/Отчет_период_{start_date.strftime('%Y-%m-%d')}_{end_date.strftime('%Y-%m-%d')}_{timestamp}.csv"
         
-        conn.commit()
-        logging.info("Таблицы базы данных проверены/созданы")
+        write_chunks(filename, period_csv_chunks(iter_period_rows(start_date, end_date), start_date, end_date))
+        logging.info(f"Создан отчет за период: {filename}")
+        return filename
         
     except Exception as e:
-        logging.error(f"Ошибка создания таблиц: {e}")
\ No newline at end of file
+        logging.error(f"Ошибка создания отчета за период: {e}")
+        return None
+
+def get_storage_stats():
+    """Метрики хранилища для /health: пул соединений и очередь записи."""
+    return {
+        'pool': get_pool_stats(),
+        'writer': get_writer_stats()
+    }
+
+def create_tables_if_not_exist():
+    """Создает таблицы и применяет недостающие миграции схемы."""
+    with get_connection() as conn:
+        try:
+            version = run_migrations(conn)
+            logging.info(f"Таблицы базы данных проверены/созданы (версия схемы {version})")
+        except Exception as e:
+            logging.error(f"Ошибка создания таблиц: {e}")
+
+def check_hot_query_plans():
+    """Проверяет планы горячих запросов. Возвращает список запросов с полным SCAN."""
+    with get_connection() as conn:
+        return check_query_plans(conn, HOT_QUERIES)
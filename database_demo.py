@@ -3,6 +3,7 @@
 import logging
 from datetime import date, datetime
 import os
+import uuid
 
 # Демо данные для тестирования
 DEMO_REGIONS = [
@@ -74,6 +75,39 @@ DEMO_NOMENCLATURE = {
 # Хранилище для проверок (в памяти)
 monitoring_checks = {}
 price_checks = {}
+# Последняя известная цена товара в сети: (network_id, product_name) -> данные
+latest_network_prices = {}
+
+STORE_NETWORKS = {store_id: net_id for store_id, number, address, net_id in DEMO_STORES}
+
+# Измерения магазина для отчетов: ID магазина -> (номер, адрес, сеть, регион)
+_NETWORKS_BY_ID = {net_id: (name, region_id) for net_id, name, region_id in DEMO_NETWORKS}
+_REGION_NAMES = dict(DEMO_REGIONS)
+STORE_DIMENSIONS = {}
+for _store_id, _number, _address, _net_id in DEMO_STORES:
+    _network_name, _region_id = _NETWORKS_BY_ID.get(_net_id, ("Неизвестная сеть", 1))
+    STORE_DIMENSIONS[_store_id] = (_number, _address, _network_name,
+                                   _REGION_NAMES.get(_region_id, "Неизвестный регион"))
+
+# Магазины с проверками по датам: 'YYYY-MM-DD' -> ID магазинов (даты без проверок не хранятся)
+checked_stores_by_date = {}
+
+# Версия справочника регионов, сетей и магазинов (растет при его изменении)
+catalog_version = 1
+# Версия данных по дням: 'YYYY-MM-DD' -> число, растет при записи проверок или цен за день
+date_versions = {}
+# Эпоха хранилища: новая при каждом запуске, ведь данные в памяти (и случайные образцы)
+# после перезапуска другие, а версии дней снова начинаются с нуля
+store_epoch = None
+
+# Предрасчитанные счетчики для списков регионов и сетей
+NETWORK_STORE_COUNTS = {}
+for _store in DEMO_STORES:
+    NETWORK_STORE_COUNTS[_store[3]] = NETWORK_STORE_COUNTS.get(_store[3], 0) + 1
+REGION_COUNTS = {region_id: [0, 0] for region_id, name in DEMO_REGIONS}
+for _net_id, _name, _region_id in DEMO_NETWORKS:
+    REGION_COUNTS[_region_id][0] += 1
+    REGION_COUNTS[_region_id][1] += NETWORK_STORE_COUNTS.get(_net_id, 0)
 
 def get_all_regions():
     """Получает все регионы из демо данных."""
@@ -83,15 +117,67 @@ def get_networks_by_region(region_id: int):
     """Получает все сети для указанного региона."""
     return [(net_id, name) for net_id, name, reg_id in DEMO_NETWORKS if reg_id == region_id]
 
+def get_regions_with_counts():
+    """Получает регионы с количеством сетей и магазинов."""
+    return [(region_id, name, *REGION_COUNTS[region_id]) for region_id, name in DEMO_REGIONS]
+
+def get_networks_with_store_counts(region_id: int):
+    """Получает сети региона с количеством магазинов."""
+    return [(net_id, name, NETWORK_STORE_COUNTS.get(net_id, 0))
+            for net_id, name, reg_id in DEMO_NETWORKS if reg_id == region_id]
+
+def get_catalog_version():
+    """Возвращает версию справочника (демо данные не меняются)."""
+    return catalog_version
+
+def get_catalog(region_id: int = None):
+    """Возвращает справочник регион -> сеть -> магазин (весь или одного региона) с его версией."""
+    return {
+        'version': catalog_version,
+        'store_fields': ['id', 'number', 'address'],
+        'regions': [
+            {
+                'id': reg_id,
+                'name': reg_name,
+                'networks': [
+                    {
+                        'id': net_id,
+                        'name': net_name,
+                        'stores': sorted(([store_id, number, address]
+                                          for store_id, number, address, store_net in DEMO_STORES
+                                          if store_net == net_id), key=lambda store: store[1])
+                    }
+                    for net_id, net_name, net_region in sorted(DEMO_NETWORKS, key=lambda n: n[1])
+                    if net_region == reg_id
+                ]
+            }
+            for reg_id, reg_name in sorted(DEMO_REGIONS, key=lambda r: r[1])
+            if region_id is None or reg_id == region_id
+        ]
+    }
+
 def get_stores_by_network(network_id: int):
     """Получает все магазины для указанной сети."""
     return [(store_id, number, address) for store_id, number, address, net_id in DEMO_STORES if net_id == network_id]
 
 def get_checked_stores_for_date(check_date: date):
     """Получает список ID магазинов, которые были проверены в указанную дату."""
-    date_str = check_date.isoformat()
-    return {store_id for store_id, checks in monitoring_checks.items() 
-            if date_str in checks}
+    return set(checked_stores_by_date.get(check_date.isoformat(), ()))
+
+def get_checked_stores_for_range(start_date: date, end_date: date):
+    """Проверенные магазины по дням периода: {дата: множество ID магазинов}, только дни с проверками."""
+    start, end = start_date.isoformat(), end_date.isoformat()
+    return {date.fromisoformat(day): set(checked_stores_by_date[day])
+            for day in sorted(checked_stores_by_date) if start <= day <= end}
+
+def _index_store_date(store_id: int, date_str: str):
+    """Обновляет индекс дат после записи проверок магазина за дату."""
+    if monitoring_checks.get(store_id, {}).get(date_str):
+        checked_stores_by_date.setdefault(date_str, set()).add(store_id)
+    elif date_str in checked_stores_by_date:
+        checked_stores_by_date[date_str].discard(store_id)
+        if not checked_stores_by_date[date_str]:
+            del checked_stores_by_date[date_str]
 
 def get_nomenclature_by_store_id(store_id: int):
     """Получает номенклатуру для указанного магазина."""
@@ -106,46 +192,168 @@ def get_checked_items_for_store_date(store_id: int, check_date: date):
     return {product for product, is_present in date_checks.items() if is_present}
 
 def record_check_results(store_id: int, all_products: list, checked_products: set, check_date: date):
-    """Записывает результаты проверки в память."""
+    """Записывает результаты проверки в память.
+    
+    Как и в database.py, меняются только отличающиеся товары. Возвращает
+    число затронутых записей или None при ошибке.
+    """
     try:
         date_str = check_date.isoformat()
         
-        if store_id not in monitoring_checks:
-            monitoring_checks[store_id] = {}
+        stored = monitoring_checks.setdefault(store_id, {}).setdefault(date_str, {})
+        desired = {product: product in checked_products for product in all_products}
         
-        monitoring_checks[store_id][date_str] = {}
+        changed = [product for product, is_present in desired.items() if stored.get(product) != is_present]
+        removed = [product for product in stored if product not in desired]
         
-        for product in all_products:
-            is_present = product in checked_products
-            monitoring_checks[store_id][date_str][product] = is_present
+        for product in changed:
+            stored[product] = desired[product]
+        for product in removed:
+            del stored[product]
         
-        logging.info(f"Записаны результаты проверки для магазина {store_id}: {len(checked_products)}/{len(all_products)}")
-        return True
+        touched = len(changed) + len(removed)
+        _index_store_date(store_id, date_str)
+        if touched:
+            _bump_date_version(date_str)
+        logging.info(f"Записаны результаты проверки для магазина {store_id}: {len(checked_products)}/{len(all_products)}, изменено записей: {touched}")
+        return touched
     except Exception as e:
         logging.error(f"Ошибка записи результатов проверки: {e}")
-        return False
+        return None
+
+def _bump_date_version(date_str: str):
+    date_versions[date_str] = date_versions.get(date_str, 0) + 1
+
+def get_store_epoch():
+    """Эпоха хранилища: случайный ID, новый при каждом запуске процесса."""
+    return store_epoch
+
+def get_data_version(start_date: date, end_date: date):
+    """Версия данных периода: меняется при любой записи проверок или цен за его даты."""
+    start, end = start_date.isoformat(), end_date.isoformat()
+    return sum(version for day, version in date_versions.items() if start <= day <= end)
+
+def get_daily_store_summary(check_date: date):
+    """Возвращает итоги проверок по магазинам за дату."""
+    date_str = check_date.isoformat()
+    summary = []
+    
+    for store_id in checked_stores_by_date.get(date_str, ()):
+        if store_id not in STORE_DIMENSIONS:
+            continue
+        
+        date_checks = monitoring_checks[store_id][date_str]
+        number, address, network_name = STORE_DIMENSIONS[store_id][:3]
+        summary.append({
+            'id': store_id,
+            'number': number,
+            'address': address,
+            'network_name': network_name,
+            'total_checks': len(date_checks),
+            'present_items': sum(1 for is_present in date_checks.values() if is_present)
+        })
+    
+    return sorted(summary, key=lambda store: store['number'])
+
+# Триграммный индекс для поиска магазинов: триграмма -> ID магазинов
+_store_trigrams = None
+_store_search_text = {}
+
+def _trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _build_store_search_index():
+    global _store_trigrams
+    index = {}
+    for store_id, number, address, net_id in DEMO_STORES:
+        text = f"{number} {address or ''}".casefold()
+        _store_search_text[store_id] = text
+        for trigram in _trigrams(text):
+            index.setdefault(trigram, set()).add(store_id)
+    _store_trigrams = index
 
 def find_stores_in_network(network_id: int, query: str):
-    """Ищет магазины по номеру или части адреса в указанной сети."""
+    """Ищет магазины по номеру или части адреса в указанной сети.
+    
+    Аналог FTS5 trigram из database.py: совпадения по началу номера идут
+    первыми, затем - по позиции совпадения в тексте.
+    """
     try:
-        results = []
-        query_lower = query.lower()
+        if _store_trigrams is None:
+            _build_store_search_index()
         
-        for store_id, number, address, net_id in DEMO_STORES:
-            if net_id == network_id:
-                if (query_lower in str(number).lower() or 
-                    query_lower in (address or '').lower()):
-                    results.append({
-                        'id': store_id,
-                        'number': number,
-                        'address': address or 'Адрес не указан'
-                    })
+        query = query.strip()
+        terms = [term.casefold() for term in query.split()]
+        indexed_terms = [term for term in terms if len(term) >= 3]
         
-        return results[:20]  # Ограничиваем до 20 результатов
+        candidates = None
+        for term in indexed_terms:
+            for trigram in _trigrams(term):
+                matched = _store_trigrams.get(trigram, set())
+                candidates = matched if candidates is None else candidates & matched
+        
+        if not indexed_terms:
+            # Короткий запрос: проверяем все магазины сети целиком
+            indexed_terms = [query.casefold()]
+        
+        results = []
+        for store_id, number, address, net_id in DEMO_STORES:
+            if net_id != network_id or (candidates is not None and store_id not in candidates):
+                continue
+            text = _store_search_text[store_id]
+            if not all(term in text for term in indexed_terms):
+                continue
+            rank = (str(number) != query, not str(number).startswith(query),
+                    min(text.find(term) for term in indexed_terms), number)
+            results.append((rank, {
+                'id': store_id,
+                'number': number,
+                'address': address or 'Адрес не указан'
+            }))
+        
+        results.sort(key=lambda item: item[0])
+        return [store for rank, store in results[:20]]  # Ограничиваем до 20 результатов
     except Exception as e:
         logging.error(f"Ошибка поиска магазинов: {e}")
         return []
 
+def _find_latest_network_price(network_id: int, product_name: str):
+    # Полный пересмотр проверок товара в сети (только когда последнюю цену стерли)
+    best = None
+    for store_id, net_id in STORE_NETWORKS.items():
+        if net_id != network_id:
+            continue
+        prefix = f"{store_id}_{product_name}_"
+        for key, price_data in price_checks.items():
+            if not key.startswith(prefix):
+                continue
+            if price_data.get('regular_price') is None and price_data.get('promo_price') is None:
+                continue
+            date_str = key[len(prefix):]
+            if best is None or (date_str, -store_id) > (best['check_date'], -best['store_id']):
+                best = dict(price_data, check_date=date_str, store_id=store_id)
+    return best
+
+def _update_latest_network_price(store_id: int, product_name: str, date_str: str, price_data: dict):
+    network_id = STORE_NETWORKS.get(store_id)
+    if network_id is None:
+        return
+    key = (network_id, product_name)
+    latest = latest_network_prices.get(key)
+    
+    if price_data.get('regular_price') is not None or price_data.get('promo_price') is not None:
+        # Более старая проверка не вытесняет более новую цену; за один день
+        # побеждает магазин с меньшим ID, как в _find_latest_network_price
+        if latest is None or (date_str, -store_id) >= (latest['check_date'], -latest['store_id']):
+            latest_network_prices[key] = dict(price_data, check_date=date_str, store_id=store_id)
+    elif latest and latest['store_id'] == store_id and latest['check_date'] == date_str:
+        # Последнюю цену перезаписали пустой - берем предыдущую
+        previous = _find_latest_network_price(network_id, product_name)
+        if previous:
+            latest_network_prices[key] = previous
+        else:
+            del latest_network_prices[key]
+
 def save_price_check(store_id: int, product_name: str, check_date: date, 
                     regular_price: float = None, promo_price: float = None, 
                     has_promo: bool = False, stock_quantity: int = None, 
@@ -162,12 +370,43 @@ def save_price_check(store_id: int, product_name: str, check_date: date,
             'stock_quantity': stock_quantity,
             'price_notes': price_notes or ''
         }
+        _update_latest_network_price(store_id, product_name, date_str, price_checks[key])
+        _bump_date_version(date_str)
         
         return True
     except Exception as e:
         logging.error(f"Ошибка сохранения проверки цены: {e}")
         return False
 
+def save_price_checks(store_id: int, check_date: date, records: list):
+    """Сохраняет пачку проверок цен одного магазина за дату.
+    
+    Все записи применяются вместе: при ошибке память не меняется. Возвращает
+    число сохраненных записей или None при ошибке.
+    """
+    try:
+        date_str = check_date.isoformat()
+        updates = {}
+        for record in records:
+            key = f"{store_id}_{record['product_name']}_{date_str}"
+            updates[key] = (record['product_name'], {
+                'regular_price': record.get('regular_price'),
+                'promo_price': record.get('promo_price'),
+                'has_promo': record.get('has_promo', False),
+                'stock_quantity': record.get('stock_quantity'),
+                'price_notes': record.get('price_notes') or ''
+            })
+        
+        for key, (product_name, price_data) in updates.items():
+            price_checks[key] = price_data
+            _update_latest_network_price(store_id, product_name, date_str, price_data)
+        if updates:
+            _bump_date_version(date_str)
+        return len(records)
+    except Exception as e:
+        logging.error(f"Ошибка пакетного сохранения цен для магазина {store_id}: {e}")
+        return None
+
 def get_price_check(store_id: int, product_name: str, check_date: date):
     """Получает данные о проверке цены товара."""
     date_str = check_date.isoformat()
@@ -180,51 +419,58 @@ def get_price_check(store_id: int, product_name: str, check_date: date):
     return price_data
 
 def create_store_report(store_id: int, report_date: date, store_name: str = None):
-    """Создает отчет для магазина (демо версия - только текстовый формат)."""
+    """Создает Excel отчет для магазина (демо версия, тот же XLSX без pandas)."""
     try:
-        from datetime import datetime
-        import os
+        from exports import store_xlsx_chunks, write_chunks
         
         # Получаем данные проверки из памяти
         date_str = report_date.isoformat()
-        store_checks = monitoring_checks.get(store_id, {})
-        date_checks = store_checks.get(date_str, {})
+        date_checks = monitoring_checks.get(store_id, {}).get(date_str, {})
         
         if not date_checks:
             logging.warning(f"Нет данных для отчета магазина {store_id} за {report_date}")
             return None
         
-        # Создаем простой CSV отчет (совместимый с Excel)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"/tmp/Отчет_магазин_{store_id}_{report_date.strftime('%Y-%m-%d')}_{timestamp}.csv"
-        
-        # Создаем директорию если нужно
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        rows = []
+        for product, is_present in sorted(date_checks.items()):
+            price_data = price_checks.get(f"{store_id}_{product}_{date_str}", {})
+            rows.append((product, is_present, price_data.get('regular_price'), price_data.get('promo_price'),
+                         price_data.get('has_promo'), price_data.get('stock_quantity')))
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            # Заголовки CSV
-            f.write("Товар,Наличие,Обычная цена,Акционная цена,Есть акция,Остаток\n")
-            
-            # Данные
-            for product, is_present in date_checks.items():
-                price_key = f"{store_id}_{product}_{date_str}"
-                price_data = price_checks.get(price_key, {})
-                
-                status = "Да" if is_present else "Нет"
-                regular_price = price_data.get('regular_price', '')
-                promo_price = price_data.get('promo_price', '')
-                has_promo = "Да" if price_data.get('has_promo') else "Нет"
-                stock = price_data.get('stock_quantity', '')
-                
-                f.write(f'"{product}","{status}","{regular_price}","{promo_price}","{has_promo}","{stock}"\n')
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"/tmp/Отчет_магазин_{store_id}_{report_date.strftime('%Y-%m-%d')}_{timestamp}.xlsx"
         
-        logging.info(f"Создан CSV отчет: {filename}")
+        write_chunks(filename, store_xlsx_chunks(rows))
+        logging.info(f"Создан отчет: {filename}")
         return filename
         
     except Exception as e:
         logging.error(f"Ошибка создания отчета: {e}")
         return None
 
+def get_store_details(store_id: int):
+    """Получает номер, адрес, сеть и регион магазина (None, если магазина нет)."""
+    store_data = next((s for s in DEMO_STORES if s[0] == store_id), None)
+    if not store_data:
+        return None
+    
+    network_data = next((n for n in DEMO_NETWORKS if n[0] == store_data[3]), None)
+    region_data = next((r for r in DEMO_REGIONS if network_data and r[0] == network_data[2]), None)
+    return {
+        'name': store_data[1],
+        'address': store_data[2],
+        'network_name': network_data[1] if network_data else None,
+        'region_name': region_data[1] if region_data else None
+    }
+
+def get_stores_count():
+    """Возвращает количество магазинов (используется для проверки здоровья)."""
+    return len(DEMO_STORES)
+
+def get_storage_stats():
+    """Метрики хранилища для /health (в демо режиме их нет)."""
+    return {}
+
 def create_tables_if_not_exist():
     """Заглушка для совместимости."""
     logging.info("Демо режим: таблицы не требуются")
@@ -306,33 +552,20 @@ conn = None
 cursor = None
 
 def get_last_price_in_network(network_id: int, product_name: str):
-    """Получает последнюю цену товара в сети (демо версия)."""
+    """Получает последнюю известную цену товара в сети за все даты (демо версия)."""
     try:
-        from datetime import date
-        
-        # Ищем последнюю цену в наших данных
-        today = date.today()
-        date_str = today.isoformat()
-        
-        # Получаем все магазины сети
-        network_stores = [store_id for store_id, number, address, net_id in DEMO_STORES if net_id == network_id]
-        
-        # Ищем последнюю цену среди всех магазинов сети
-        for store_id in network_stores:
-            price_key = f"{store_id}_{product_name}_{date_str}"
-            if price_key in price_checks:
-                price_data = price_checks[price_key]
-                store_info = next((s for s in DEMO_STORES if s[0] == store_id), None)
-                
-                return {
-                    'regular_price': price_data.get('regular_price'),
-                    'promo_price': price_data.get('promo_price'),
-                    'has_promo': price_data.get('has_promo', False),
-                    'check_date': date_str,
-                    'store_number': store_info[1] if store_info else 'Неизвестно'
-                }
+        latest = latest_network_prices.get((network_id, product_name))
+        if not latest:
+            return None
         
-        return None
+        store_info = next((s for s in DEMO_STORES if s[0] == latest['store_id']), None)
+        return {
+            'regular_price': latest.get('regular_price'),
+            'promo_price': latest.get('promo_price'),
+            'has_promo': latest.get('has_promo', False),
+            'check_date': latest['check_date'],
+            'store_number': store_info[1] if store_info else 'Неизвестно'
+        }
         
     except Exception as e:
         logging.error(f"Ошибка получения последней цены: {e}")
@@ -381,81 +614,59 @@ def create_sample_data():
                         'stock_quantity': stock,
                         'price_notes': f'Проверено {check_date.strftime("%d.%m.%Y")}'
                     }
+                    _update_latest_network_price(store_id, product, date_str, price_checks[price_key])
+            
+            _index_store_date(store_id, date_str)
     
     logging.info(f"Созданы образцы данных за {len(monitoring_checks)} магазинов за 3 дня")
 
-# Создаем образцы данных при импорте модуля
-create_sample_data()def cre
-ate_report_for_period(start_date: date, end_date: date):
+_initialized = False
+
+def init_backend():
+    """Создает образцы данных при первом обращении к хранилищу (а не при импорте)."""
+    global _initialized, store_epoch
+    if not _initialized:
+        _initialized = True
+        store_epoch = uuid.uuid4().hex
+        create_sample_data()
+
+def iter_period_rows(start_date: date, end_date: date, network_id: int = None):
+    """Строки проверок за период по порядку дат (демо версия, см. database.iter_period_rows).
+    
+    Обходятся только даты, за которые есть проверки, а магазин, сеть и регион
+    берутся из готовых словарей, поэтому время зависит от числа строк, а не
+    от длины периода. Порядок строк как в SQLite: дата, номер магазина, товар.
+    С ``network_id`` - только магазины этой сети.
+    """
+    start, end = start_date.isoformat(), end_date.isoformat()
+    for date_str in sorted(day for day in checked_stores_by_date if start <= day <= end):
+        check_date = date.fromisoformat(date_str)
+        stores = sorted((STORE_DIMENSIONS[store_id], store_id)
+                        for store_id in checked_stores_by_date[date_str]
+                        if store_id in STORE_DIMENSIONS
+                        and (network_id is None or STORE_NETWORKS.get(store_id) == network_id))
+        for (number, address, network_name, region_name), store_id in stores:
+            for product, is_present in sorted(monitoring_checks[store_id][date_str].items()):
+                price_data = price_checks.get(f"{store_id}_{product}_{date_str}")
+                if price_data is None:
+                    yield (check_date, region_name, network_name, number, address, product,
+                           bool(is_present), None, None, False, None)
+                else:
+                    yield (check_date, region_name, network_name, number, address, product,
+                           bool(is_present), price_data.get('regular_price'), price_data.get('promo_price'),
+                           bool(price_data.get('has_promo')), price_data.get('stock_quantity'))
+
+def create_report_for_period(start_date: date, end_date: date):
     """Создает отчет за период (демо версия)."""
     try:
         from datetime import datetime
-        import os
+        from exports import period_csv_chunks, write_chunks
         
         # Создаем CSV отчет за период
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"/tmp/Отчет_период_{start_date.strftime('%Y-%m-%d')}_{end_date.strftime('%Y-%m-%d')}_{timestamp}.csv"
         
-        # Создаем директорию если нужно
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            # Заголовок отчета
-            f.write(f"Отчет за период с {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}\n")
-            f.write(f"Создан: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}\n")
-            f.write("=" * 80 + "\n\n")
-            
-            # Заголовки CSV
-            f.write("Дата,Регион,Сеть,Магазин,Адрес,Товар,Наличие,Обычная цена,Акционная цена,Есть акция,Остаток\n")
-            
-            # Собираем данные за период
-            current_date = start_date
-            total_checks = 0
-            
-            while current_date <= end_date:
-                date_str = current_date.isoformat()
-                
-                # Проходим по всем проверкам за эту дату
-                for store_id, store_checks in monitoring_checks.items():
-                    if date_str in store_checks:
-                        # Получаем информацию о магазине
-                        store_info = next((s for s in DEMO_STORES if s[0] == store_id), None)
-                        if not store_info:
-                            continue
-                            
-                        # Получаем информацию о сети
-                        network_info = next((n for n in DEMO_NETWORKS if n[0] == store_info[3]), None)
-                        network_name = network_info[1] if network_info else "Неизвестная сеть"
-                        
-                        # Получаем информацию о регионе
-                        region_info = next((r for r in DEMO_REGIONS if r[0] == (network_info[2] if network_info else 1)), None)
-                        region_name = region_info[1] if region_info else "Неизвестный регион"
-                        
-                        # Записываем данные по каждому товару
-                        date_checks = store_checks[date_str]
-                        for product, is_present in date_checks.items():
-                            # Получаем данные о ценах
-                            price_key = f"{store_id}_{product}_{date_str}"
-                            price_data = price_checks.get(price_key, {})
-                            
-                            status = "Да" if is_present else "Нет"
-                            regular_price = price_data.get('regular_price', '')
-                            promo_price = price_data.get('promo_price', '')
-                            has_promo = "Да" if price_data.get('has_promo') else "Нет"
-                            stock = price_data.get('stock_quantity', '')
-                            
-                            f.write(f'"{current_date.strftime("%d.%m.%Y")}","{region_name}","{network_name}","№{store_info[1]}","{store_info[2]}","{product}","{status}","{regular_price}","{promo_price}","{has_promo}","{stock}"\n')
-                            total_checks += 1
-                
-                # Переходим к следующему дню
-                from datetime import timedelta
-                current_date += timedelta(days=1)
-            
-            # Добавляем итоги
-            f.write("\n" + "=" * 80 + "\n")
-            f.write(f"Всего проверок: {total_checks}\n")
-            f.write(f"Период: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}\n")
-        
+        write_chunks(filename, period_csv_chunks(iter_period_rows(start_date, end_date), start_date, end_date))
         logging.info(f"Создан отчет за период: {filename}")
         return filename
         
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# db_writer.py - Single-writer group commit queue for SQLite
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Единственный писатель в БД с групповой фиксацией транзакций.
+
+    Потоки запросов кладут в очередь намерения записи (функция + аргументы)
+    и получают ``Future``. Поток писателя собирает намерения, пришедшие в
+    течение ``batch_window_ms``, выполняет их в одной транзакции (каждое под
+    своим SAVEPOINT) и делает один COMMIT на всю пачку. Future разрешается
+    только после фиксации, поэтому API по-прежнему честно сообщает об успехе
+    или ошибке записи.
+
+    В синхронном режиме (``synchronous=True``) запись выполняется сразу в
+    вызывающем потоке — удобно для тестов и отладки.
+    """
+
+    def __init__(self, connect, batch_window_ms: float = 5, max_batch: int = 200,
+                 synchronous: bool = False):
+        self._connect = connect
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.synchronous = synchronous
+        self._queue = queue.Queue()
+        self._conn = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._intents = 0
+        self._failed = 0
+        self._last_batch = 0
+        self._max_batch_seen = 0
+        self._commit_total = 0.0
+
+    def submit(self, fn, *args) -> Future:
+        """Ставит намерение записи в очередь. ``fn(conn, *args)`` выполняется писателем."""
+        future = Future()
+        if self.synchronous:
+            with self._lock:
+                self._run_batch([(fn, args, future)])
+            return future
+
+        self._ensure_thread()
+        self._queue.put((fn, args, future))
+        return future
+
+    def execute(self, fn, *args, timeout: float = None):
+        """Выполняет запись и ждет ее фиксации. Возвращает результат ``fn``."""
+        return self.submit(fn, *args).result(timeout=timeout)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            intent = self._queue.get()
+            if intent is _STOP:
+                break
+
+            batch = [intent]
+            deadline = time.monotonic() + self.batch_window
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    intent = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if intent is _STOP:
+                    stop = True
+                    break
+                batch.append(intent)
+
+            self._run_batch(batch)
+            if stop:
+                break
+
+    def _run_batch(self, batch):
+        results = []
+        started = time.perf_counter()
+        try:
+            if self._conn is None:
+                self._conn = self._connect()
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, future in batch:
+                conn.execute("SAVEPOINT write_intent")
+                try:
+                    result = fn(conn, *args)
+                    conn.execute("RELEASE write_intent")
+                    results.append((future, result, None))
+                except Exception as e:
+                    # Откатываем только это намерение, остальные в пачке сохраняются
+                    conn.execute("ROLLBACK TO write_intent")
+                    conn.execute("RELEASE write_intent")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logging.error(f"Ошибка групповой записи в БД ({len(batch)} операций): {e}")
+            try:
+                if self._conn is not None and self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+            except Exception:
+                self._conn = None
+            results = [(future, None, e) for _, _, future in batch]
+
+        elapsed = time.perf_counter() - started
+        failed = 0
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                failed += 1
+                future.set_exception(error)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._intents += len(batch)
+            self._failed += failed
+            self._last_batch = len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._commit_total += elapsed
+
+    def stats(self):
+        """Возвращает глубину очереди и статистику пачек."""
+        with self._stats_lock:
+            return {
+                'mode': 'sync' if self.synchronous else 'thread',
+                'queue_depth': self._queue.qsize(),
+                'batches': self._batches,
+                'writes': self._intents,
+                'failed_writes': self._failed,
+                'last_batch_size': self._last_batch,
+                'max_batch_size': self._max_batch_seen,
+                'avg_batch_size': round(self._intents / self._batches, 2) if self._batches else 0,
+                'avg_batch_ms': round(self._commit_total * 1000 / self._batches, 3) if self._batches else 0,
+            }
+
+    def close(self, timeout: float = 5):
+        """Дописывает очередь, останавливает поток и закрывает соединение."""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# exports.py - Streaming CSV/XLSX encoders for period reports
+import csv
+import io
+import logging
+import os
+from datetime import date, datetime
+
+from xlsx_stream import XLSX_CHUNK_SIZE, stream_xlsx
+
+EXPORT_CHUNK_SIZE = XLSX_CHUNK_SIZE
+
+PERIOD_COLUMNS = ['Дата', 'Регион', 'Сеть', 'Магазин', 'Адрес', 'Товар', 'Наличие',
+                  'Обычная цена', 'Акционная цена', 'Есть акция', 'Остаток']
+
+# Форматы столбцов XLSX (см. xlsx_stream.COLUMN_STYLES)
+PERIOD_FORMATS = [None, None, None, None, None, None, None, 'price', 'price', None, 'stock']
+
+STORE_COLUMNS = ['Товар', 'Наличие', 'Обычная цена', 'Акционная цена', 'Есть акция', 'Остаток']
+STORE_FORMATS = [None, None, 'price', 'price', None, 'stock']
+
+# Растет при изменении вида файлов, чтобы кэш отчетов не отдавал файлы прежнего вида
+EXPORT_FORMAT_VERSION = 2
+
+CSV_MIMETYPE = 'text/csv'
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _csv_row(row):
+    """Строка периода (см. iter_period_rows) в значения CSV в формате прежних отчетов."""
+    (check_date, region_name, network_name, number, address, product,
+     is_present, regular_price, promo_price, has_promo, stock) = row
+    return [
+        check_date.strftime('%d.%m.%Y'), region_name, network_name, f"№{number}", address, product,
+        'Да' if is_present else 'Нет',
+        '' if regular_price is None else regular_price,
+        '' if promo_price is None else promo_price,
+        'Да' if has_promo else 'Нет',
+        '' if stock is None else stock,
+    ]
+
+
+def _xlsx_row(row):
+    values = _csv_row(row)
+    # В Excel цены и остаток остаются числами
+    values[7], values[8], values[10] = row[7], row[8], row[10]
+    return values
+
+
+def csv_writer(stream):
+    """csv.writer с настройками отчетов: все поля в кавычках, строки через \\n."""
+    return csv.writer(stream, quoting=csv.QUOTE_ALL, lineterminator='\n')
+
+
+def csv_header(start_date: date, end_date: date, title: str = 'Отчет', created: datetime = None) -> str:
+    """Шапка CSV отчета за период: название, время создания и заголовки столбцов."""
+    created = created or datetime.now()
+    return (f"{title} за период с {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}\n"
+            f"Создан: {created.strftime('%d.%m.%Y %H:%M:%S')}\n"
+            + "=" * 80 + "\n\n"
+            + ','.join(PERIOD_COLUMNS) + "\n")
+
+
+def csv_footer(start_date: date, end_date: date, total_checks: int) -> str:
+    """Итоги CSV отчета за период."""
+    return ("\n" + "=" * 80 + "\n"
+            f"Всего проверок: {total_checks}\n"
+            f"Период: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}\n")
+
+
+def period_csv_chunks(rows, start_date: date, end_date: date, title: str = 'Отчет',
+                      chunk_size: int = EXPORT_CHUNK_SIZE, created: datetime = None):
+    """Генератор байтов CSV отчета за период: шапка, строки проверок, итоги.
+
+    Строки берутся из итератора по одной и отдаются кусками по ``chunk_size``
+    байт, поэтому память не зависит от длины периода.
+    """
+    buffer = io.StringIO()
+    writer = csv_writer(buffer)
+    buffer.write(csv_header(start_date, end_date, title, created))
+
+    total_checks = 0
+    for row in rows:
+        writer.writerow(_csv_row(row))
+        total_checks += 1
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    buffer.write(csv_footer(start_date, end_date, total_checks))
+    yield buffer.getvalue().encode('utf-8')
+
+
+def write_csv_rows(stream, rows) -> int:
+    """Пишет строки периода в текстовый поток без шапки и итогов, возвращает их число."""
+    writer = csv_writer(stream)
+    total_checks = 0
+    for row in rows:
+        writer.writerow(_csv_row(row))
+        total_checks += 1
+    return total_checks
+
+
+def period_networks(backend, start_date: date, end_date: date):
+    """Сети с проверками за период: [(ID сети, название)] в порядке справочника."""
+    checked = set().union(*backend.get_checked_stores_for_range(start_date, end_date).values())
+    return [(network['id'], network['name'])
+            for region in backend.get_catalog()['regions']
+            for network in region['networks']
+            if any(store[0] in checked for store in network['stores'])]
+
+
+def network_xlsx_rows(backend, start_date: date, end_date: date, network_id: int):
+    """Строки листа сети для XLSX (цены и остаток числами)."""
+    return (_xlsx_row(row) for row in backend.iter_period_rows(start_date, end_date, network_id))
+
+
+def period_network_xlsx_chunks(backend, start_date: date, end_date: date, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Генератор байтов XLSX отчета за период: по листу на каждую сеть с проверками.
+
+    Строки сети читаются отдельным запросом, когда до ее листа доходит
+    очередь, поэтому в памяти нет ни всего периода, ни одной сети целиком.
+    """
+    sheets = [(name, PERIOD_COLUMNS, network_xlsx_rows(backend, start_date, end_date, network_id), PERIOD_FORMATS)
+              for network_id, name in period_networks(backend, start_date, end_date)]
+    return stream_xlsx(sheets or [('Отчет', PERIOD_COLUMNS, (), PERIOD_FORMATS)], chunk_size)
+
+
+def period_chunks(export_format: str, backend, start_date: date, end_date: date, title: str = 'Отчет'):
+    """Возвращает (генератор байтов, MIME тип, расширение) для формата csv или xlsx.
+
+    CSV - одна таблица за весь период, XLSX - по листу на сеть. Большие
+    периоды собираются на пуле процессов (см. parallel_reports) с тем же
+    результатом, что и последовательная сборка.
+    """
+    from parallel_reports import parallel_period_chunks, use_parallel
+
+    if export_format not in ('csv', 'xlsx'):
+        raise ValueError(f"Неизвестный формат отчета: {export_format}")
+    mimetype = CSV_MIMETYPE if export_format == 'csv' else XLSX_MIMETYPE
+    if use_parallel(backend, start_date, end_date):
+        return parallel_period_chunks(export_format, backend, start_date, end_date, title), mimetype, export_format
+    if export_format == 'csv':
+        rows = backend.iter_period_rows(start_date, end_date)
+        return period_csv_chunks(rows, start_date, end_date, title), mimetype, 'csv'
+    return period_network_xlsx_chunks(backend, start_date, end_date), mimetype, 'xlsx'
+
+
+def store_xlsx_chunks(rows, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Генератор байтов XLSX отчета магазина за день.
+
+    Строки: (товар, наличие, обычная цена, акционная цена, есть акция, остаток);
+    цены и остаток остаются числами со своим форматом.
+    """
+    values = ([product, 'Да' if is_present else 'Нет', regular_price, promo_price,
+               'Да' if has_promo else 'Нет', stock]
+              for product, is_present, regular_price, promo_price, has_promo, stock in rows)
+    return stream_xlsx([('Отчет', STORE_COLUMNS, values, STORE_FORMATS)], chunk_size)
+
+
+def write_chunks(path: str, chunks) -> str:
+    """Записывает поток байтов в файл (для отчетов, которые нужны файлом, например в Telegram)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    logging.info(f"Отчет записан: {path}")
+    return path
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+# jobs.py - Persistent background job queue with bounded workers and retry with backoff
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import closing
+
+# Во временной папке: на Vercel запись разрешена только туда
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', os.path.join(tempfile.gettempdir(), 'app_state.db'))
+# threads - рабочие потоки в фоне; inline - задача выполняется сразу в потоке запроса
+# (бессерверные функции замораживаются после ответа, и фоновые потоки там не работают)
+JOB_MODE = os.getenv('JOB_MODE', 'inline' if os.getenv('VERCEL') else 'threads').strip().lower()
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_RETRY_BASE_S = float(os.getenv('JOB_RETRY_BASE_S', '5'))
+JOB_RETRY_MAX_S = float(os.getenv('JOB_RETRY_MAX_S', '300'))
+# Задача в статусе running дольше аренды считается брошенной (процесс упал) и берется снова
+JOB_LEASE_S = float(os.getenv('JOB_LEASE_S', '600'))
+JOB_RETENTION_HOURS = float(os.getenv('JOB_RETENTION_HOURS', '72'))
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_RETRYING = 'retrying'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+class RetryableJobError(Exception):
+    """Временная ошибка: задачу нужно повторить позже (``retry_after`` секунд, если известно)."""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """Очередь фоновых задач в SQLite с ограниченным числом рабочих потоков.
+
+    Задача - это имя обработчика и JSON параметры. Обработчик ``fn(params)``
+    возвращает JSON-совместимый результат; изменения ``params`` сохраняются
+    между попытками. Если обработчик бросает ``RetryableJobError``, задача
+    повторяется с экспоненциальной задержкой до ``max_attempts`` попыток;
+    любая другая ошибка сразу завершает задачу статусом failed. Рабочие
+    потоки запускаются вместе с базой очереди: при первом обращении к ней
+    или вызовом ``start()`` из точки входа сервера, так что задачи, оставшиеся
+    после перезапуска, подхватываются без новой постановки. Импорт модуля
+    ничего не открывает и не запускает. Пока обработчик работает, аренда его
+    задач продлевается.
+
+    В режиме ``inline`` потоков нет: ``enqueue`` и ``get`` сразу выполняют
+    готовые задачи (и подошедшие повторы) в вызывающем потоке - для
+    бессерверного развертывания.
+
+    Обработчик с ``batch_size > 1`` получает список params сразу нескольких
+    готовых задач одного типа и возвращает список результатов той же длины;
+    элемент-исключение завершает (или откладывает) только свою задачу.
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH, workers: int = JOB_WORKERS, mode: str = JOB_MODE):
+        self.path = path
+        self.workers = max(1, workers)
+        self.inline = mode == 'inline'
+        self._handlers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._initialized = False
+        self._stopping = False
+
+    def register(self, kind: str, fn, max_attempts: int = 1, batch_size: int = 1):
+        """Регистрирует обработчик задач типа ``kind``."""
+        self._handlers[kind] = (fn, max(1, max_attempts), max(1, batch_size))
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def _init_db(self):
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            with closing(self._connect()) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id TEXT PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        params TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        max_attempts INTEGER NOT NULL DEFAULT 1,
+                        result TEXT,
+                        error TEXT,
+                        run_after REAL NOT NULL,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after)")
+                conn.execute(
+                    "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                    (STATUS_DONE, STATUS_FAILED, time.time() - JOB_RETENTION_HOURS * 3600)
+                )
+            self._initialized = True
+        # Задачи, оставшиеся в очереди после перезапуска, не ждут новой постановки
+        if self._handlers:
+            self._ensure_workers()
+
+    def start(self):
+        """Открывает базу очереди и запускает рабочие потоки (вызывается после регистрации обработчиков)."""
+        self._init_db()
+        self._ensure_workers()
+
+    def _ensure_workers(self):
+        # Задачи берет только процесс сервера: дочерние процессы (пул отчетов)
+        # импортируют главный модуль заново, но очередь не обслуживают
+        if self.inline or multiprocessing.parent_process() is not None:
+            return
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker, name=f'job-worker-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, kind: str, params: dict) -> str:
+        """Сохраняет задачу и будит рабочий поток. Возвращает ID задачи."""
+        if kind not in self._handlers:
+            raise ValueError(f"Неизвестный тип задачи: {kind}")
+        self._init_db()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                INSERT INTO jobs (id, kind, params, status, max_attempts, run_after, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job_id, kind, json.dumps(params, ensure_ascii=False), STATUS_QUEUED,
+                  self._handlers[kind][1], now, now, now))
+        logging.info(f"Задача {kind} поставлена в очередь: {job_id}")
+        if self.inline:
+            self._drain()
+            return job_id
+        self._ensure_workers()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def _drain(self):
+        """Режим inline: выполняет все готовые задачи в текущем потоке."""
+        while True:
+            rows, _ = self._claim()
+            if not rows:
+                return
+            self._run(rows)
+
+    def get(self, job_id: str):
+        """Возвращает состояние задачи или None.
+
+        В режиме inline сначала выполняет подошедшие задачи: повтор после
+        временной ошибки иначе ждал бы следующей постановки.
+        """
+        self._init_db()
+        if self.inline:
+            self._drain()
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'max_attempts': row['max_attempts'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'next_attempt_at': row['run_after'] if row['status'] == STATUS_RETRYING else None,
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+    def stats(self):
+        """Число задач по статусам и число рабочих потоков."""
+        self._init_db()
+        with closing(self._connect()) as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {'workers': len([t for t in self._threads if t.is_alive()]), 'jobs': counts}
+
+    def _claim(self):
+        """Атомарно берет следующие готовые задачи. Возвращает (строки, секунды до следующей)."""
+        now = time.time()
+        ready = (STATUS_QUEUED, STATUS_RETRYING, now, STATUS_RUNNING, now - JOB_LEASE_S)
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("""
+                    SELECT * FROM jobs
+                    WHERE (status IN (?, ?) AND run_after <= ?)
+                       OR (status = ? AND updated_at < ?)
+                    ORDER BY run_after
+                    LIMIT 1
+                """, ready).fetchone()
+                if row is not None:
+                    rows = [row]
+                    batch_size = self._handlers.get(row['kind'], (None, 1, 1))[2]
+                    if batch_size > 1:
+                        rows += conn.execute("""
+                            SELECT * FROM jobs
+                            WHERE ((status IN (?, ?) AND run_after <= ?) OR (status = ? AND updated_at < ?))
+                              AND kind = ? AND id != ?
+                            ORDER BY run_after
+                            LIMIT ?
+                        """, (*ready, row['kind'], row['id'], batch_size - 1)).fetchall()
+                    conn.executemany(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        [(STATUS_RUNNING, now, claimed['id']) for claimed in rows]
+                    )
+                    conn.execute("COMMIT")
+                    return rows, 0
+
+                upcoming = conn.execute(
+                    "SELECT MIN(run_after) FROM jobs WHERE status IN (?, ?)", (STATUS_QUEUED, STATUS_RETRYING)
+                ).fetchone()[0]
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return None, (upcoming - now if upcoming is not None else None)
+
+    def _finish(self, row, status: str, result=None, error: str = None, run_after: float = None,
+                params: dict = None) -> bool:
+        """Сохраняет итог попытки, если задача все еще за этой попыткой.
+
+        Попытка, чью аренду перехватил другой поток, ничего не записывает.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            updated = conn.execute("""
+                UPDATE jobs SET status = ?, result = ?, error = ?, run_after = COALESCE(?, run_after),
+                                params = COALESCE(?, params), updated_at = ?
+                WHERE id = ? AND status = ? AND attempts = ?
+            """, (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                  error, run_after, json.dumps(params, ensure_ascii=False) if params is not None else None,
+                  now, row['id'], STATUS_RUNNING, row['attempts'] + 1)).rowcount
+        if not updated:
+            logging.warning(f"Задача {row['kind']} {row['id']}: попытка {row['attempts'] + 1} уже не актуальна, "
+                            f"итог не сохранен")
+        return bool(updated)
+
+    def _heartbeat(self, rows, done: threading.Event):
+        """Продлевает аренду задач, пока их обработчик работает."""
+        claims = [(row['id'], STATUS_RUNNING, row['attempts'] + 1) for row in rows]
+        while not done.wait(JOB_LEASE_S / 3):
+            try:
+                now = time.time()
+                with closing(self._connect()) as conn:
+                    conn.executemany(
+                        "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ? AND attempts = ?",
+                        [(now, *claim) for claim in claims]
+                    )
+            except Exception as e:
+                logging.error(f"Ошибка продления аренды задач: {e}")
+
+    def _settle(self, row, params: dict, outcome):
+        """Сохраняет итог одной задачи: результат или исключение."""
+        attempts = row['attempts'] + 1
+        if not isinstance(outcome, Exception):
+            if self._finish(row, STATUS_DONE, result=outcome):
+                logging.info(f"Задача {row['kind']} {row['id']} выполнена (попытка {attempts})")
+        elif isinstance(outcome, RetryableJobError) and attempts < row['max_attempts']:
+            delay = outcome.retry_after if outcome.retry_after is not None else min(
+                JOB_RETRY_BASE_S * 2 ** (attempts - 1), JOB_RETRY_MAX_S)
+            # Обработчик мог сохранить в params промежуточный результат (например, готовый файл)
+            self._finish(row, STATUS_RETRYING, error=str(outcome), run_after=time.time() + delay, params=params)
+            logging.warning(f"Задача {row['kind']} {row['id']}: повтор через {delay:.0f} с ({outcome})")
+        elif isinstance(outcome, RetryableJobError):
+            self._finish(row, STATUS_FAILED, error=str(outcome))
+            logging.error(f"Задача {row['kind']} {row['id']} не выполнена за {attempts} попыток: {outcome}")
+        else:
+            self._finish(row, STATUS_FAILED, error=str(outcome))
+            logging.error(f"Ошибка задачи {row['kind']} {row['id']}: {outcome}")
+
+    def _run(self, rows):
+        kind = rows[0]['kind']
+        fn, _, batch_size = self._handlers.get(kind, (None, 1, 1))
+        if fn is None:
+            for row in rows:
+                self._finish(row, STATUS_FAILED, error=f"Нет обработчика для задачи {kind}")
+            return
+
+        params = [json.loads(row['params']) for row in rows]
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(rows, done), name='job-heartbeat', daemon=True)
+        heartbeat.start()
+        try:
+            if batch_size > 1:
+                outcomes = fn(params)
+                if len(outcomes) != len(rows):
+                    raise RuntimeError(f"Обработчик {kind} вернул {len(outcomes)} результатов для {len(rows)} задач")
+            else:
+                outcomes = [fn(params[0])]
+        except Exception as e:
+            outcomes = [e] * len(rows)
+        finally:
+            done.set()
+            heartbeat.join()
+
+        for row, row_params, outcome in zip(rows, params, outcomes):
+            self._settle(row, row_params, outcome)
+
+    def _worker(self):
+        while not self._stopping:
+            try:
+                rows, wait = self._claim()
+            except Exception as e:
+                logging.error(f"Ошибка очереди задач: {e}")
+                rows, wait = None, 1
+            if rows:
+                self._run(rows)
+                continue
+            with self._wakeup:
+                self._wakeup.wait(timeout=min(max(wait, 0.05), 60) if wait is not None else 60)
+
+    def close(self, timeout: float = 5):
+        """Останавливает рабочие потоки (незавершенные задачи останутся в таблице)."""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stopping = False
+
+
+job_queue = JobQueue()
+
+
+def register(kind: str, fn, max_attempts: int = 1, batch_size: int = 1):
+    """Регистрирует обработчик задач в общей очереди."""
+    job_queue.register(kind, fn, max_attempts, batch_size)
+
+
+def enqueue(kind: str, params: dict) -> str:
+    """Ставит задачу в общую очередь и возвращает ее ID."""
+    return job_queue.enqueue(kind, params)
+
+
+def start():
+    """Запускает рабочие потоки общей очереди (задачи, оставшиеся после перезапуска, берутся сразу)."""
+    job_queue.start()
+
+
+def get_job(job_id: str):
+    """Возвращает состояние задачи из общей очереди или None."""
+    return job_queue.get(job_id)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Служебные команды для локальной базы данных
+"""
+
+import argparse
+import logging
+import sys
+from datetime import datetime
+
+
+def cmd_migrate(args):
+    """Применяет недостающие миграции схемы."""
+    from database import get_connection
+    from migrations import run_migrations
+
+    with get_connection() as conn:
+        version = run_migrations(conn)
+    print(f"✅ Версия схемы: {version}")
+    return 0
+
+
+def cmd_check_plans(args):
+    """Проверяет, что горячие запросы используют индексы, а не полный SCAN."""
+    from database import check_hot_query_plans
+
+    regressions = check_hot_query_plans()
+    if not regressions:
+        print("✅ Все горячие запросы используют индексы")
+        return 0
+
+    for regression in regressions:
+        print(f"❌ {regression['query']}:")
+        for step in regression['plan']:
+            print(f"    {step}")
+    return 1
+
+
+def cmd_rebuild_summary(args):
+    """Пересчитывает дневную сводку проверок (для заполнения прошлых дней)."""
+    from database import rebuild_daily_store_summary
+
+    rows = rebuild_daily_store_summary(args.start, args.end)
+    print(f"✅ Дневная сводка пересчитана: {rows} строк")
+    return 0
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Служебные команды базы данных')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('migrate', help='применить миграции схемы').set_defaults(func=cmd_migrate)
+    subparsers.add_parser('check-plans', help='проверить планы горячих запросов').set_defaults(func=cmd_check_plans)
+
+    rebuild = subparsers.add_parser('rebuild-summary', help='пересчитать дневную сводку проверок')
+    rebuild.add_argument('--start', type=_parse_date, help='первый день (YYYY-MM-DD), по умолчанию - все дни')
+    rebuild.add_argument('--end', type=_parse_date, help='последний день (YYYY-MM-DD)')
+    rebuild.set_defaults(func=cmd_rebuild_summary)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+# migrations.py - Versioned SQLite schema migrations
+import logging
+import re
+from datetime import datetime
+
+
+def _migration_0001_initial_schema(conn):
+    # Таблица регионов
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS regions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+
+    # Таблица сетей
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS networks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            region_id INTEGER,
+            FOREIGN KEY (region_id) REFERENCES regions (id)
+        )
+    """)
+
+    # Таблица магазинов
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            number TEXT NOT NULL,
+            address TEXT,
+            network_id INTEGER,
+            FOREIGN KEY (network_id) REFERENCES networks (id)
+        )
+    """)
+
+    # Таблица номенклатуры
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS nomenclature (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            store_id INTEGER,
+            product_name TEXT NOT NULL,
+            FOREIGN KEY (store_id) REFERENCES stores (id)
+        )
+    """)
+
+    # Таблица результатов мониторинга
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS monitoring_checks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            store_id INTEGER,
+            product_name TEXT NOT NULL,
+            check_date DATE NOT NULL,
+            is_present INTEGER DEFAULT 0,
+            FOREIGN KEY (store_id) REFERENCES stores (id)
+        )
+    """)
+
+    # Таблица проверок цен
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_checks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            store_id INTEGER,
+            product_name TEXT NOT NULL,
+            check_date DATE NOT NULL,
+            regular_price REAL,
+            promo_price REAL,
+            has_promo INTEGER DEFAULT 0,
+            stock_quantity INTEGER,
+            FOREIGN KEY (store_id) REFERENCES stores (id),
+            UNIQUE(store_id, product_name, check_date)
+        )
+    """)
+
+
+def _migration_0002_hot_path_indexes(conn):
+    # Проверенные магазины за дату и сводка за сегодня
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_monitoring_checks_date_store
+        ON monitoring_checks (check_date, store_id)
+    """)
+    # Отмеченные товары магазина за дату
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_monitoring_checks_store_date_present
+        ON monitoring_checks (store_id, check_date, is_present)
+    """)
+    # Номенклатура магазина
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_nomenclature_store_product
+        ON nomenclature (store_id, product_name)
+    """)
+    # Навигация регион -> сеть -> магазин
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_networks_region_name
+        ON networks (region_id, name)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stores_network_number
+        ON stores (network_id, number)
+    """)
+
+
+def _migration_0003_unique_check_key(conn):
+    # Оставляем только последнюю запись для каждого товара магазина за дату
+    conn.execute("""
+        DELETE FROM monitoring_checks
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM monitoring_checks
+            GROUP BY store_id, product_name, check_date
+        )
+    """)
+    # Ключ для UPSERT в record_check_results
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_monitoring_checks_store_product_date
+        ON monitoring_checks (store_id, product_name, check_date)
+    """)
+
+
+def _migration_0004_price_notes(conn):
+    # Комментарий к цене, который уже передает фронтенд
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(price_checks)")}
+    if 'price_notes' not in columns:
+        conn.execute("ALTER TABLE price_checks ADD COLUMN price_notes TEXT DEFAULT ''")
+
+
+# Дата -> номер дня от 1970-01-01 (совпадает с database.to_day)
+_SQL_DATE_TO_DAY = "CAST(julianday({}) - 2440587.5 AS INTEGER)"
+
+
+def _migration_0005_compact_schema(conn):
+    # Справочник товаров: название хранится один раз
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO products (name)
+        SELECT product_name FROM nomenclature
+        UNION SELECT product_name FROM monitoring_checks
+        UNION SELECT product_name FROM price_checks
+    """)
+
+    conn.execute("""
+        CREATE TABLE nomenclature_compact (
+            store_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            PRIMARY KEY (store_id, product_id),
+            FOREIGN KEY (store_id) REFERENCES stores (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO nomenclature_compact (store_id, product_id)
+        SELECT n.store_id, p.id
+        FROM nomenclature n
+        JOIN products p ON p.name = n.product_name
+        WHERE n.store_id IS NOT NULL
+    """)
+
+    conn.execute("""
+        CREATE TABLE monitoring_checks_compact (
+            store_id INTEGER NOT NULL,
+            check_day INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            is_present INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (store_id, check_day, product_id),
+            FOREIGN KEY (store_id) REFERENCES stores (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO monitoring_checks_compact (store_id, check_day, product_id, is_present)
+        SELECT mc.store_id, {_SQL_DATE_TO_DAY.format('mc.check_date')}, p.id, COALESCE(mc.is_present, 0)
+        FROM monitoring_checks mc
+        JOIN products p ON p.name = mc.product_name
+        WHERE mc.store_id IS NOT NULL
+        ORDER BY mc.id
+    """)
+
+    conn.execute("""
+        CREATE TABLE price_checks_compact (
+            store_id INTEGER NOT NULL,
+            check_day INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            regular_price REAL,
+            promo_price REAL,
+            has_promo INTEGER DEFAULT 0,
+            stock_quantity INTEGER,
+            price_notes TEXT DEFAULT '',
+            PRIMARY KEY (store_id, check_day, product_id),
+            FOREIGN KEY (store_id) REFERENCES stores (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO price_checks_compact
+            (store_id, check_day, product_id, regular_price, promo_price, has_promo, stock_quantity, price_notes)
+        SELECT pc.store_id, {_SQL_DATE_TO_DAY.format('pc.check_date')}, p.id, pc.regular_price, pc.promo_price,
+               pc.has_promo, pc.stock_quantity, pc.price_notes
+        FROM price_checks pc
+        JOIN products p ON p.name = pc.product_name
+        WHERE pc.store_id IS NOT NULL
+        ORDER BY pc.id
+    """)
+
+    for table in ('nomenclature', 'monitoring_checks', 'price_checks'):
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_compact RENAME TO {table}")
+
+    # Проверенные магазины за день (остальные запросы идут по первичному ключу)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_monitoring_checks_day_store
+        ON monitoring_checks (check_day, store_id)
+    """)
+
+
+def _migration_0006_latest_network_price(conn):
+    # Последняя известная цена товара в сети - поиск по первичному ключу
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS latest_network_price (
+            network_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            store_id INTEGER NOT NULL,
+            check_day INTEGER NOT NULL,
+            regular_price REAL,
+            promo_price REAL,
+            has_promo INTEGER DEFAULT 0,
+            PRIMARY KEY (network_id, product_id),
+            FOREIGN KEY (network_id) REFERENCES networks (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        ) WITHOUT ROWID
+    """)
+    # Пересчет последней цены, когда более новая проверка осталась без цены
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_price_checks_product_day
+        ON price_checks (product_id, check_day)
+    """)
+    conn.execute("""
+        INSERT OR REPLACE INTO latest_network_price
+            (network_id, product_id, store_id, check_day, regular_price, promo_price, has_promo)
+        SELECT network_id, product_id, store_id, check_day, regular_price, promo_price, has_promo
+        FROM (
+            SELECT s.network_id, pc.product_id, pc.store_id, pc.check_day,
+                   pc.regular_price, pc.promo_price, pc.has_promo,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY s.network_id, pc.product_id
+                       ORDER BY pc.check_day DESC, pc.store_id
+                   ) AS position
+            FROM price_checks pc
+            JOIN stores s ON s.id = pc.store_id
+            WHERE s.network_id IS NOT NULL
+              AND (pc.regular_price IS NOT NULL OR pc.promo_price IS NOT NULL)
+        )
+        WHERE position = 1
+    """)
+
+
+SQL_REBUILD_DAILY_STORE_SUMMARY = """
+    INSERT OR REPLACE INTO daily_store_summary (check_day, store_id, total, present, updated_at)
+    SELECT check_day, store_id, COUNT(*), SUM(is_present), CURRENT_TIMESTAMP
+    FROM monitoring_checks
+    WHERE check_day BETWEEN ? AND ?
+    GROUP BY check_day, store_id
+"""
+
+
+def _migration_0007_daily_store_summary(conn):
+    # Итоги проверок магазина за день, обновляются вместе с monitoring_checks
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_store_summary (
+            check_day INTEGER NOT NULL,
+            store_id INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            present INTEGER NOT NULL,
+            updated_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (check_day, store_id),
+            FOREIGN KEY (store_id) REFERENCES stores (id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(SQL_REBUILD_DAILY_STORE_SUMMARY, (-(2 ** 31), 2 ** 31))
+
+
+def _migration_0008_store_search_index(conn):
+    # Полнотекстовый индекс по номеру и адресу магазина (trigram складывает регистр кириллицы)
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS stores_fts USING fts5(
+                number, address,
+                content='stores', content_rowid='id',
+                tokenize='trigram'
+            )
+        """)
+    except Exception as e:
+        # SQLite без FTS5 или старше 3.34: поиск останется на LIKE
+        logging.warning(f"FTS5 trigram недоступен, поиск магазинов без индекса: {e}")
+        return
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS stores_fts_insert AFTER INSERT ON stores BEGIN
+            INSERT INTO stores_fts (rowid, number, address) VALUES (new.id, new.number, new.address);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS stores_fts_delete AFTER DELETE ON stores BEGIN
+            INSERT INTO stores_fts (stores_fts, rowid, number, address)
+            VALUES ('delete', old.id, old.number, old.address);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS stores_fts_update AFTER UPDATE OF number, address ON stores BEGIN
+            INSERT INTO stores_fts (stores_fts, rowid, number, address)
+            VALUES ('delete', old.id, old.number, old.address);
+            INSERT INTO stores_fts (rowid, number, address) VALUES (new.id, new.number, new.address);
+        END
+    """)
+    conn.execute("INSERT INTO stores_fts (stores_fts) VALUES ('rebuild')")
+
+
+def _migration_0009_catalog_version(conn):
+    # Версия справочника регион -> сеть -> магазин, растет при любой записи в него
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)")
+    for table in ('regions', 'networks', 'stores'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS catalog_version_{table}_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                END
+            """)
+
+
+def _migration_0010_date_versions(conn):
+    # Версия данных по каждому дню: растет при любой записи проверок или цен за этот день.
+    # Сумма версий дней периода меняется при любом изменении периода - ключ для кэша отчетов
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS date_versions (
+            check_day INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO date_versions (check_day, version)
+        SELECT check_day, 1 FROM monitoring_checks
+        UNION SELECT check_day, 1 FROM price_checks
+    """)
+    bump = """
+        INSERT INTO date_versions (check_day, version) VALUES ({day}, 1)
+        ON CONFLICT (check_day) DO UPDATE SET version = version + 1;
+    """
+    for table in ('monitoring_checks', 'price_checks'):
+        for event, days in (('INSERT', ('NEW',)), ('UPDATE', ('OLD', 'NEW')), ('DELETE', ('OLD',))):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS date_versions_{table}_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    {''.join(bump.format(day=f'{row}.check_day') for row in days)}
+                END
+            """)
+
+
+def _migration_0011_store_epoch(conn):
+    # Эпоха хранилища: случайный ID, один на файл БД. Входит в ключ кэша отчетов,
+    # чтобы отчеты другой базы (пересозданной или подмененной) не отдавались как свежие
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS store_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('epoch', lower(hex(randomblob(16))))")
+
+
+# Упорядоченный список миграций: (версия, описание, функция)
+MIGRATIONS = [
+    (1, 'Начальная схема', _migration_0001_initial_schema),
+    (2, 'Индексы для горячих запросов', _migration_0002_hot_path_indexes),
+    (3, 'Уникальный ключ проверки товара за дату', _migration_0003_unique_check_key),
+    (4, 'Комментарий к проверке цены', _migration_0004_price_notes),
+    (5, 'Компактная схема: справочник товаров и номера дней', _migration_0005_compact_schema),
+    (6, 'Последняя цена товара в сети', _migration_0006_latest_network_price),
+    (7, 'Дневная сводка проверок по магазинам', _migration_0007_daily_store_summary),
+    (8, 'Полнотекстовый поиск магазинов', _migration_0008_store_search_index),
+    (9, 'Версия справочника регионов, сетей и магазинов', _migration_0009_catalog_version),
+    (10, 'Версии данных по дням для кэша отчетов', _migration_0010_date_versions),
+    (11, 'Эпоха хранилища для кэша отчетов', _migration_0011_store_epoch),
+]
+
+
+def get_schema_version(conn) -> int:
+    """Возвращает текущую версию схемы (0 для пустой БД)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn, migrations=MIGRATIONS) -> int:
+    """Применяет недостающие миграции по порядку. Возвращает итоговую версию.
+
+    Каждая миграция выполняется в своей транзакции вместе с записью в
+    ``schema_version``, поэтому упавшая миграция не оставляет схему
+    в промежуточном состоянии.
+    """
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        current = get_schema_version(conn)
+        for version, description, migrate in sorted(migrations, key=lambda m: m[0]):
+            if version <= current:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                migrate(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, datetime.now().isoformat(timespec='seconds'))
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            current = version
+            logging.info(f"Применена миграция {version}: {description}")
+        return current
+    finally:
+        conn.isolation_level = isolation_level
+
+
+# Полный проход по таблице; обход FTS5 по условию MATCH (idxStr с ":M") полным не считается
+_FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(?!\S+ VIRTUAL TABLE INDEX \d+:M)')
+
+
+def explain_query_plan(conn, sql: str, params=()):
+    """Возвращает строки EXPLAIN QUERY PLAN для запроса."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def check_query_plans(conn, queries: dict):
+    """Проверяет, что ни один из горячих запросов не сводится к полному SCAN.
+
+    ``queries`` - словарь ``имя -> (sql, параметры)``. Возвращает список
+    регрессий: ``{'query': имя, 'plan': [...], 'scans': [...]}``.
+    """
+    regressions = []
+    for name, (sql, params) in queries.items():
+        plan = explain_query_plan(conn, sql, params)
+        scans = [step for step in plan if _FULL_SCAN.match(step)]
+        if scans:
+            regressions.append({'query': name, 'plan': plan, 'scans': scans})
+    return regressions
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# parallel_reports.py - Period reports rendered on a process pool and merged in a fixed order
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Процессов для сборки больших отчетов (1 - собирать в потоке запроса, как раньше)
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '1'))
+# Меньшие периоды (по числу проверенных магазино-дней) дешевле собрать последовательно
+REPORT_PARALLEL_MIN_STORE_DAYS = int(os.getenv('REPORT_PARALLEL_MIN_STORE_DAYS', '500'))
+# Отрезков периода на процесс: мелкие отрезки выравнивают нагрузку и раньше дают первые байты
+PARTS_PER_WORKER = 4
+READ_SIZE = 1024 * 1024
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Общий пул процессов (создается при первом отчете).
+
+    Процессы запускаются через spawn: в приложении работают потоки (очередь
+    записи, фоновые задачи), и fork мог бы унести в дочерний процесс чужие
+    захваченные блокировки.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+            logging.info(f"Пул процессов для отчетов: {workers}")
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def use_parallel(backend, start_date, end_date, workers: int = None) -> bool:
+    """Собирать ли отчет за период на пуле процессов.
+
+    Демо хранилище живет в памяти этого процесса, поэтому для него отчет
+    всегда собирается последовательно.
+    """
+    from backend import get_backend_name
+
+    workers = REPORT_WORKERS if workers is None else workers
+    if workers <= 1 or get_backend_name() == 'demo':
+        return False
+    coverage = backend.get_checked_stores_for_range(start_date, end_date)
+    return sum(len(stores) for stores in coverage.values()) >= REPORT_PARALLEL_MIN_STORE_DAYS
+
+
+def date_partitions(start_date, end_date, coverage: dict, parts: int):
+    """Делит период на ``parts`` смежных отрезков с примерно равным числом магазино-дней.
+
+    Отрезки покрывают весь период без пропусков, поэтому их строки, склеенные
+    по порядку, совпадают со строками всего периода (они упорядочены по дате).
+    """
+    from datetime import timedelta
+
+    total = sum(len(stores) for stores in coverage.values())
+    ranges = []
+    range_start, done = start_date, 0
+    for day, stores in coverage.items():
+        done += len(stores)
+        if len(ranges) < parts - 1 and done >= total * (len(ranges) + 1) / parts and day < end_date:
+            ranges.append((range_start, day))
+            range_start = day + timedelta(days=1)
+    ranges.append((range_start, end_date))
+    return ranges
+
+
+def _render_csv_part(start_date, end_date, directory):
+    """В процессе пула: строки CSV за отрезок периода во временный файл -> (путь, число строк)."""
+    from backend import get_backend
+    from exports import write_csv_rows
+
+    fd, path = tempfile.mkstemp(suffix='.csv', dir=directory)
+    with open(fd, 'w', encoding='utf-8', newline='') as f:
+        count = write_csv_rows(f, get_backend().iter_period_rows(start_date, end_date))
+    return path, count
+
+
+def _render_network_sheet(start_date, end_date, network_id, directory):
+    """В процессе пула: XML листа сети во временный файл -> путь."""
+    from backend import get_backend
+    from exports import PERIOD_COLUMNS, PERIOD_FORMATS, network_xlsx_rows
+    from xlsx_stream import sheet_xml_blocks
+
+    rows = network_xlsx_rows(get_backend(), start_date, end_date, network_id)
+    fd, path = tempfile.mkstemp(suffix='.xml', dir=directory)
+    with open(fd, 'wb') as f:
+        for block in sheet_xml_blocks(PERIOD_COLUMNS, rows, PERIOD_FORMATS):
+            f.write(block)
+    return path
+
+
+def _result(future):
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        # Упавший процесс ломает весь пул: следующий отчет создаст новый
+        _reset_pool()
+        raise
+
+
+def _read_file(path):
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(READ_SIZE)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.remove(path)
+
+
+def parallel_period_csv_chunks(backend, start_date, end_date, title: str = 'Отчет',
+                               workers: int = None, created=None):
+    """Генератор байтов CSV отчета за период, собранного на пуле процессов.
+
+    Период делится на смежные отрезки по датам, отрезки считаются
+    параллельно, а отдаются строго по порядку - байт в байт как
+    exports.period_csv_chunks. Пока клиент читает первые отрезки,
+    следующие уже собираются.
+    """
+    from exports import csv_footer, csv_header
+
+    workers = workers or REPORT_WORKERS
+    coverage = backend.get_checked_stores_for_range(start_date, end_date)
+    ranges = date_partitions(start_date, end_date, coverage, max(1, min(len(coverage), workers * PARTS_PER_WORKER)))
+    pool = get_pool(workers)
+    with tempfile.TemporaryDirectory(prefix='report_parts_') as directory:
+        futures = [pool.submit(_render_csv_part, part_start, part_end, directory) for part_start, part_end in ranges]
+        try:
+            yield csv_header(start_date, end_date, title, created).encode('utf-8')
+            total_checks = 0
+            for future in futures:
+                path, count = _result(future)
+                total_checks += count
+                yield from _read_file(path)
+            yield csv_footer(start_date, end_date, total_checks).encode('utf-8')
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def parallel_period_xlsx_chunks(backend, start_date, end_date, workers: int = None):
+    """Генератор байтов XLSX отчета за период: листы сетей рисуются на пуле процессов.
+
+    Листы идут в порядке справочника, как в exports.period_network_xlsx_chunks.
+    """
+    from exports import period_network_xlsx_chunks, period_networks
+    from xlsx_stream import stream_xlsx_parts
+
+    workers = workers or REPORT_WORKERS
+    networks = period_networks(backend, start_date, end_date)
+    if not networks:
+        yield from period_network_xlsx_chunks(backend, start_date, end_date)
+        return
+
+    def sheet_blocks(future):
+        yield from _read_file(_result(future))
+
+    pool = get_pool(workers)
+    with tempfile.TemporaryDirectory(prefix='report_parts_') as directory:
+        futures = [pool.submit(_render_network_sheet, start_date, end_date, network_id, directory)
+                   for network_id, name in networks]
+        try:
+            yield from stream_xlsx_parts([(name, sheet_blocks(future))
+                                          for (network_id, name), future in zip(networks, futures)])
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def parallel_period_chunks(export_format: str, backend, start_date, end_date, title: str = 'Отчет',
+                           workers: int = None, created=None):
+    """Генератор байтов отчета за период в формате csv или xlsx на пуле процессов."""
+    if export_format == 'csv':
+        return parallel_period_csv_chunks(backend, start_date, end_date, title, workers, created)
+    return parallel_period_xlsx_chunks(backend, start_date, end_date, workers)
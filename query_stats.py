@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# query_stats.py - SQL query instrumentation and slow-query log
+import itertools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+
+# Верхние границы корзин гистограммы, мс
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+slow_query_logger = logging.getLogger('slow_query')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+# Управление транзакциями и PRAGMA (писатель, пул соединений) в статистику не попадают
+_CONTROL_STATEMENT = re.compile(r'\s*(?:BEGIN|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE|PRAGMA)\b', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql: str) -> str:
+    """Нормализует запрос: литералы -> ?, списки IN (?, ?, ...) -> (...), пробелы схлопываются."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryStats:
+    """Накопленная в процессе статистика запросов по отпечаткам."""
+
+    def __init__(self, slow_query_ms: float = DB_SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._queries = {}
+
+    def record(self, sql: str, elapsed_ms: float, rows: int, plan_source=None):
+        key = fingerprint(sql)
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is None:
+                entry = self._queries[key] = {
+                    'fingerprint': key,
+                    'calls': 0,
+                    'rows': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'slow_calls': 0,
+                    'histogram': [0] * (len(HISTOGRAM_BUCKETS_MS) + 1),
+                }
+            entry['calls'] += 1
+            entry['rows'] += rows
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            bucket = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS) if elapsed_ms <= bound),
+                          len(HISTOGRAM_BUCKETS_MS))
+            entry['histogram'][bucket] += 1
+            is_slow = elapsed_ms >= self.slow_query_ms
+            if is_slow:
+                entry['slow_calls'] += 1
+
+        if is_slow:
+            slow_query_logger.warning(json.dumps({
+                'event': 'slow_query',
+                'fingerprint': key,
+                'elapsed_ms': round(elapsed_ms, 3),
+                'rows': rows,
+                'plan': plan_source() if plan_source else None,
+            }, ensure_ascii=False))
+
+    def snapshot(self):
+        """Возвращает статистику, отсортированную по суммарному времени."""
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}ms"]
+        with self._lock:
+            entries = [dict(entry) for entry in self._queries.values()]
+        result = []
+        for entry in sorted(entries, key=lambda e: e['total_ms'], reverse=True):
+            entry['avg_ms'] = round(entry['total_ms'] / entry['calls'], 3)
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+            entry['histogram'] = dict(zip(labels, entry['histogram']))
+            result.append(entry)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+
+
+stats = QueryStats()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Курсор, который замеряет время выполнения и выборки и число строк.
+
+    Запрос записывается в статистику, когда результат выбран полностью
+    (или курсор переиспользован/закрыт). Выборка остается ленивой, поэтому
+    ``fetchmany`` по-прежнему подходит для потоковой обработки. Курсор,
+    брошенный без закрытия, записывается сборщиком мусора без EXPLAIN:
+    соединение к этому времени может быть уже в другом потоке.
+    """
+
+    _pending = None
+
+    def _start(self, sql, parameters, elapsed):
+        self._finish()
+        if _CONTROL_STATEMENT.match(sql):
+            return
+        self._pending = [sql, parameters, elapsed, 0]
+        # DML/DDL ничего не возвращают - записываем сразу
+        if self.description is None:
+            self._finish(max(self.rowcount, 0))
+
+    def _finish(self, rows=None, explain: bool = True):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, parameters, elapsed, fetched = pending
+
+        def plan():
+            try:
+                plan_cursor = sqlite3.Cursor(self.connection)
+                return [row[3] for row in plan_cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)]
+            except Exception as e:
+                return [f"EXPLAIN недоступен: {e}"]
+
+        stats.record(sql, elapsed * 1000, fetched if rows is None else rows, plan if explain else None)
+
+    def _timed(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self._pending is not None:
+                self._pending[2] += time.perf_counter() - started
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._start(sql, parameters, time.perf_counter() - started)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        # Первый набор параметров сохраняется для EXPLAIN медленного запроса
+        parameters = iter(seq_of_parameters)
+        first = next(parameters, None)
+        if first is not None:
+            parameters = itertools.chain((first,), parameters)
+        started = time.perf_counter()
+        super().executemany(sql, parameters)
+        self._start(sql, () if first is None else first, time.perf_counter() - started)
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if self._pending is not None and row is not None:
+            self._pending[3] += 1
+        self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+            if len(rows) < size:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._pending is not None:
+            self._pending[3] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish(explain=False)
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Соединение, все запросы которого идут через InstrumentedCursor."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def get_query_stats():
+    """Возвращает агрегированную статистику запросов."""
+    return {
+        'slow_query_ms': stats.slow_query_ms,
+        'histogram_buckets_ms': list(HISTOGRAM_BUCKETS_MS),
+        'queries': stats.snapshot(),
+    }
+
+
+def reset_query_stats():
+    """Сбрасывает накопленную статистику."""
+    stats.reset()
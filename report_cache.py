@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# report_cache.py - On-disk LRU cache of generated reports keyed by parameters and data version
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def default_cache_dir() -> str:
+    """Папка кэша по умолчанию: reports/cache, а для демо хранилища или
+    рабочей папки без права записи (Vercel) - во временной папке."""
+    from backend import get_backend_name
+
+    local = os.path.join('reports', 'cache')
+    writable = os.access('reports' if os.path.isdir('reports') else os.getcwd(), os.W_OK)
+    if get_backend_name() == 'demo' or not writable:
+        return os.path.join(tempfile.gettempdir(), 'report_cache')
+    return local
+
+
+REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR') or default_cache_dir()
+REPORT_CACHE_MAX_MB = float(os.getenv('REPORT_CACHE_MAX_MB', '200'))
+
+
+class ReportCache:
+    """Кэш готовых отчетов на диске с вытеснением LRU по суммарному размеру.
+
+    Ключ - тип отчета, его параметры и версия данных (например, версия дат
+    периода и справочника): запись за любую дату периода меняет версию,
+    и следующий запрос строит отчет заново. Файл называется по типу и
+    хэшу ключа, поэтому кэш переживает перезапуск. Устаревшие версии
+    больше никто не запрашивает, и они вытесняются первыми.
+    """
+
+    def __init__(self, directory: str = REPORT_CACHE_DIR, max_bytes: int = int(REPORT_CACHE_MAX_MB * 2 ** 20)):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._building = {}
+        self._entries = None  # хэш ключа -> (путь, размер), от давних к недавним
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(kind: str, params: dict, version) -> str:
+        payload = json.dumps([kind, params, version], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def _load(self):
+        """Читает уже лежащие в папке отчеты (порядок LRU - по времени доступа)."""
+        if self._entries is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for name in os.listdir(self.directory):
+            stem, _, extension = name.rpartition('.')
+            key = stem.rpartition('_')[2]
+            path = os.path.join(self.directory, name)
+            if name.startswith('.') or len(key) != 32 or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_mtime, key, path, stat.st_size))
+        self._entries = OrderedDict((key, (path, size)) for mtime, key, path, size in sorted(found))
+        self._bytes = sum(size for path, size in self._entries.values())
+
+    def lookup(self, key: str):
+        """Путь к готовому отчету или None. Попадание поднимает отчет в начало LRU."""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry is not None and not os.path.exists(entry[0]):
+                self._bytes -= self._entries.pop(key)[1]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            # Время доступа сохраняет порядок LRU между перезапусками
+            os.utime(entry[0])
+        except OSError:
+            pass
+        return entry[0]
+
+    def _path(self, name: str, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{name}_{key}.{extension}")
+
+    def _commit(self, key: str, tmp_path: str, path: str):
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._load()
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (path, size)
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        # Самый свежий отчет не вытесняется, даже если он один больше лимита
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, (path, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            logging.info(f"Отчет вытеснен из кэша: {path}")
+
+    def get_or_create(self, kind: str, params: dict, version, build, extension: str, name: str = None) -> str:
+        """Возвращает путь к отчету из кэша или строит его вызовом ``build(путь)``.
+
+        Одинаковые отчеты, запрошенные одновременно, строятся один раз.
+        ``name`` - читаемое начало имени файла (по умолчанию тип отчета).
+        """
+        key = self.make_key(kind, params, version)
+        path = self.lookup(key)
+        if path is not None:
+            return path
+
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        with building:
+            # Пока ждали, отчет мог построить другой поток
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and os.path.exists(entry[0]):
+                return entry[0]
+
+            path = self._path(name or kind, key, extension)
+            tmp_path = os.path.join(self.directory, f".{key}.{threading.get_ident()}.tmp")
+            try:
+                build(tmp_path)
+                self._commit(key, tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                with self._lock:
+                    self._building.pop(key, None)
+        return path
+
+    def tee(self, kind: str, params: dict, version, chunks, extension: str, name: str = None):
+        """Пропускает поток байтов дальше и сохраняет его в кэш, если поток дочитан до конца."""
+        key = self.make_key(kind, params, version)
+        with self._lock:
+            self._load()
+        tmp_path = os.path.join(self.directory, f".{key}.{threading.get_ident()}.{time.monotonic_ns()}.tmp")
+        completed = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            completed = True
+            self._commit(key, tmp_path, self._path(name or kind, key, extension))
+        finally:
+            # Клиент оборвал скачивание - неполный отчет в кэш не попадает
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+report_cache = ReportCache()
+
+
+def period_version(backend, start_date, end_date):
+    """Версия отчета за период: вид файлов, эпоха хранилища, версия дат периода и версия справочника.
+
+    Версии дней и справочника - счетчики внутри одного хранилища; эпоха
+    отличает хранилища друг от друга (демо данные после перезапуска,
+    пересозданная база), чтобы кэш на диске не отдал отчет по чужим данным.
+    """
+    from exports import EXPORT_FORMAT_VERSION
+    return [EXPORT_FORMAT_VERSION, backend.get_store_epoch(), backend.get_data_version(start_date, end_date),
+            backend.get_catalog_version()]
+
+
+def get_report_cache_stats():
+    """Счетчики кэша отчетов для /health."""
+    return report_cache.stats()
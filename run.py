@@ -4,14 +4,20 @@
 Запуск веб-приложения
 """
 
-from app import app
 import os
 
 if __name__ == '__main__':
+    # Приложение импортируется только при запуске: процессы пула отчетов
+    # (spawn) заново импортируют этот модуль, и им сервер не нужен
+    from app import app, start_jobs
+    
     # Для разработки
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     port = int(os.getenv('PORT', 5000))
     
+    # Задачи, не завершенные до перезапуска, берутся в работу сразу, без новой постановки
+    start_jobs()
+    
     print("🌐 Запуск веб-приложения...")
     print(f"📱 Адрес: http://localhost:{port}")
     print(f"🔧 Debug режим: {debug_mode}")
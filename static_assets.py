@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# static_assets.py - In-memory precompressed cache for index.html, manifest.json, sw.js and icons
+import gzip
+import hashlib
+import logging
+import os
+import re
+import threading
+
+from flask import current_app, request
+from werkzeug.http import http_date
+
+from compression import brotli
+
+# Файлы приложения: имя -> MIME тип (charset для текстовых типов добавляет Werkzeug)
+TEXT_ASSETS = {
+    'index.html': 'text/html',
+    'manifest.json': 'application/manifest+json',
+    'sw.js': 'application/javascript',
+}
+ICON_ASSETS = ('icon-192.png', 'icon-192-maskable.png', 'icon-512.png', 'icon-512-maskable.png')
+
+# HTML, манифест и Service Worker всегда перепроверяются по ETag;
+# иконки по адресу с отпечатком содержимого не меняются никогда
+CACHE_REVALIDATE = 'no-cache'
+CACHE_ICON = 'public, max-age=86400'
+CACHE_IMMUTABLE = 'public, max-age=31536000, immutable'
+
+_ICON_URL = re.compile(r'/(icon-[\w-]+)\.png')
+_CACHE_NAME = re.compile(r"const CACHE_NAME = '[^']*';")
+
+
+def _content_hash(*parts: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part)
+    return digest.hexdigest()[:12]
+
+
+class Asset:
+    """Содержимое файла и его сжатые варианты."""
+
+    def __init__(self, body: bytes, mimetype: str, mtime: float, cache_control: str):
+        self.mimetype = mimetype
+        self.last_modified = http_date(mtime)
+        self.cache_control = cache_control
+        self.fingerprint = _content_hash(body)
+        self.variants = {None: body}
+        if mimetype.startswith(('text/', 'application/')):
+            gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gzipped) < len(body):
+                self.variants['gzip'] = gzipped
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants['br'] = compressed
+
+
+class StaticAssets:
+    """Статика приложения, загруженная в память один раз (при первом запросе).
+
+    Ссылки на иконки в ``index.html`` и ``manifest.json`` переписываются на
+    адреса с отпечатком содержимого (``/icon-192.<hash>.png``), а ``CACHE_NAME``
+    в ``sw.js`` выводится из общего хэша всех файлов - клиенты перекэшируют
+    приложение только при реальном изменении файлов. В режиме отладки файлы
+    перечитываются при изменении mtime.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self.assets = {}
+        self.icon_fingerprints = {}
+        self.version = None
+
+    def _stat_mtimes(self):
+        mtimes = {}
+        for name in (*TEXT_ASSETS, *ICON_ASSETS):
+            try:
+                mtimes[name] = os.stat(os.path.join(self.root, name)).st_mtime
+            except OSError:
+                mtimes[name] = None
+        return mtimes
+
+    def _read(self, name):
+        with open(os.path.join(self.root, name), 'rb') as f:
+            return f.read()
+
+    def load(self):
+        """Читает файлы с диска и пересобирает все варианты."""
+        mtimes = self._stat_mtimes()
+        assets = {}
+        icon_fingerprints = {}
+
+        for name in ICON_ASSETS:
+            if mtimes[name] is None:
+                continue
+            asset = Asset(self._read(name), 'image/png', mtimes[name], CACHE_ICON)
+            assets[name] = asset
+            icon_fingerprints[name[:-len('.png')]] = asset.fingerprint
+
+        def fingerprint_icons(match):
+            fingerprint = icon_fingerprints.get(match.group(1))
+            return f"/{match.group(1)}.{fingerprint}.png" if fingerprint else match.group(0)
+
+        sources = {}
+        for name in TEXT_ASSETS:
+            if mtimes[name] is not None:
+                sources[name] = _ICON_URL.sub(fingerprint_icons, self._read(name).decode('utf-8'))
+
+        # Версия приложения - общий хэш страницы, манифеста и иконок
+        version = _content_hash(*(sources[name].encode('utf-8') for name in sorted(sources) if name != 'sw.js'),
+                                *(asset.fingerprint.encode() for asset in assets.values()))
+        if 'sw.js' in sources:
+            sources['sw.js'] = _CACHE_NAME.sub(f"const CACHE_NAME = 'monitoring-app-{version}';", sources['sw.js'], 1)
+
+        latest_mtime = max((mtime for mtime in mtimes.values() if mtime is not None), default=0)
+        for name, source in sources.items():
+            assets[name] = Asset(source.encode('utf-8'), TEXT_ASSETS[name], latest_mtime, CACHE_REVALIDATE)
+
+        self.assets = assets
+        self.icon_fingerprints = icon_fingerprints
+        self.version = version
+        self._mtimes = mtimes
+        logging.info(f"Статика загружена в память: {len(assets)} файлов, версия {version}")
+
+    def _ensure_loaded(self):
+        # Загрузка при первом запросе, а не при импорте - не замедляет холодный старт
+        if self._mtimes is None:
+            with self._lock:
+                if self._mtimes is None:
+                    self.load()
+
+    def reload_if_changed(self):
+        """Перечитывает файлы, если изменилось время модификации (для режима отладки)."""
+        if self._stat_mtimes() != self._mtimes:
+            self.load()
+
+    def response(self, name: str, cache_control: str = None):
+        """Ответ с подходящим по Accept-Encoding вариантом файла или None, если файла нет."""
+        self._ensure_loaded()
+        if current_app.debug:
+            self.reload_if_changed()
+
+        asset = self.assets.get(name)
+        if asset is None:
+            return None
+
+        encoding = None
+        if 'br' in asset.variants and request.accept_encodings['br']:
+            encoding = 'br'
+        elif 'gzip' in asset.variants and request.accept_encodings['gzip']:
+            encoding = 'gzip'
+
+        response = current_app.response_class(asset.variants[encoding], mimetype=asset.mimetype)
+        response.set_etag(f"{asset.fingerprint}-{encoding}" if encoding else asset.fingerprint)
+        response.headers['Last-Modified'] = asset.last_modified
+        response.headers['Cache-Control'] = cache_control or asset.cache_control
+        if len(asset.variants) > 1:
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response.make_conditional(request)
+
+    def icon_response(self, name: str, fingerprint: str):
+        """Иконка по адресу с отпечатком: совпавший отпечаток кэшируется навсегда."""
+        self._ensure_loaded()
+        current = self.icon_fingerprints.get(name)
+        if current is None:
+            return None
+        # Устаревший отпечаток (старая страница из кэша) - отдаем текущую иконку без долгого кэша
+        cache_control = CACHE_IMMUTABLE if fingerprint == current else CACHE_REVALIDATE
+        return self.response(f"{name}.png", cache_control)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# telegram_client.py - Pooled, rate-limited Telegram Bot API client for report delivery
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+# Лимит Telegram для групп - около 20 сообщений в минуту на чат; держимся с запасом,
+# чтобы задержки сети не превращались в ответы 429
+TELEGRAM_CHAT_RATE_PER_MIN = float(os.getenv('TELEGRAM_CHAT_RATE_PER_MIN', '18'))
+TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+TELEGRAM_TIMEOUT = float(os.getenv('TELEGRAM_TIMEOUT', '30'))
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', '4'))
+# Короткий 429 ждем на месте; более долгий отдаем наверх (очередь задач повторит позже)
+TELEGRAM_MAX_INLINE_WAIT_S = float(os.getenv('TELEGRAM_MAX_INLINE_WAIT_S', '10'))
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '2'))
+# Пауза перед повтором после 5xx: 1x, 2x, 4x...
+TELEGRAM_RETRY_BACKOFF_S = float(os.getenv('TELEGRAM_RETRY_BACKOFF_S', '1'))
+
+# sendMediaGroup принимает от 2 до 10 файлов
+MEDIA_GROUP_MAX = 10
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramError(Exception):
+    """Ошибка Bot API. ``retryable`` - временная ошибка (сеть, 429, 5xx)."""
+
+    def __init__(self, message: str, status: int = None, retry_after: float = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+class TokenBucket:
+    """Ведро токенов: ``rate`` токенов в секунду, не больше ``burst`` подряд."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self) -> float:
+        """Забирает токен и возвращает, сколько секунд нужно подождать перед отправкой."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def block(self, seconds: float):
+        """Запрещает отправку на ``seconds`` (ответ 429 с retry_after)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class TelegramClient:
+    """Клиент Bot API с пулом соединений (keep-alive) и лимитом отправок на чат.
+
+    Все вызовы идут через один ``requests.Session``, поэтому TCP+TLS
+    соединение устанавливается один раз. Перед каждым запросом клиент берет
+    токен из ведра чата; на 429 блокирует чат на ``retry_after`` и повторяет
+    запрос, если ждать недолго, на 5xx повторяет с растущей паузой; когда
+    повторы кончились, бросает ``TelegramError``.
+    """
+
+    def __init__(self, token: str, base_url: str = TELEGRAM_API_URL,
+                 rate_per_min: float = TELEGRAM_CHAT_RATE_PER_MIN, burst: int = TELEGRAM_CHAT_BURST,
+                 timeout: float = TELEGRAM_TIMEOUT, pool_size: int = TELEGRAM_POOL_SIZE,
+                 max_inline_wait: float = TELEGRAM_MAX_INLINE_WAIT_S, max_retries: int = TELEGRAM_MAX_RETRIES,
+                 retry_backoff: float = TELEGRAM_RETRY_BACKOFF_S):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.rate = rate_per_min / 60
+        self.burst = burst
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_inline_wait = max_inline_wait
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._session = None
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'rate_limited': 0, 'server_errors': 0, 'throttled_s': 0.0}
+
+    @property
+    def session(self):
+        # requests импортируется только при первой отправке - не замедляет холодный старт
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def _bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets.setdefault(key, TokenBucket(self.rate, self.burst))
+        return bucket
+
+    def _throttle(self, chat_id):
+        with self._lock:
+            wait = self._bucket(chat_id).reserve()
+        if wait > 0:
+            self.stats['throttled_s'] += wait
+            time.sleep(wait)
+
+    def call(self, method: str, chat_id, data: dict, files: dict = None) -> dict:
+        """Вызывает метод Bot API от имени чата и возвращает поле ``result`` ответа."""
+        import requests
+
+        url = f"{self.base_url}/bot{self.token}/{method}"
+        payload = dict(data, chat_id=chat_id)
+        for attempt in range(self.max_retries + 1):
+            self._throttle(chat_id)
+            self.stats['requests'] += 1
+            if files:
+                for file in files.values():
+                    file[1].seek(0)
+            try:
+                response = self.session.post(url, data=payload, files=files, timeout=self.timeout)
+            except requests.RequestException as e:
+                raise TelegramError(f"Telegram недоступен: {e}")
+
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if response.status_code == 200 and body.get('ok', True):
+                return body.get('result')
+
+            description = body.get('description') or response.text[:200]
+            if response.status_code == 429:
+                retry_after = float(body.get('parameters', {}).get('retry_after', 1))
+                self.stats['rate_limited'] += 1
+                with self._lock:
+                    self._bucket(chat_id).block(retry_after)
+                if retry_after <= self.max_inline_wait and attempt < self.max_retries:
+                    logger.warning(f"Telegram 429 для чата {chat_id}: повтор через {retry_after:.0f} с")
+                    continue
+                raise TelegramError(f"Telegram 429: {description}", 429, retry_after)
+            if response.status_code >= 500:
+                self.stats['server_errors'] += 1
+                if attempt < self.max_retries:
+                    delay = self.retry_backoff * 2 ** attempt
+                    logger.warning(f"Telegram {response.status_code}: повтор через {delay:.1f} с")
+                    time.sleep(delay)
+                    continue
+            raise TelegramError(f"Telegram {response.status_code}: {description}", response.status_code)
+
+    def send_document(self, chat_id, path: str, caption: str = None) -> dict:
+        """Отправляет один файл."""
+        with open(path, 'rb') as f:
+            return self.call('sendDocument', chat_id, {'caption': caption or ''},
+                             files={'document': (os.path.basename(path), f)})
+
+    def send_media_group(self, chat_id, documents: list) -> list:
+        """Отправляет 2-10 файлов одним альбомом. ``documents`` - список (путь, подпись)."""
+        media = []
+        files = {}
+        with ExitStack() as stack:
+            for index, (path, caption) in enumerate(documents):
+                name = f"file{index}"
+                files[name] = (os.path.basename(path), stack.enter_context(open(path, 'rb')))
+                media.append({'type': 'document', 'media': f"attach://{name}", 'caption': caption or ''})
+            return self.call('sendMediaGroup', chat_id, {'media': json.dumps(media, ensure_ascii=False)},
+                             files=files)
+
+    def send_documents(self, chat_id, documents: list) -> int:
+        """Отправляет файлы альбомами по 10 (одиночный файл - sendDocument). Возвращает число запросов."""
+        requests_made = 0
+        for start in range(0, len(documents), MEDIA_GROUP_MAX):
+            chunk = documents[start:start + MEDIA_GROUP_MAX]
+            if len(chunk) == 1:
+                self.send_document(chat_id, *chunk[0])
+            else:
+                self.send_media_group(chat_id, chunk)
+            requests_made += 1
+        return requests_made
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Общий клиент для BOT_TOKEN из окружения или None, если бот не настроен."""
+    global _client
+    token = os.getenv('BOT_TOKEN')
+    if not token:
+        return None
+    if _client is None or _client.token != token:
+        with _client_lock:
+            if _client is None or _client.token != token:
+                _client = TelegramClient(token)
+    return _client
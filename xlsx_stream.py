@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# xlsx_stream.py - Incremental XLSX writer: rows in, zip chunks out, bounded memory
+import os
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+# Сколько байт копить перед отдачей очередного куска клиенту
+XLSX_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '65536'))
+
+# Управляющие символы недопустимы в XML
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}'
+    '</Types>'
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}'
+    '<Relationship Id="rId{styles}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+_SHEET_REL = (
+    '<Relationship Id="rId{index}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{index}.xml"/>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+# Стили ячеек: 0 - обычная, 1 - заголовок (жирный), 2 - цена (# ##0,00), 3 - остаток (# ##0)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="#,##0.00"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="3" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_HEADER_STYLE = ' s="1"'
+# Форматы столбцов для stream_xlsx: имя формата -> атрибут стиля ячейки
+COLUMN_STYLES = {None: '', 'price': ' s="2"', 'stock': ' s="3"'}
+
+
+class _ChunkSink:
+    """Файловый объект для zipfile, который копит байты до выдачи генератором.
+
+    У него нет ``tell``/``seek``, поэтому zipfile пишет архив потоково
+    (с дескрипторами данных после каждого файла).
+    """
+
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        self.size = 0
+        return data
+
+
+def column_letter(index: int) -> str:
+    """Буква столбца по номеру с нуля: 0 -> A, 26 -> AA."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def sheet_title(name: str, used: set) -> str:
+    """Допустимое и уникальное имя листа Excel (до 31 символа, без []:*?/\\)."""
+    title = re.sub(r'[\[\]:*?/\\]', ' ', str(name)).strip()[:31] or 'Лист'
+    candidate, counter = title, 2
+    while candidate.lower() in used:
+        suffix = f" ({counter})"
+        candidate, counter = title[:31 - len(suffix)] + suffix, counter + 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def _cell(ref: str, value, style: str = '') -> str:
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{style}><v>{value!r}</v></c>'
+    if isinstance(value, (date, datetime)):
+        value = value.strftime('%d.%m.%Y')
+    text = escape(_INVALID_XML.sub('', str(value)))
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def sheet_xml_blocks(header, rows, formats=()):
+    """Генератор XML строк листа (без обертки worksheet) пачками по 256 строк, в байтах.
+
+    ``formats`` - ключи COLUMN_STYLES по столбцам ('price', 'stock' или None).
+    """
+    letters = [column_letter(column) for column in range(len(header))]
+    styles = [COLUMN_STYLES[fmt] for fmt in formats]
+    cells = ''.join(_cell(f'{letter}1', value, _HEADER_STYLE) for letter, value in zip(letters, header))
+    # Строки XML копятся небольшими пачками: запись в zip построчно заметно медленнее
+    pending = [f'<row r="1">{cells}</row>']
+    row_number = 1
+    for values in rows:
+        row_number += 1
+        if len(values) > len(letters):
+            letters += [column_letter(column) for column in range(len(letters), len(values))]
+        if len(values) > len(styles):
+            styles += [''] * (len(values) - len(styles))
+        cells = ''.join(_cell(f'{letter}{row_number}', value, style)
+                        for letter, value, style in zip(letters, values, styles))
+        pending.append(f'<row r="{row_number}">{cells}</row>')
+        if len(pending) >= 256:
+            yield ''.join(pending).encode('utf-8')
+            pending = []
+    if pending:
+        yield ''.join(pending).encode('utf-8')
+
+
+def stream_xlsx(sheets, chunk_size: int = XLSX_CHUNK_SIZE):
+    """Генератор байтов XLSX файла.
+
+    ``sheets`` - список (имя листа, заголовки, итератор строк) или
+    (имя листа, заголовки, итератор строк, форматы столбцов), где форматы -
+    последовательность ключей COLUMN_STYLES по столбцам ('price', 'stock'
+    или None). Строки читаются по одной и сразу кодируются (строки ячеек -
+    inline, без общей таблицы строк), так что память не зависит от числа
+    строк. Листы заполняются по очереди: итератор следующего листа
+    начинает читаться только после предыдущего.
+    """
+    sheets = [sheet if len(sheet) == 4 else (*sheet, ()) for sheet in sheets]
+    return stream_xlsx_parts([(name, sheet_xml_blocks(header, rows, formats))
+                              for name, header, rows, formats in sheets], chunk_size)
+
+
+def stream_xlsx_parts(parts, chunk_size: int = XLSX_CHUNK_SIZE):
+    """Генератор байтов XLSX файла из готового XML листов.
+
+    ``parts`` - список (имя листа, итератор байтов из sheet_xml_blocks);
+    так листы можно отрисовать заранее, например в других процессах.
+    """
+    parts = list(parts)
+    used = set()
+    titles = [sheet_title(name, used) for name, blocks in parts]
+    indexes = range(1, len(parts) + 1)
+
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            sheets=''.join(_SHEET_CONTENT_TYPE.format(index=index) for index in indexes)))
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(
+            f'<sheet name="{escape(title, {chr(34): "&quot;"})}" sheetId="{index}" r:id="rId{index}"/>'
+            for index, title in zip(indexes, titles))))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(
+            sheets=''.join(_SHEET_REL.format(index=index) for index in indexes), styles=len(parts) + 1))
+        archive.writestr('xl/styles.xml', _STYLES)
+
+        for index, (name, blocks) in zip(indexes, parts):
+            with archive.open(f'xl/worksheets/sheet{index}.xml', 'w') as sheet:
+                sheet.write(_SHEET_START.encode('utf-8'))
+                for block in blocks:
+                    sheet.write(block)
+                    if sink.size >= chunk_size:
+                        yield sink.drain()
+                sheet.write(_SHEET_END.encode('utf-8'))
+    yield sink.drain()